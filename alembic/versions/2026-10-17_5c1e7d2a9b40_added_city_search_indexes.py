@@ -0,0 +1,27 @@
+"""added city search indexes
+
+Revision ID: 5c1e7d2a9b40
+Revises: a7fe9796fe5b
+Create Date: 2026-10-17 11:02:36.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7d2a9b40'
+down_revision = 'a7fe9796fe5b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_city_name_lower', 'city', [sa.text('lower(name)')], unique=False)
+    op.create_index('ix_city_alternatenames', 'city', ['alternatenames'], unique=False, postgresql_using='gin')
+    op.execute('ANALYZE city')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_city_alternatenames', table_name='city')
+    op.drop_index('ix_city_name_lower', table_name='city')
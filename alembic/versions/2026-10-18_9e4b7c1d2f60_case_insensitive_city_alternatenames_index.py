@@ -0,0 +1,31 @@
+"""case-insensitive city alternatenames index
+
+Revision ID: 9e4b7c1d2f60
+Revises: 5c1e7d2a9b40
+Create Date: 2026-10-18 09:14:52.730614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.models import CREATE_LOWER_ARRAY, DROP_LOWER_ARRAY
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7c1d2f60'
+down_revision = '5c1e7d2a9b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(CREATE_LOWER_ARRAY)
+    op.drop_index('ix_city_alternatenames', table_name='city')
+    op.create_index('ix_city_alternatenames_lower', 'city', [sa.text('lower_array(alternatenames)')], unique=False, postgresql_using='gin')
+    op.execute('ANALYZE city')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_city_alternatenames_lower', table_name='city')
+    op.create_index('ix_city_alternatenames', 'city', ['alternatenames'], unique=False, postgresql_using='gin')
+    op.execute(DROP_LOWER_ARRAY)
@@ -0,0 +1,20 @@
+"""gunicorn hooks keeping prometheus multiprocess mode metrics (see make_metrics_app in src/main.py) accurate."""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    # Files left by the workers of a previous run would be reported as live workers' metrics
+    if PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    # Drops the exited worker's share of the livesum gauges, like requests it had in flight
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid, PROMETHEUS_MULTIPROC_DIR)
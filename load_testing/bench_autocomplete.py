@@ -0,0 +1,42 @@
+"""
+Latency of city name autocompletion over the geonamescache city set (names and alternate names), for
+prefixes of 1-6 characters of random city names as typed keystroke by keystroke.
+
+    python -m load_testing.bench_autocomplete
+"""
+import gc
+import random
+import time
+
+from load_testing.geonames import geonames_city_rows
+from load_testing.timing import percentiles
+from src.database import async_session_maker
+from src.weather_service.city_index import CityIndex, CityTable
+
+LIMIT = 10
+
+
+def main():
+    table = CityTable(geonames_city_rows(), version='bench')
+    index = CityIndex(session_maker=async_session_maker, check_interval=300)
+    index.table = table
+    gc.freeze()
+    print(f"{len(table)} cities, {len(table.prefixes)} names and alternate names")
+
+    rng = random.Random(0)
+    prefixes = []
+    for _ in range(5000):
+        name = rng.choice(table.names)
+        prefixes.extend(name[:length] for length in range(1, min(len(name), 6) + 1))
+
+    for label, autocomplete in [('positions', lambda prefix, limit: table.prefixes.top(prefix.casefold(), limit)), ('cities', index.autocomplete)]:
+        samples = []
+        for prefix in prefixes:
+            started = time.perf_counter_ns()
+            autocomplete(prefix, LIMIT)
+            samples.append(time.perf_counter_ns() - started)
+        print(f"top {LIMIT} {label} for {len(prefixes)} prefixes: {percentiles(samples)}")
+
+
+if __name__ == '__main__':
+    main()
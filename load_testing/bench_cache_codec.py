@@ -0,0 +1,52 @@
+"""
+Compares cache codecs on forecast payloads like the ones the weather routes cache (1 and 3 forecast days,
+24 and 72 hourly entries): bytes stored in Redis and encode/decode time per payload.
+
+    python -m load_testing.bench_cache_codec
+"""
+import asyncio
+import datetime
+import json
+
+from load_testing.fake_weatherapi import make_weather
+from load_testing.timing import measure
+from src.cache.codec import CacheCodec
+from src.weather_service.utils import process_data
+
+NOW = datetime.datetime(2023, 6, 10, 12, 0, tzinfo=datetime.timezone.utc)
+LOCATION = {'name': 'Brussels', 'region': '', 'country': 'Belgium', 'lat': 50.85, 'lon': 4.35, 'tz_id': 'Europe/Brussels'}
+CODECS = [
+    ('json', 'none'),
+    ('orjson', 'none'),
+    ('msgpack', 'none'),
+    ('orjson', 'zstd'),
+    ('msgpack', 'zstd'),
+]
+
+
+async def make_payload(days: int) -> dict:
+    location_data, weather_data, clothing_data, forecast_data = await process_data(make_weather(LOCATION, days, NOW))
+    return {
+        'weather_data': weather_data,
+        'forecast_data': forecast_data,
+        'location_data': location_data,
+        'clothing_data': clothing_data,
+    }
+
+
+def main():
+    for days in (1, 3):
+        payload = asyncio.run(make_payload(days))
+        print(f"\n{days} day(s), {24 * days} hourly entries, json.dumps length {len(json.dumps(payload))}")
+        print(f"{'codec':<18}{'bytes':>8}{'encode, us':>12}{'decode, us':>12}")
+        for serializer, compression in CODECS:
+            codec = CacheCodec(serializer=serializer, compression=compression, compression_min_bytes=1024)
+            encoded = codec.encode(payload)
+            assert codec.decode(encoded) == payload
+            encode_time = measure(lambda: codec.encode(payload))
+            decode_time = measure(lambda: codec.decode(encoded))
+            print(f"{serializer + '+' + compression:<18}{len(encoded):>8}{encode_time:>12.1f}{decode_time:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Builds the in-process city index from the geonamescache city set and reports its memory and lookup
+times against the Postgres queries it replaces.
+
+    python -m load_testing.bench_city_index
+"""
+import random
+import time
+import tracemalloc
+
+from load_testing.geonames import geonames_city_rows
+from load_testing.timing import measure
+from src.weather_service.city_index import CityIndex, CityTable
+from src.database import async_session_maker
+
+
+def main():
+    rows = geonames_city_rows()
+
+    started = time.perf_counter()
+    CityTable(rows, version='bench')
+    build_seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    table = CityTable(rows, version='bench')
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    index = CityIndex(session_maker=async_session_maker, check_interval=300)
+    index.table = table
+    rng = random.Random(0)
+    ids = rng.sample(list(table.ids), 1000)
+    names = [table.names[position] for position in rng.sample(range(len(table)), 1000)]
+
+    print(f"{len(table)} cities, {len(table.by_name)} distinct names and alternate names")
+    print(f"build: {build_seconds:.2f} s, memory: {allocated / 2 ** 20:.1f} MiB traced, "
+          f"{table.estimate_bytes() / 2 ** 20:.1f} MiB estimated (city_index_bytes)")
+    print(f"get by id: {measure(lambda: index.get(rng.choice(ids)), number=20000):.2f} us")
+    print(f"search by name: {measure(lambda: index.search(rng.choice(names)), number=20000):.2f} us")
+
+
+if __name__ == '__main__':
+    main()
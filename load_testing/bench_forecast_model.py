@@ -0,0 +1,66 @@
+"""
+Compares the row (one dict per hour) and columnar forecast layouts on 3-day forecasts: memory held per
+decoded forecast, bytes stored in Redis and conversion time per forecast.
+
+    python -m load_testing.bench_forecast_model
+"""
+import datetime
+import tracemalloc
+
+from load_testing.fake_weatherapi import make_weather
+from load_testing.timing import measure
+from src.cache.codec import CacheCodec
+from src.weather_service.forecast import forecast_from_columns, forecast_from_weatherapi, forecast_to_columns, forecast_to_rows
+
+NOW = datetime.datetime(2023, 6, 10, 12, 0, tzinfo=datetime.timezone.utc)
+LOCATIONS = [
+    {'name': f"City {index}", 'region': '', 'country': 'Belgium', 'lat': 50 + index / 100, 'lon': 4.35, 'tz_id': 'Europe/Brussels'}
+    for index in range(200)
+]
+
+
+def allocated_per_item(make, encoded_payloads) -> float:
+    """Bytes still allocated per forecast after decoding all payloads, like a warm local cache tier."""
+    tracemalloc.start()
+    items = [make(encoded) for encoded in encoded_payloads]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return allocated / len(encoded_payloads)
+
+
+def main():
+    codec = CacheCodec(serializer='orjson', compression='zstd', compression_min_bytes=1024)
+    forecastdays = [make_weather(location, 3, NOW)['forecast']['forecastday'] for location in LOCATIONS]
+    rows = [forecast_to_rows(forecast_from_weatherapi(forecastday)) for forecastday in forecastdays]
+    columns = [forecast_to_columns(forecast_from_weatherapi(forecastday)) for forecastday in forecastdays]
+    encoded_rows = [codec.encode(forecast) for forecast in rows]
+    encoded_columns = [codec.encode(forecast) for forecast in columns]
+
+    print(f"{len(LOCATIONS)} forecasts of 3 days, 72 hourly entries each\n")
+    print(f"{'layout':<22}{'stored bytes':>14}{'memory, bytes':>15}{'decode, us':>12}")
+    print(
+        f"{'rows':<22}{sum(map(len, encoded_rows)) / len(rows):>14.0f}"
+        f"{allocated_per_item(codec.decode, encoded_rows):>15.0f}{measure(lambda: codec.decode(encoded_rows[0]), number=500):>12.1f}"
+    )
+    print(
+        f"{'columns':<22}{sum(map(len, encoded_columns)) / len(columns):>14.0f}"
+        f"{allocated_per_item(codec.decode, encoded_columns):>15.0f}{measure(lambda: codec.decode(encoded_columns[0]), number=500):>12.1f}"
+    )
+    print(
+        f"{'columns as model':<22}{'':>14}"
+        f"{allocated_per_item(lambda encoded: forecast_from_columns(codec.decode(encoded)), encoded_columns):>15.0f}"
+        f"{measure(lambda: forecast_from_columns(codec.decode(encoded_columns[0])), number=500):>12.1f}"
+    )
+
+    print(f"\n{'conversion':<34}{'us':>8}")
+    for name, function in [
+        ('weatherapi -> rows', lambda: forecast_to_rows(forecast_from_weatherapi(forecastdays[0]))),
+        ('weatherapi -> columns', lambda: forecast_to_columns(forecast_from_weatherapi(forecastdays[0]))),
+        ('columns -> rows (template/JSON)', lambda: forecast_to_rows(forecast_from_columns(columns[0]))),
+    ]:
+        print(f"{name:<34}{measure(function, number=500):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Recall and latency of typo-tolerant city search over the geonamescache city set, for city names with
+random typos: as many substitutions, insertions, deletions and transpositions as the name tolerates.
+A query is recalled when the misspelled city is among the results. A query's latency is the best of
+RUNS runs, so that the scheduler preempting a run doesn't count against the search. Fails if recall or
+p99 latency falls short of the budgets below, e.g. after raising FUZZY_MAX_CANDIDATES.
+
+    python -m load_testing.bench_fuzzy_search
+"""
+import gc
+import random
+import string
+import statistics
+import time
+
+from load_testing.geonames import geonames_city_rows
+from load_testing.timing import percentiles
+from src.config import FUZZY_SEARCH_LIMIT, FUZZY_MAX_CANDIDATES
+from src.weather_service.city_index import CityTable, fuzzy_max_distance, normalize_name
+
+QUERIES = 5000
+RUNS = 3
+MIN_RECALL = 0.98
+P99_BUDGET_NS = 2_000_000
+
+
+def misspell(name: str, typos: int, rng: random.Random) -> str:
+    for _ in range(typos):
+        index = rng.randrange(len(name) - 1)
+        typo = rng.randrange(4)
+        if typo == 0:
+            name = name[:index] + rng.choice(string.ascii_lowercase) + name[index + 1:]
+        elif typo == 1:
+            name = name[:index] + name[index + 1:]
+        elif typo == 2:
+            name = name[:index] + rng.choice(string.ascii_lowercase) + name[index:]
+        else:
+            name = name[:index] + name[index + 1] + name[index] + name[index + 2:]
+    return name
+
+
+def main():
+    table = CityTable(geonames_city_rows(), version='bench')
+    gc.freeze()
+    print(
+        f"{len(table)} cities, {len(table.fuzzy_names)} distinct names, trigram index ~{table.fuzzy_names.estimate_bytes() / 2 ** 20:.1f} MiB, "
+        f"at most {FUZZY_MAX_CANDIDATES} candidates verified per query"
+    )
+
+    rng = random.Random(0)
+    for typos in (1, 2):
+        samples, recalled, first, queries = [], 0, 0, 0
+        while queries < QUERIES:
+            position = rng.randrange(len(table))
+            name = normalize_name(table.names[position])
+            query = misspell(name, typos, rng)
+            if fuzzy_max_distance(query) < typos or query == name:
+                continue
+            elapsed = []
+            for _ in range(RUNS):
+                started = time.perf_counter_ns()
+                positions = table.fuzzy_search(query, FUZZY_SEARCH_LIMIT)
+                elapsed.append(time.perf_counter_ns() - started)
+            samples.append(min(elapsed))
+            queries += 1
+            names = [normalize_name(table.names[found]) for found in positions]
+            recalled += name in names
+            first += bool(names) and names[0] == name
+        print(
+            f"{typos} typo(s), {queries} queries: recall@{FUZZY_SEARCH_LIMIT} {recalled / queries:.1%}, "
+            f"misspelled name ranked first {first / queries:.1%}; {percentiles(samples)}"
+        )
+        assert recalled / queries >= MIN_RECALL, f"recall@{FUZZY_SEARCH_LIMIT} under {MIN_RECALL:.0%}"
+        p99 = statistics.quantiles(samples, n=100)[98]
+        assert p99 <= P99_BUDGET_NS, f"p99 {p99 / 1000:.1f} us over the {P99_BUDGET_NS / 1000:.0f} us budget"
+
+
+if __name__ == '__main__':
+    main()
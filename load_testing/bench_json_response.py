@@ -0,0 +1,65 @@
+"""
+Serialization CPU time per JSON route: stdlib JSONResponse against ORJSONResponse, and for the cached
+city search the passthrough of cached bytes against decoding and re-encoding them.
+
+    python -m load_testing.bench_json_response
+"""
+import asyncio
+import datetime
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from load_testing.fake_weatherapi import make_weather
+from load_testing.timing import measure
+from src.cache.codec import CacheCodec
+from src.weather_service.utils import RESULT_FIELDS, RESULT_LAYOUT_COLUMNS, RESULT_LAYOUT_ROWS, paginate_hourly_forecast, \
+    process_data, project_result_data
+
+NOW = datetime.datetime(2023, 6, 10, 12, 0, tzinfo=datetime.timezone.utc)
+LOCATION = {'name': 'Brussels', 'region': '', 'country': 'Belgium', 'lat': 50.85, 'lon': 4.35, 'tz_id': 'Europe/Brussels'}
+CITIES = {
+    'cities': [
+        {'name': 'Springfield', 'country': 'United States', 'region': f"Region {index}", 'latitude': 39.8 + index,
+         'longitude': -89.6, 'population': 100000 + index, 'id': index}
+        for index in range(20)
+    ]
+}
+
+
+async def make_result_data() -> dict:
+    location_data, weather_data, clothing_data, forecast_data = await process_data(make_weather(LOCATION, 3, NOW))
+    return {
+        'weather_data': weather_data,
+        'forecast_data': forecast_data,
+        'location_data': location_data,
+        'clothing_data': clothing_data,
+    }
+
+
+def main():
+    result_data = asyncio.run(make_result_data())
+    payloads = {
+        'validate': CITIES,
+        'by_coordinates': project_result_data(result_data, RESULT_FIELDS, RESULT_LAYOUT_ROWS),
+        'by_coordinates columns': project_result_data(result_data, RESULT_FIELDS, RESULT_LAYOUT_COLUMNS),
+        'by_coordinates weather': project_result_data(result_data, frozenset({'weather'})),
+        'hourly': paginate_hourly_forecast(result_data['forecast_data'], None, 0, 24),
+    }
+
+    print(f"{'route':<26}{'bytes':>8}{'JSONResponse, us':>18}{'ORJSONResponse, us':>20}")
+    for route, content in payloads.items():
+        print(
+            f"{route:<26}{len(ORJSONResponse(content).body):>8}"
+            f"{measure(lambda: JSONResponse(content)):>18.1f}{measure(lambda: ORJSONResponse(content)):>20.1f}"
+        )
+
+    print(f"\n{'cached validate':<34}{'us':>8}")
+    for serializer, compression in [('orjson', 'none'), ('orjson', 'zstd'), ('msgpack', 'zstd')]:
+        codec = CacheCodec(serializer=serializer, compression=compression, compression_min_bytes=1024)
+        cached = codec.encode(CITIES)
+        print(f"{serializer + '+' + compression + ' decode+encode':<34}{measure(lambda: JSONResponse(codec.decode(cached))):>8.1f}")
+        print(f"{serializer + '+' + compression + ' passthrough':<34}{measure(lambda: codec.to_json(cached)):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
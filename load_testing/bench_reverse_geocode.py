@@ -0,0 +1,80 @@
+"""
+Latency of reverse geocoding coordinates to the nearest city over the geonamescache city set, for
+points up to ~20 km from a random city and uniformly random points, against scanning every city;
+and of listing the cities /weather/nearby shows around points near cities and in the densest regions.
+
+    python -m load_testing.bench_reverse_geocode
+"""
+import gc
+import random
+import time
+
+from load_testing.geonames import geonames_city_rows
+from load_testing.timing import percentiles
+from src.config import REVERSE_GEOCODE_MAX_KM, REVERSE_GEOCODE_MIN_POPULATION, NEARBY_MAX_LIMIT, NEARBY_MAX_RADIUS_KM
+from src.database import async_session_maker
+from src.weather_service.city_index import CityIndex, CityTable
+from src.weather_service.geo import haversine_km
+
+QUERIES = 5000
+
+
+def scan_nearest(table: CityTable, latitude: float, longitude: float):
+    distances = [
+        (haversine_km(latitude, longitude, city_latitude, city_longitude), position)
+        for position, (city_latitude, city_longitude) in enumerate(zip(table.latitudes, table.longitudes))
+        if table.populations[position] >= REVERSE_GEOCODE_MIN_POPULATION
+    ]
+    nearest = min(distances)
+    return nearest if nearest[0] <= REVERSE_GEOCODE_MAX_KM else None
+
+
+def main():
+    table = CityTable(geonames_city_rows(), version='bench')
+    index = CityIndex(session_maker=async_session_maker, check_interval=300)
+    index.table = table
+    gc.freeze()
+    print(f"{len(table)} cities, spatial index ~{table.locations.estimate_bytes() / 2 ** 20:.1f} MiB")
+
+    rng = random.Random(0)
+    near_cities = []
+    for _ in range(QUERIES):
+        position = rng.randrange(len(table))
+        near_cities.append((table.latitudes[position] + rng.uniform(-0.2, 0.2), table.longitudes[position] + rng.uniform(-0.2, 0.2)))
+    anywhere = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(QUERIES)]
+
+    for label, points in [('near cities', near_cities), ('anywhere', anywhere)]:
+        samples, resolved = [], 0
+        for latitude, longitude in points:
+            started = time.perf_counter_ns()
+            city_data = index.reverse_geocode(latitude, longitude)
+            samples.append(time.perf_counter_ns() - started)
+            resolved += city_data is not None
+        print(f"{label}: {resolved / len(points):.1%} resolved to a city; {percentiles(samples)}")
+
+    mismatches, samples = 0, []
+    for latitude, longitude in near_cities[:200]:
+        started = time.perf_counter_ns()
+        expected = scan_nearest(table, latitude, longitude)
+        samples.append(time.perf_counter_ns() - started)
+        found = table.locations.nearest(latitude, longitude, 1, REVERSE_GEOCODE_MAX_KM, REVERSE_GEOCODE_MIN_POPULATION)
+        mismatches += [position for _, position in found] != ([expected[1]] if expected else [])
+    print(f"scanning every city: {percentiles(samples)}; {mismatches} of 200 answers differ from the index")
+
+    # Cities with the most other cities within NEARBY_MAX_RADIUS_KM, sampled
+    densest = sorted(
+        rng.sample(range(len(table)), 2000),
+        key=lambda position: -len(table.locations.within(table.latitudes[position], table.longitudes[position], NEARBY_MAX_RADIUS_KM)),
+    )[:100]
+    dense = [(table.latitudes[position], table.longitudes[position]) for position in densest]
+    for label, points in [('near cities', near_cities), ('densest regions', dense * 10)]:
+        samples = []
+        for latitude, longitude in points:
+            started = time.perf_counter_ns()
+            index.nearby(latitude, longitude, NEARBY_MAX_LIMIT, NEARBY_MAX_RADIUS_KM)
+            samples.append(time.perf_counter_ns() - started)
+        print(f"{NEARBY_MAX_LIMIT} nearest within {NEARBY_MAX_RADIUS_KM:g} km, {label}: {percentiles(samples)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""
+Local stand-in for weatherapi.com, for load tests and benchmarks that must not spend real API quota.
+
+Serves forecast.json and current.json shaped like weatherapi responses. Payloads are generated from the
+query and the date, so a location always gets the same weather for the day; coordinates of cities from
+geonamescache resolve to that city's name, like the real API does for the cities table. Latency follows a
+configurable distribution and a share of calls can fail with 500, a quota error or a hang.
+
+In record mode requests are proxied to the real weatherapi and the responses are saved to a cassette file;
+replay mode serves only the cassette, so a benchmark of the full /weather/* stack can be repeated offline.
+
+Run it and point the app at it:
+    python load_testing/fake_weatherapi.py --port 8089 --latency lognormal:80,400 --error-rate 0.01
+    WEATHER_API_URL=http://localhost:8089/v1
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import math
+import os
+import random
+from typing import Callable, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import aiohttp
+import geonamescache
+from aiohttp import web
+
+# weatherapi condition code -> (day text, night text, icon number), see mongo_seed/weather_buddy.weatherapi_codes.json
+CONDITIONS = {
+    1000: ('Sunny', 'Clear', 113),
+    1003: ('Partly cloudy', 'Partly cloudy', 116),
+    1006: ('Cloudy', 'Cloudy', 119),
+    1009: ('Overcast', 'Overcast', 122),
+    1030: ('Mist', 'Mist', 143),
+    1063: ('Patchy rain possible', 'Patchy rain possible', 176),
+    1183: ('Light rain', 'Light rain', 296),
+    1195: ('Heavy rain', 'Heavy rain', 308),
+    1213: ('Light snow', 'Light snow', 326),
+    1225: ('Heavy snow', 'Heavy snow', 338),
+}
+RAIN_CODES = [1063, 1183, 1195]
+SNOW_CODES = [1213, 1225]
+DRY_CODES = [1000, 1003, 1006, 1009, 1030]
+
+ERRORS = {
+    'internal': (500, 9999, 'Internal application error.'),
+    'quota': (403, 2007, 'API key has exceeded calls per month quota.'),
+    'not_found': (400, 1006, 'No matching location found.'),
+}
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parses a latency distribution in milliseconds into a sampler returning seconds:
+    "fixed:50", "uniform:20,200" or "lognormal:MEDIAN,P99".
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(value) / 1000 for value in args.split(',')] if args else []
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if kind == 'lognormal' and len(values) == 2:
+        median, p99 = values
+        sigma = math.log(p99 / median) / 2.326
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise argparse.ArgumentTypeError(f"Unknown latency distribution {spec!r}")
+
+
+def error_response(kind: str) -> web.Response:
+    status, code, message = ERRORS[kind]
+    return web.json_response({'error': {'code': code, 'message': message}}, status=status)
+
+
+class Gazetteer:
+    """geonamescache cities by exact coordinates, to answer "lat,lon" queries with the city name."""
+
+    def __init__(self):
+        gc = geonamescache.GeonamesCache()
+        countries = gc.get_countries()
+        self.by_coordinates = {}
+        for city_dict in gc.get_cities().values():
+            country = countries.get(city_dict['countrycode'], {}).get('name', '')
+            key = self._key(city_dict['latitude'], city_dict['longitude'])
+            self.by_coordinates[key] = (city_dict['name'].title(), country, city_dict['timezone'])
+
+    def find(self, latitude: float, longitude: float) -> Optional[Tuple[str, str, str]]:
+        return self.by_coordinates.get(self._key(latitude, longitude))
+
+    @staticmethod
+    def _key(latitude: float, longitude: float) -> Tuple[float, float]:
+        return round(float(latitude), 4), round(float(longitude), 4)
+
+
+def resolve_location(query: str, gazetteer: Gazetteer) -> Optional[dict]:
+    parts = [part.strip() for part in query.split(',')]
+    try:
+        latitude, longitude = float(parts[0]), float(parts[1])
+    except (IndexError, ValueError):
+        if not parts[0]:
+            return None
+        seed = int(hashlib.sha256(query.lower().encode()).hexdigest(), 16)
+        return {
+            'name': parts[0],
+            'region': parts[1] if len(parts) > 2 else '',
+            'country': parts[-1] if len(parts) > 1 else '',
+            'lat': round(seed % 18000 / 100 - 90, 2),
+            'lon': round(seed // 18000 % 36000 / 100 - 180, 2),
+            'tz_id': 'UTC',
+        }
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    name, country, timezone = gazetteer.find(latitude, longitude) or (f"Place {latitude:.2f},{longitude:.2f}", '', 'UTC')
+    return {
+        'name': name,
+        'region': '',
+        'country': country,
+        'lat': round(latitude, 2),
+        'lon': round(longitude, 2),
+        'tz_id': timezone,
+    }
+
+
+def make_condition(code: int, is_day: bool) -> dict:
+    day_text, night_text, icon = CONDITIONS[code]
+    folder = 'day' if is_day else 'night'
+    return {
+        'text': day_text if is_day else night_text,
+        'icon': f"//cdn.weatherapi.com/weather/64x64/{folder}/{icon}.png",
+        'code': code,
+    }
+
+
+def pick_condition_code(rng: random.Random, temperature: float) -> int:
+    if rng.random() < 0.7:
+        return rng.choice(DRY_CODES)
+    return rng.choice(SNOW_CODES if temperature <= 0 else RAIN_CODES)
+
+
+def make_weather(location: dict, days: int, now: datetime.datetime) -> dict:
+    """Builds a forecast.json body that depends only on the location and the local date."""
+    local_now = now.astimezone(ZoneInfo(location['tz_id']))
+    seed = hashlib.sha256(f"{location['lat']},{location['lon']}:{local_now.date()}".encode()).hexdigest()
+    rng = random.Random(seed)
+    # Warmer near the equator, with a daily swing peaking at 15:00
+    base_temperature = 28 - abs(location['lat']) * 0.6 + rng.uniform(-5, 5)
+
+    forecastday = []
+    for day in range(max(days, 1)):
+        date = local_now.date() + datetime.timedelta(days=day)
+        day_temperature = base_temperature + rng.uniform(-3, 3) * day
+        hours = []
+        for hour in range(24):
+            temperature = round(day_temperature + 5 * math.cos((hour - 15) / 24 * 2 * math.pi), 1)
+            hours.append({
+                'time': f"{date} {hour:02d}:00",
+                'temp_c': temperature,
+                'condition': make_condition(pick_condition_code(rng, temperature), 6 <= hour < 21),
+            })
+        temperatures = [hour['temp_c'] for hour in hours]
+        forecastday.append({
+            'date': str(date),
+            'day': {
+                'maxtemp_c': max(temperatures),
+                'mintemp_c': min(temperatures),
+                'condition': make_condition(pick_condition_code(rng, sum(temperatures) / 24), True),
+            },
+            'hour': hours,
+        })
+
+    current_hour = forecastday[0]['hour'][local_now.hour]
+    wind_kph = round(rng.uniform(0, 40), 1)
+    return {
+        'location': {**location, 'localtime': f"{local_now:%Y-%m-%d} {local_now.hour}:{local_now:%M}"},
+        'current': {
+            'last_updated': local_now.replace(minute=local_now.minute // 15 * 15).strftime('%Y-%m-%d %H:%M'),
+            'temp_c': current_hour['temp_c'],
+            'feelslike_c': round(current_hour['temp_c'] - wind_kph / 10, 1),
+            'condition': current_hour['condition'],
+            'wind_kph': wind_kph,
+            'humidity': rng.randint(20, 100),
+            'cloud': rng.randint(0, 100),
+        },
+        'forecast': {'forecastday': forecastday},
+    }
+
+
+class Cassette:
+    """Recorded upstream responses keyed by endpoint and query parameters (without the API key)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.responses = json.load(file)
+
+    @staticmethod
+    def key(endpoint: str, params: dict) -> str:
+        return f"{endpoint}?" + '&'.join(f"{name}={params[name]}" for name in sorted(params) if name != 'key')
+
+    def get(self, endpoint: str, params: dict) -> Optional[dict]:
+        return self.responses.get(self.key(endpoint, params))
+
+    def save(self, endpoint: str, params: dict, status: int, body: dict):
+        self.responses[self.key(endpoint, params)] = {'status': status, 'body': body}
+        with open(self.path, 'w') as file:
+            json.dump(self.responses, file)
+
+
+class FakeWeatherAPI:
+    def __init__(
+            self,
+            mode: str,
+            latency: Callable[[random.Random], float],
+            error_rate: float,
+            quota_error_rate: float,
+            hang_rate: float,
+            seed: int,
+            now: Optional[datetime.datetime] = None,
+            cassette: Optional[Cassette] = None,
+            upstream_url: Optional[str] = None,
+    ):
+        self.mode = mode
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.hang_rate = hang_rate
+        self.rng = random.Random(seed)
+        self.now = now
+        self.cassette = cassette
+        self.upstream_url = upstream_url
+        self.gazetteer = Gazetteer() if mode == 'generate' else None
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/v1/{endpoint:(forecast|current)}.json', self.handle)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        roll = self.rng.random()
+        await asyncio.sleep(self.latency(self.rng))
+        if roll < self.hang_rate:
+            await asyncio.sleep(3600)
+        elif roll < self.hang_rate + self.error_rate:
+            return error_response('internal')
+        elif roll < self.hang_rate + self.error_rate + self.quota_error_rate:
+            return error_response('quota')
+
+        endpoint, params = request.match_info['endpoint'] + '.json', dict(request.query)
+        if self.mode == 'replay':
+            recorded = self.cassette.get(endpoint, params)
+            if recorded is None:
+                return error_response('not_found')
+            return web.json_response(recorded['body'], status=recorded['status'])
+        if self.mode == 'record':
+            async with self.session.get(f"{self.upstream_url}/{endpoint}", params=params) as response:
+                body = await response.json(content_type=None)
+                self.cassette.save(endpoint, params, response.status, body)
+                return web.json_response(body, status=response.status)
+
+        location = resolve_location(params.get('q', ''), self.gazetteer)
+        if location is None:
+            return error_response('not_found')
+        data = make_weather(location, int(params.get('days', 1)), self.now or datetime.datetime.now(datetime.timezone.utc))
+        if endpoint == 'current.json':
+            data.pop('forecast')
+        return web.json_response(data)
+
+    async def _on_startup(self, app: web.Application):
+        if self.mode == 'record':
+            self.session = aiohttp.ClientSession()
+
+    async def _on_cleanup(self, app: web.Application):
+        if self.session:
+            await self.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--mode', choices=['generate', 'record', 'replay'], default='generate')
+    parser.add_argument('--cassette', default='load_testing/weatherapi_cassette.json')
+    parser.add_argument('--upstream-url', default='http://api.weatherapi.com/v1')
+    parser.add_argument('--latency', type=parse_latency, default='fixed:0', help='fixed:MS, uniform:MIN,MAX or lognormal:MEDIAN,P99')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of calls answered with 500')
+    parser.add_argument('--quota-error-rate', type=float, default=0, help='share of calls answered with quota error 2007')
+    parser.add_argument('--hang-rate', type=float, default=0, help='share of calls that never get an answer')
+    parser.add_argument('--seed', type=int, default=0, help='seed for latency and error injection')
+    parser.add_argument('--now', type=datetime.datetime.fromisoformat, help='fixed UTC time for generated payloads')
+    args = parser.parse_args()
+
+    now = args.now.replace(tzinfo=datetime.timezone.utc) if args.now else None
+    fake = FakeWeatherAPI(
+        mode=args.mode,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        quota_error_rate=args.quota_error_rate,
+        hang_rate=args.hang_rate,
+        seed=args.seed,
+        now=now,
+        cassette=Cassette(args.cassette) if args.mode != 'generate' else None,
+        upstream_url=args.upstream_url,
+    )
+    web.run_app(fake.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""The geonamescache city set (cities with 15000+ inhabitants) as rows of the city table, for benchmarks."""
+from typing import List
+
+import geonamescache
+
+
+def geonames_city_rows() -> List[dict]:
+    gc = geonamescache.GeonamesCache()
+    countries = gc.get_countries()
+    return [
+        {
+            'id': int(city_dict['geonameid']),
+            'name': city_dict['name'],
+            'region': city_dict['admin1code'],
+            'country': countries.get(city_dict['countrycode'], {}).get('name', city_dict['countrycode']),
+            'latitude': city_dict['latitude'],
+            'longitude': city_dict['longitude'],
+            'population': city_dict['population'],
+            'timezone': city_dict['timezone'],
+            'alternatenames': [name for name in city_dict['alternatenames'] if name],
+        }
+        for city_dict in gc.get_cities().values()
+    ]
@@ -0,0 +1,16 @@
+"""Timing helpers shared by the benchmarks."""
+import statistics
+import timeit
+from typing import Callable
+
+
+def measure(function: Callable[[], object], number: int = 2000) -> float:
+    """Best of 5 runs, microseconds per call."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def percentiles(samples_ns: list) -> str:
+    """p50, p99 and max of latency samples in nanoseconds, in microseconds."""
+    samples_ns = sorted(samples_ns)
+    p50, p99 = statistics.quantiles(samples_ns, n=100)[49], statistics.quantiles(samples_ns, n=100)[98]
+    return f"p50 {p50 / 1000:.1f} us, p99 {p99 / 1000:.1f} us, max {samples_ns[-1] / 1000:.1f} us"
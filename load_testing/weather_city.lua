@@ -0,0 +1,19 @@
+-- Benchmark of the city weather page against load_testing/fake_weatherapi.py:
+-- wrk -t4 -c64 -d60s -s load_testing/weather_city.lua http://localhost:9999
+-- CITY_IDS sets how many different cities are requested, spreading load over cached and cold entries
+
+local city_count = tonumber(os.getenv("CITY_IDS") or "100")
+local counter = 0
+
+request = function()
+   counter = counter + 1
+   local city_id = (counter % city_count) + 1
+   return wrk.format("GET", "/weather/info?city_id=" .. city_id)
+end
+
+done = function(summary, latency, requests)
+   for _, p in pairs({50, 90, 99, 99.9}) do
+      io.write(string.format("p%g: %.2f ms\n", p, latency:percentile(p) / 1000))
+   end
+   io.write(string.format("non-2xx responses: %d\n", summary.errors.status))
+end
@@ -6,8 +6,10 @@ import geonamescache
 from sqlalchemy import insert, select
 
 from src.models import city
-from src.config import WEATHER_API_KEY
-from src.database import get_async_session
+from src.database import get_async_session, redis_db
+from src.weather_service.client import weatherapi_client
+from src.weather_service.quota import BULK, QuotaExceededError
+from src.weather_service.resilience import CircuitOpenError
 
 
 def get_all_cities() -> dict:
@@ -30,22 +32,16 @@ def get_city_dict_with_country(city_dict: dict) -> dict:
 
 
 async def get_region(latitude: float, longitude: float, city_name: str, alternate_names: list) -> Optional[str]:
-    url = 'http://api.weatherapi.com/v1/current.json'
-    params = {
-        'key': WEATHER_API_KEY,
-        'q': f"{latitude},{longitude}",
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url=url, params=params) as response:
-            data = await response.json()
+    try:
+        data = await weatherapi_client.get('current.json', {'q': f"{latitude},{longitude}"}, priority=BULK)
+        if 'error' in data:
+            return None
+        if data['location']['name'] not in alternate_names:
+            data = await weatherapi_client.get('current.json', {'q': city_name}, priority=BULK)
             if 'error' in data:
                 return None
-        if data['location']['name'] not in alternate_names:
-            params.update(q=city_name)
-            async with session.get(url=url, params=params) as response:
-                data = await response.json()
-                if 'error' in data:
-                    return None
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError, QuotaExceededError):
+        return None
     return data['location'].get('region')
 
 
@@ -87,15 +83,21 @@ async def get_missing_cities():
 async def main():
     cities_dicts = await get_missing_cities()
     cities = cities_dicts.values()
-    for city_dict in cities:
-        region = await get_region(
-            float(city_dict['latitude']),
-            float(city_dict['longitude']),
-            city_dict['name'],
-            city_dict['alternatenames']
-        )
-        city_dict_with_country = get_city_dict_with_country(city_dict)
-        await insert_city(city_dict_with_country, region)
+    await redis_db.connect()
+    await weatherapi_client.connect()
+    try:
+        for city_dict in cities:
+            region = await get_region(
+                float(city_dict['latitude']),
+                float(city_dict['longitude']),
+                city_dict['name'],
+                city_dict['alternatenames']
+            )
+            city_dict_with_country = get_city_dict_with_country(city_dict)
+            await insert_city(city_dict_with_country, region)
+    finally:
+        await weatherapi_client.disconnect()
+        await redis_db.disconnect()
 
 
 if __name__ == '__main__':
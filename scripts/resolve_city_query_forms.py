@@ -0,0 +1,56 @@
+import asyncio
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from src.database import async_session_maker, engine, redis_db
+from src.models import city
+from src.weather_service.cache import weather_cache
+from src.weather_service.client import weatherapi_client
+from src.weather_service.quota import BULK
+from src.weather_service.schemas import CityInDB
+from src.weather_service.utils import CITY_QUERY_FORM_NAME, get_city_weatherapi_data
+
+CONCURRENCY = 10
+
+
+async def get_cities_without_query_form() -> list:
+    query_forms = await weather_cache.get_query_forms()
+    async with async_session_maker() as session:
+        result = await session.execute(select(city))
+        column_names = result.keys()
+        cities = [CityInDB(**dict(zip(column_names, row))) for row in result.fetchall()]
+    return [city_data for city_data in cities if str(city_data.id) not in query_forms]
+
+
+async def resolve_query_form(city_data: CityInDB, semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
+        try:
+            await get_city_weatherapi_data('current.json', city_data, params={}, priority=BULK)
+        except HTTPException as exc:
+            print(f"City {city_data.id} ({city_data.name}) failed: {exc.detail}")
+            return False
+    return True
+
+
+async def main():
+    await redis_db.connect()
+    await weatherapi_client.connect()
+    try:
+        cities = await get_cities_without_query_form()
+        print(f"Resolving query form for {len(cities)} cities")
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        await asyncio.gather(*(resolve_query_form(city_data, semaphore) for city_data in cities))
+
+        query_forms = list((await weather_cache.get_query_forms()).values())
+        mismatched = query_forms.count(CITY_QUERY_FORM_NAME)
+        print(f"{len(query_forms)} cities resolved, {mismatched} ({mismatched / max(len(query_forms), 1):.1%}) by name")
+    finally:
+        await weatherapi_client.disconnect()
+        await redis_db.disconnect()
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
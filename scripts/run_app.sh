@@ -10,6 +10,8 @@ sleep 1
 
 celery -A src.celery_app:celery worker &
 
+celery -A src.celery_app:celery beat &
+
 sleep 2
 
 celery -A src.celery_app:celery flower
@@ -50,7 +50,7 @@ async def find_city_name_matches(
 ):
     if purpose not in ('register', 'settings'):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid purpose!')
-    city_info: List[CityInDB] = await search_cities_db(city_input.title(), session=session)
+    city_info: List[CityInDB] = await search_cities_db(city_input.title(), session=session, fuzzy=True)
     if not city_info:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid city!')
     data = {
@@ -14,6 +14,7 @@ from src.auth.schemas import UserInDB, UserEmailVerificationInfo, CityInDB
 from src.auth.security import verify_password
 from src.database import get_async_session
 from src.models import city, search_history_city_name_db, search_history_coordinates_db
+from src.weather_service.city_index import city_index
 from src.weather_service.schemas import SearchHistoryCityName, SearchHistoryCoordinates
 
 
@@ -123,6 +124,9 @@ async def get_user_city_data(
         city_id: int,
         session: AsyncSession = Depends(get_async_session)
 ) -> Optional[CityInDB]:
+    city_data = city_index.get(city_id)
+    if city_data is not None:
+        return CityInDB(**city_data.dict())
     column_names = [column.name for column in city.columns]
     select_query = select(city).where(city.c.id == city_id)
     result = await session.execute(select_query)
@@ -0,0 +1,77 @@
+import json
+from typing import Any
+
+import msgpack
+import orjson
+import zstandard
+
+from src.config import CACHE_CODEC, CACHE_COMPRESSION, CACHE_COMPRESSION_MIN_BYTES, CACHE_ZSTD_LEVEL
+
+# Format byte prefixed to every payload. Values are never reused, so a payload written by any codec
+# version can be decoded after the configured codec changes and keys migrate as they are rewritten.
+FORMAT_JSON = 0x01
+FORMAT_JSON_ZSTD = 0x02
+FORMAT_MSGPACK = 0x03
+FORMAT_MSGPACK_ZSTD = 0x04
+
+SERIALIZERS = ('json', 'orjson', 'msgpack')
+COMPRESSIONS = ('none', 'zstd')
+
+
+class CacheCodec:
+    """
+    Serializes cache values to bytes with json, orjson or msgpack, optionally zstd-compressing payloads of
+    at least compression_min_bytes. json and orjson write the same format and are interchangeable.
+    Payloads without a format byte are read as plain JSON text, as stored before the codec existed.
+    """
+
+    def __init__(self, serializer: str, compression: str, compression_min_bytes: int, zstd_level: int = 3):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer {serializer!r}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression {compression!r}")
+        self.serializer = serializer
+        self.compression = compression
+        self.compression_min_bytes = compression_min_bytes
+        self._compressor = zstandard.ZstdCompressor(level=zstd_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, value: Any) -> bytes:
+        if self.serializer == 'msgpack':
+            fmt, payload = FORMAT_MSGPACK, msgpack.packb(value)
+        elif self.serializer == 'orjson':
+            fmt, payload = FORMAT_JSON, orjson.dumps(value)
+        else:
+            fmt, payload = FORMAT_JSON, json.dumps(value).encode()
+        if self.compression == 'zstd' and len(payload) >= self.compression_min_bytes:
+            fmt, payload = fmt + 1, self._compressor.compress(payload)
+        return bytes((fmt,)) + payload
+
+    def decode(self, data: bytes) -> Any:
+        fmt, payload = data[0], data[1:]
+        if fmt in (FORMAT_JSON_ZSTD, FORMAT_MSGPACK_ZSTD):
+            fmt, payload = fmt - 1, self._decompressor.decompress(payload)
+        if fmt == FORMAT_MSGPACK:
+            return msgpack.unpackb(payload)
+        if fmt == FORMAT_JSON:
+            return orjson.loads(payload)
+        return orjson.loads(data)
+
+    def to_json(self, data: bytes) -> bytes:
+        """JSON text of a payload; JSON payloads are passed through without being parsed."""
+        fmt, payload = data[0], data[1:]
+        if fmt in (FORMAT_JSON_ZSTD, FORMAT_MSGPACK_ZSTD):
+            fmt, payload = fmt - 1, self._decompressor.decompress(payload)
+        if fmt == FORMAT_MSGPACK:
+            return orjson.dumps(msgpack.unpackb(payload))
+        if fmt == FORMAT_JSON:
+            return payload
+        return data
+
+
+cache_codec = CacheCodec(
+    serializer=CACHE_CODEC,
+    compression=CACHE_COMPRESSION,
+    compression_min_bytes=CACHE_COMPRESSION_MIN_BYTES,
+    zstd_level=CACHE_ZSTD_LEVEL,
+)
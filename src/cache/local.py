@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+LOCAL_CACHE_EVICTIONS = Counter('local_cache_evictions', 'Entries dropped from the in-process cache', ['cache', 'reason'])
+# Set on every change rather than computed on scrape, so that they add up over the worker processes in
+# prometheus multiprocess mode
+LOCAL_CACHE_ENTRIES = Gauge('local_cache_entries', 'Entries held in the in-process cache', ['cache'], multiprocess_mode='livesum')
+LOCAL_CACHE_BYTES = Gauge(
+    'local_cache_bytes', 'Serialized size of entries held in the in-process cache', ['cache'], multiprocess_mode='livesum'
+)
+
+
+class LocalCache:
+    """
+    Size-bounded LRU cache with per-entry TTL, limited both by number of entries and by their total size.
+    Size is what the caller says the entry weighs (the length of its serialized form).
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: OrderedDict[str, Tuple[Any, int, float]] = OrderedDict()
+        self._entries_gauge = LOCAL_CACHE_ENTRIES.labels(cache=name)
+        self._bytes_gauge = LOCAL_CACHE_BYTES.labels(cache=name)
+        self._update_gauges()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key, 'ttl')
+            self._update_gauges()
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key, 'size')
+        self._update_gauges()
+
+    def delete(self, key: str, reason: str = 'invalidation'):
+        if key in self._entries:
+            self._remove(key, reason)
+            self._update_gauges()
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+        self._update_gauges()
+
+    def _update_gauges(self):
+        self._entries_gauge.set(len(self._entries))
+        self._bytes_gauge.set(self.bytes)
+
+    def _remove(self, key: str, reason: Optional[str] = None):
+        value, size, expires_at = self._entries.pop(key)
+        self.bytes -= size
+        if reason is not None:
+            LOCAL_CACHE_EVICTIONS.labels(cache=self.name, reason=reason).inc()
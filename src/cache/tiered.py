@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from prometheus_client import Counter, Histogram
+
+from src.cache.codec import CacheCodec, cache_codec
+from src.cache.local import LocalCache
+from src.config import LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TTL
+from src.database import RedisDB, redis_db
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = Counter('cache_requests', 'Two-tier cache lookups', ['cache', 'tier', 'result'])
+REDIS_COMMAND_SECONDS = Histogram(
+    'cache_redis_command_seconds',
+    'Redis round trips made by the cache (a pipeline is one round trip)',
+    ['cache', 'command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+class TieredCache:
+    """
+    In-process LRU tier in front of Redis.
+
+    Reads check the local tier first and fall back to Redis, keeping the decoded value locally, so hot keys
+    cost neither a network round trip nor decoding. Writes go to both tiers and are broadcast over
+    Redis pub/sub so other workers drop their local copy. Values are shared between callers and must be
+    treated as read-only.
+
+    Every call makes at most one Redis round trip: values are written with their TTL in a single SET,
+    multi-key writes are pipelined and multi-key reads use MGET.
+    """
+
+    def __init__(self, name: str, redis_db: RedisDB, local: LocalCache, codec: CacheCodec):
+        self.name = name
+        self.redis_db = redis_db
+        self.local = local
+        self.codec = codec
+        self.channel = f"cache:invalidate:{name}"
+        self.instance_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        self._listener = asyncio.create_task(self._listen())
+
+    async def disconnect(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        self.local.clear()
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            CACHE_REQUESTS.labels(cache=self.name, tier='local', result='hit').inc()
+            return value
+        CACHE_REQUESTS.labels(cache=self.name, tier='local', result='miss').inc()
+
+        with self._timer('get'):
+            payload = await self.redis_db.raw_redis.get(key)
+        if payload is None:
+            CACHE_REQUESTS.labels(cache=self.name, tier='redis', result='miss').inc()
+            return None
+        CACHE_REQUESTS.labels(cache=self.name, tier='redis', result='hit').inc()
+        value = self.codec.decode(payload)
+        self.local.set(key, value, size=len(payload))
+        return value
+
+    async def get_json(self, key: str) -> Optional[bytes]:
+        """
+        The value as JSON text, for responses that only pass it through. A value missing locally is
+        sent as stored in Redis without being decoded, so it isn't kept in the local tier.
+        """
+        value = self.local.get(key)
+        if value is not None:
+            CACHE_REQUESTS.labels(cache=self.name, tier='local', result='hit').inc()
+            return orjson.dumps(value)
+        CACHE_REQUESTS.labels(cache=self.name, tier='local', result='miss').inc()
+
+        with self._timer('get'):
+            payload = await self.redis_db.raw_redis.get(key)
+        if payload is None:
+            CACHE_REQUESTS.labels(cache=self.name, tier='redis', result='miss').inc()
+            return None
+        CACHE_REQUESTS.labels(cache=self.name, tier='redis', result='hit').inc()
+        return self.codec.to_json(payload)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Returns {key: value} for the keys found, reading the ones missing locally with one MGET."""
+        values = {}
+        missing_keys = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing_keys.append(key)
+            else:
+                values[key] = value
+        CACHE_REQUESTS.labels(cache=self.name, tier='local', result='hit').inc(len(values))
+        CACHE_REQUESTS.labels(cache=self.name, tier='local', result='miss').inc(len(missing_keys))
+        if not missing_keys:
+            return values
+
+        with self._timer('mget'):
+            payloads = await self.redis_db.raw_redis.mget(missing_keys)
+        for key, payload in zip(missing_keys, payloads):
+            if payload is None:
+                CACHE_REQUESTS.labels(cache=self.name, tier='redis', result='miss').inc()
+                continue
+            CACHE_REQUESTS.labels(cache=self.name, tier='redis', result='hit').inc()
+            values[key] = self.codec.decode(payload)
+            self.local.set(key, values[key], size=len(payload))
+        return values
+
+    async def set(self, key: str, value: Any, ex: int):
+        await self.set_many({key: (value, ex)})
+
+    async def set_many(self, items: Dict[str, Tuple[Any, int]]):
+        """Writes {key: (value, ttl_seconds)} to Redis in one pipeline and invalidates other workers' copies."""
+        async with self.redis_db.raw_redis.pipeline(transaction=False) as pipe:
+            for key, (value, ex) in items.items():
+                payload = self.codec.encode(value)
+                pipe.set(key, payload, ex=ex)
+                pipe.publish(self.channel, f"{self.instance_id}:{key}")
+                self.local.set(key, value, size=len(payload))
+            with self._timer('set'):
+                await pipe.execute()
+
+    async def delete(self, key: str):
+        self.local.delete(key)
+        async with self.redis_db.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.publish(self.channel, f"{self.instance_id}:{key}")
+            with self._timer('delete'):
+                await pipe.execute()
+
+    def _timer(self, command: str):
+        return REDIS_COMMAND_SECONDS.labels(cache=self.name, command=command).time()
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis_db.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    origin, key = message['data'].split(':', 1)
+                    if origin != self.instance_id:
+                        self.local.delete(key)
+            except asyncio.CancelledError:
+                await pubsub.reset()
+                raise
+            except Exception:
+                logger.error("cache_invalidation_listener_error", exc_info=True)
+                await pubsub.reset()
+            # Invalidations may have been missed while not subscribed
+            self.local.clear()
+            await asyncio.sleep(1)
+
+
+redis_cache = TieredCache(
+    name='app',
+    redis_db=redis_db,
+    local=LocalCache(name='app', max_entries=LOCAL_CACHE_MAX_ENTRIES, max_bytes=LOCAL_CACHE_MAX_BYTES, ttl=LOCAL_CACHE_TTL),
+    codec=cache_codec,
+)
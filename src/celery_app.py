@@ -1,10 +1,16 @@
 from celery import Celery
 
-from src.config import REDIS_HOST, REDIS_PORT
+from src.config import REDIS_HOST, REDIS_PORT, WEATHER_WARMER_INTERVAL
 
-celery = Celery("src", broker=f"redis://{REDIS_HOST}:{REDIS_PORT}", include=['src.auth.tasks'])
+celery = Celery("src", broker=f"redis://{REDIS_HOST}:{REDIS_PORT}", include=['src.auth.tasks', 'src.weather_service.tasks'])
 
 celery.conf.broker_connection_retry_on_startup = True
+celery.conf.beat_schedule = {
+    'warm-weather-cache': {
+        'task': 'src.weather_service.tasks.schedule_weather_cache_warmup',
+        'schedule': WEATHER_WARMER_INTERVAL,
+    },
+}
 
 if __name__ == '__main__':
     celery.start()
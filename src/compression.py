@@ -0,0 +1,130 @@
+import zlib
+from typing import Iterable, Optional
+
+import brotli
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+COMPRESSED_RESPONSES = Counter('http_compressed_responses', 'Responses compressed on the fly', ['encoding'])
+COMPRESSION_SAVED_BYTES = Counter('http_compression_saved_bytes', 'Bytes saved by compressing responses on the fly')
+
+ENCODINGS = ('br', 'gzip')
+
+
+def negotiate_encoding(accept_encoding: str, encodings: Iterable[str] = ENCODINGS) -> Optional[str]:
+    """Picks the supported encoding with the highest q-value in Accept-Encoding, preferring the first on ties."""
+    qualities = {}
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip()] = quality
+    best_encoding, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress, self._flush = self._compressor.process, self._compressor.finish
+        else:
+            # wbits=31 writes a gzip header; its mtime is zero, so equal bodies compress to equal bytes
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress, self._flush = self._compressor.compress, self._compressor.flush
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        compressed = self._compress(data)
+        return compressed + self._flush() if last else compressed
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli or gzip as negotiated by Accept-Encoding.
+
+    Only bodies of an allowlisted content type and at least minimum_size bytes are compressed; responses
+    already carrying a Content-Encoding (like precompressed static files) are passed through. A strong
+    ETag becomes weak on the compressed representation, which If-None-Match weak comparison still matches.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int,
+            content_types: Iterable[str],
+            gzip_level: int = 6,
+            brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressor, passthrough
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body, more_body = message.get('body', b''), message.get('more_body', False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message['headers'])
+                if not self._should_compress(headers, body, more_body):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                compressed = compressor.compress(body, last=not more_body)
+                headers['Content-Encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                if headers.get('etag', '').startswith('"'):
+                    headers['ETag'] = 'W/' + headers['etag']
+                if more_body:
+                    del headers['Content-Length']
+                else:
+                    headers['Content-Length'] = str(len(compressed))
+                    COMPRESSION_SAVED_BYTES.inc(len(body) - len(compressed))
+                COMPRESSED_RESPONSES.labels(encoding=encoding).inc()
+                await send(start_message)
+                await send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+                return
+
+            await send({'type': 'http.response.body', 'body': compressor.compress(body, last=not more_body), 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if 'content-encoding' in headers:
+            return False
+        if headers.get('content-type', '').split(';')[0].strip() not in self.content_types:
+            return False
+        if more_body:
+            return int(headers.get('content-length', self.minimum_size)) >= self.minimum_size
+        return len(body) >= self.minimum_size
@@ -7,6 +7,47 @@ load_dotenv(override=False)
 CLIENT_ORIGIN = os.getenv('CLIENT_ORIGIN')
 
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'http://api.weatherapi.com/v1')
+WEATHER_API_POOL_LIMIT = int(os.getenv('WEATHER_API_POOL_LIMIT', 100))
+WEATHER_API_POOL_LIMIT_PER_HOST = int(os.getenv('WEATHER_API_POOL_LIMIT_PER_HOST', 30))
+WEATHER_API_KEEPALIVE_TIMEOUT = float(os.getenv('WEATHER_API_KEEPALIVE_TIMEOUT', 30))
+WEATHER_API_DNS_CACHE_TTL = int(os.getenv('WEATHER_API_DNS_CACHE_TTL', 300))
+WEATHER_API_CONNECT_TIMEOUT = float(os.getenv('WEATHER_API_CONNECT_TIMEOUT', 2))
+WEATHER_API_READ_TIMEOUT = float(os.getenv('WEATHER_API_READ_TIMEOUT', 5))
+WEATHER_API_TOTAL_TIMEOUT = float(os.getenv('WEATHER_API_TOTAL_TIMEOUT', 8))
+WEATHER_API_DEADLINE = float(os.getenv('WEATHER_API_DEADLINE', 6))
+WEATHER_API_RETRY_ATTEMPTS = int(os.getenv('WEATHER_API_RETRY_ATTEMPTS', 3))
+WEATHER_API_RETRY_BASE_DELAY = float(os.getenv('WEATHER_API_RETRY_BASE_DELAY', 0.1))
+WEATHER_API_RETRY_MAX_DELAY = float(os.getenv('WEATHER_API_RETRY_MAX_DELAY', 1))
+WEATHER_API_BREAKER_THRESHOLD = int(os.getenv('WEATHER_API_BREAKER_THRESHOLD', 5))
+WEATHER_API_BREAKER_RESET_TIMEOUT = float(os.getenv('WEATHER_API_BREAKER_RESET_TIMEOUT', 30))
+# Hedge a second request after this latency quantile of recent calls, 0 disables hedging
+WEATHER_API_HEDGE_QUANTILE = float(os.getenv('WEATHER_API_HEDGE_QUANTILE', 0))
+WEATHER_API_HEDGE_MIN_SAMPLES = int(os.getenv('WEATHER_API_HEDGE_MIN_SAMPLES', 50))
+# Token bucket shared by every process using WEATHER_API_KEY: refill rate in calls per second and burst size
+WEATHER_API_QUOTA_RATE = float(os.getenv('WEATHER_API_QUOTA_RATE', 5))
+WEATHER_API_QUOTA_BURST = int(os.getenv('WEATHER_API_QUOTA_BURST', 50))
+# Share of the burst that warmer and bulk calls leave untouched for higher priorities
+WEATHER_API_QUOTA_WARMER_RESERVE = float(os.getenv('WEATHER_API_QUOTA_WARMER_RESERVE', 0.2))
+WEATHER_API_QUOTA_BULK_RESERVE = float(os.getenv('WEATHER_API_QUOTA_BULK_RESERVE', 0.5))
+WEATHER_API_QUOTA_INTERACTIVE_MAX_WAIT = float(os.getenv('WEATHER_API_QUOTA_INTERACTIVE_MAX_WAIT', 1))
+WEATHER_API_QUOTA_WARMER_MAX_WAIT = float(os.getenv('WEATHER_API_QUOTA_WARMER_MAX_WAIT', 30))
+WEATHER_API_QUOTA_BULK_MAX_WAIT = float(os.getenv('WEATHER_API_QUOTA_BULK_MAX_WAIT', 300))
+# Farthest from the requested coordinates weatherapi may place the location it resolves them to
+WEATHER_API_COORDINATES_MAX_KM = float(os.getenv('WEATHER_API_COORDINATES_MAX_KM', 100))
+
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv('SINGLEFLIGHT_LOCK_TTL', 15))
+SINGLEFLIGHT_RESULT_TTL = float(os.getenv('SINGLEFLIGHT_RESULT_TTL', 5))
+SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_WAIT_TIMEOUT', 10))
+
+WEATHER_CACHE_SOFT_TTL = int(os.getenv('WEATHER_CACHE_SOFT_TTL', 300))
+WEATHER_CACHE_FORECAST_TTL = int(os.getenv('WEATHER_CACHE_FORECAST_TTL', 900))
+WEATHER_CACHE_GRACE_TTL = int(os.getenv('WEATHER_CACHE_GRACE_TTL', 3600))
+WEATHER_CACHE_STALE_FETCH_TIMEOUT = float(os.getenv('WEATHER_CACHE_STALE_FETCH_TIMEOUT', 2))
+WEATHER_CACHE_ALIAS_TTL = int(os.getenv('WEATHER_CACHE_ALIAS_TTL', 86400))
+WEATHER_CACHE_CITY_TTL = int(os.getenv('WEATHER_CACHE_CITY_TTL', 86400))
+WEATHER_COORDS_BUCKETING = os.getenv('WEATHER_COORDS_BUCKETING', 'geohash')
+WEATHER_COORDS_PRECISION = float(os.getenv('WEATHER_COORDS_PRECISION', 6))
 
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
@@ -23,6 +64,53 @@ DB_PASS_TEST = os.getenv("DB_PASS_TEST")
 REDIS_HOST = os.environ.get("REDIS_HOST")
 REDIS_PORT = os.environ.get("REDIS_PORT")
 
+WEATHER_WARMER_INTERVAL = int(os.getenv('WEATHER_WARMER_INTERVAL', 900))
+WEATHER_WARMER_TOP_POPULATED = int(os.getenv('WEATHER_WARMER_TOP_POPULATED', 100))
+WEATHER_WARMER_TOP_SEARCHED = int(os.getenv('WEATHER_WARMER_TOP_SEARCHED', 100))
+WEATHER_WARMER_SEARCH_DAYS = int(os.getenv('WEATHER_WARMER_SEARCH_DAYS', 7))
+WEATHER_WARMER_MAX_CITIES = int(os.getenv('WEATHER_WARMER_MAX_CITIES', 500))
+WEATHER_WARMER_BATCH_SIZE = int(os.getenv('WEATHER_WARMER_BATCH_SIZE', 10))
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 10000))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv('LOCAL_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', 30))
+
+# Responses of these types are gzip/brotli compressed when at least COMPRESSION_MIN_SIZE bytes long
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))
+COMPRESSION_CONTENT_TYPES = os.getenv(
+    'COMPRESSION_CONTENT_TYPES',
+    'text/html,text/css,text/plain,text/javascript,application/javascript,application/json,image/svg+xml',
+).split(',')
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+
+# In-process cache of rendered page fragments
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 2000))
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Seconds between checks whether the city table changed and the in-process city index must be reloaded
+CITY_INDEX_CHECK_INTERVAL = float(os.getenv('CITY_INDEX_CHECK_INTERVAL', 300))
+# Most suggestions /weather/autocomplete returns; the top suggestions of short prefixes are precomputed up to it
+AUTOCOMPLETE_MAX_LIMIT = int(os.getenv('AUTOCOMPLETE_MAX_LIMIT', 20))
+# Most cities a misspelled city search suggests
+FUZZY_SEARCH_LIMIT = int(os.getenv('FUZZY_SEARCH_LIMIT', 10))
+# Most indexed names a misspelled city search compares to it, those sharing the most trigrams with it; bounds its latency
+FUZZY_MAX_CANDIDATES = int(os.getenv('FUZZY_MAX_CANDIDATES', 64))
+# Coordinates this close to a city with at least this population get that city's forecast
+REVERSE_GEOCODE_MAX_KM = float(os.getenv('REVERSE_GEOCODE_MAX_KM', 10))
+REVERSE_GEOCODE_MIN_POPULATION = int(os.getenv('REVERSE_GEOCODE_MIN_POPULATION', 1000))
+# /weather/nearby: most cities and widest radius, and how many missing forecasts are fetched at once and for how long
+NEARBY_MAX_LIMIT = int(os.getenv('NEARBY_MAX_LIMIT', 20))
+NEARBY_MAX_RADIUS_KM = float(os.getenv('NEARBY_MAX_RADIUS_KM', 100))
+NEARBY_FETCH_CONCURRENCY = int(os.getenv('NEARBY_FETCH_CONCURRENCY', 5))
+NEARBY_FETCH_TIMEOUT = float(os.getenv('NEARBY_FETCH_TIMEOUT', 1.5))
+
+# Serializer (json, orjson or msgpack) and compression (none or zstd) of values stored in Redis
+CACHE_CODEC = os.getenv('CACHE_CODEC', 'orjson')
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'zstd')
+CACHE_COMPRESSION_MIN_BYTES = int(os.getenv('CACHE_COMPRESSION_MIN_BYTES', 1024))
+CACHE_ZSTD_LEVEL = int(os.getenv('CACHE_ZSTD_LEVEL', 3))
+
 RATE_LIMITER_FLAG = os.environ.get("RATE_LIMITER_FLAG")
 
 SECRET_KEY = os.getenv('SECRET_KEY')
@@ -44,3 +132,7 @@ MONGODB_HOST = os.getenv('MONGODB_HOST')
 MONGODB_NAME = os.getenv('MONGODB_NAME')
 MONGODB_URL = os.getenv('MONGODB_URL')
 MONGODB_COLLECTION_NAME = os.getenv('MONGODB_COLLECTION_NAME')
+
+# Directory the worker processes of a multi-worker server share metrics through (prometheus multiprocess mode).
+# prometheus_client reads it when imported, so it must be set in the environment of the server, not in .env
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
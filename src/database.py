@@ -45,13 +45,18 @@ class RedisDB:
     def __init__(self, redis_url):
         self.redis_url = redis_url
         self.redis = None
+        # Client returning bytes as stored, for binary cache payloads
+        self.raw_redis = None
 
     async def connect(self):
         self.redis = await aioredis.from_url(self.redis_url, encoding="utf8", decode_responses=True)
+        self.raw_redis = await aioredis.from_url(self.redis_url)
 
     async def disconnect(self):
         if self.redis:
             await self.redis.close()
+        if self.raw_redis:
+            await self.raw_redis.close()
 
 
 redis_db = RedisDB(redis_url=f"redis://{REDIS_HOST}:{REDIS_PORT}")
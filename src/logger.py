@@ -1,6 +1,7 @@
 import datetime
 import gzip
 import logging.handlers
+import os
 import shutil
 
 from pythonjsonlogger import jsonlogger
@@ -27,6 +28,7 @@ def rotator(source, dest):
 logger = logging.getLogger(__name__)
 max_bytes = 50 * 1024 * 1024
 
+os.makedirs('logs', exist_ok=True)
 handler = logging.handlers.RotatingFileHandler('logs/request_logs.json', maxBytes=max_bytes, backupCount=10)
 handler.addFilter(ExcludeDockerHealthCheckFilter())
 handler.namer, handler.rotator = namer, rotator
@@ -1,36 +1,56 @@
+import gc
 import time
 from typing import Optional
 
 import uvicorn
 
 from fastapi import FastAPI, Request, Depends
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi_limiter import FastAPILimiter
+from prometheus_client import CollectorRegistry, make_asgi_app, multiprocess
 
 from src.auth.jwt import is_authenticated
+from src.cache.tiered import redis_cache
 from src.auth.schemas import UserInDB
+from src.compression import CompressionMiddleware
+from src.config import COMPRESSION_MIN_SIZE, COMPRESSION_CONTENT_TYPES, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, \
+    PROMETHEUS_MULTIPROC_DIR
 from src.database import mongo_db, redis_db
 from src.logger import logger
+from src.static_files import PrecompressedStaticFiles, precompress_static_files
 from src.utils import get_jinja_templates
+from src.weather_service.city_index import city_index
+from src.weather_service.client import weatherapi_client
 from src.weather_service.router import router as router_weather
 from src.auth.router import router as router_auth
 
-app = FastAPI(title='Weather Buddy')
+app = FastAPI(title='Weather Buddy', default_response_class=ORJSONResponse)
 
 
 @app.on_event("startup")
 async def startup():
+    precompress_static_files()
+
     await redis_db.connect()
     await FastAPILimiter.init(redis_db.redis)
+    await redis_cache.connect()
 
     await mongo_db.connect()
+    await weatherapi_client.connect()
+    await city_index.connect()
+    # Once, after the city index is loaded: keeps the cyclic garbage collector from walking its millions
+    # of objects on every full collection. It is still freed by reference counting when a reload replaces
+    # it; reloaded indexes are left to the collector.
+    gc.freeze()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await city_index.disconnect()
+    await redis_cache.disconnect()
     await redis_db.disconnect()
     await mongo_db.disconnect()
+    await weatherapi_client.disconnect()
 
 
 @app.middleware('http')
@@ -54,10 +74,33 @@ async def log_request(request: Request, call_next):
     logger.info("log_request", extra=log_data)
     return response
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    content_types=COMPRESSION_CONTENT_TYPES,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+)
+
 app.include_router(router_weather)
 app.include_router(router_auth)
 
-app.mount('/static', StaticFiles(directory='src/static'), name='static')
+app.mount('/static', PrecompressedStaticFiles(directory='src/static'), name='static')
+
+
+def make_metrics_app():
+    """
+    Metrics of this process, or of every worker process in prometheus multiprocess mode: a scrape reaches
+    one gunicorn worker, which then reports the metrics all of them wrote to PROMETHEUS_MULTIPROC_DIR.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return make_asgi_app()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+    return make_asgi_app(registry=registry)
+
+
+app.mount('/metrics', make_metrics_app(), name='metrics')
 
 templates = get_jinja_templates()
 
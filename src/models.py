@@ -1,6 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import Table, Column, Integer, String, Float, CheckConstraint, ARRAY, ForeignKey, TIMESTAMP
+from sqlalchemy import Table, Column, Integer, String, Float, CheckConstraint, ForeignKey, TIMESTAMP, Index, func, DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY
 from src.database import metadata
 
 city = Table(
@@ -16,6 +17,18 @@ city = Table(
     Column('timezone', String),
     Column('alternatenames', ARRAY(String))
 )
+# City search matches lower(name) = ... OR lower_array(alternatenames) @> ARRAY[...], see search_cities_db.
+# lower_array is declared immutable so it can be indexed; lower(alternatenames::text)::text[] can't, array casts are only stable
+CREATE_LOWER_ARRAY = DDL(
+    "CREATE OR REPLACE FUNCTION lower_array(names text[]) RETURNS text[] LANGUAGE sql IMMUTABLE PARALLEL SAFE "
+    "AS $$ SELECT array_agg(lower(name)) FROM unnest(names) AS name $$"
+)
+DROP_LOWER_ARRAY = DDL("DROP FUNCTION IF EXISTS lower_array(text[])")
+event.listen(city, 'before_create', CREATE_LOWER_ARRAY)
+event.listen(city, 'after_drop', DROP_LOWER_ARRAY)
+Index('ix_city_name_lower', func.lower(city.c.name))
+Index('ix_city_alternatenames_lower', func.lower_array(city.c.alternatenames), postgresql_using='gin')
+
 search_history_city_name_db = Table(
     'search_history_city_name',
     metadata,
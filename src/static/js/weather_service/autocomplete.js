@@ -0,0 +1,37 @@
+function attachCityAutocomplete(inputId) {
+  const input = document.getElementById(inputId);
+  const suggestions = document.createElement("datalist");
+  suggestions.id = `${inputId}-suggestions`;
+  input.setAttribute("list", suggestions.id);
+  input.setAttribute("autocomplete", "off");
+  input.after(suggestions);
+
+  let controller = null;
+  input.addEventListener("input", () => {
+    const query = input.value.trim();
+    if (controller) {
+      controller.abort();
+    }
+    if (query === "") {
+      suggestions.replaceChildren();
+      return;
+    }
+
+    controller = new AbortController();
+    fetch(`/weather/autocomplete?q=${encodeURIComponent(query)}&limit=8`, {
+      signal: controller.signal,
+    })
+      .then((response) => (response.ok ? response.json() : { cities: [] }))
+      .then((data) => {
+        suggestions.replaceChildren(
+          ...data.cities.map((city) => {
+            const option = document.createElement("option");
+            option.value = city.name;
+            option.label = [city.region, city.country].filter(Boolean).join(", ");
+            return option;
+          })
+        );
+      })
+      .catch(() => {});
+  });
+}
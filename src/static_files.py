@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qs
+
+import brotli
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from src.compression import negotiate_encoding
+
+STATIC_DIRECTORY = 'src/static'
+PRECOMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.webmanifest', '.ico')
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def precompress_static_files(directory: str = STATIC_DIRECTORY, minimum_size: int = 500) -> int:
+    """
+    Writes .br and .gz siblings of compressible static files that are missing or older than the file.
+    Safe to run concurrently from several workers. Returns the number of files written.
+    """
+    written = 0
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            if not file_name.endswith(PRECOMPRESSED_EXTENSIONS) or os.path.getsize(path) < minimum_size:
+                continue
+            with open(path, 'rb') as file:
+                content = None
+                for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+                    target = path + suffix
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    content = content if content is not None else file.read()
+                    if encoding == 'br':
+                        compressed = brotli.compress(content, quality=11)
+                    else:
+                        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+                    temporary = f"{target}.{os.getpid()}.tmp"
+                    with open(temporary, 'wb') as target_file:
+                        target_file.write(compressed)
+                    os.replace(temporary, target)
+                    written += 1
+    return written
+
+
+@lru_cache(maxsize=None)
+def static_fingerprint(path: str, directory: str = STATIC_DIRECTORY) -> Optional[str]:
+    """Content hash used to bust caches of a static file, None if the file doesn't exist."""
+    try:
+        with open(os.path.join(directory, path), 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()[:12]
+    except OSError:
+        return None
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Serves the precompressed .br/.gz sibling of a file when the client accepts it. Fingerprinted URLs
+    (?v=<content hash>, see static_fingerprint) are cacheable forever; other URLs must be revalidated.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {'Vary': 'Accept-Encoding', 'Cache-Control': self._cache_control(full_path, scope)}
+        served_path, served_stat = full_path, stat_result
+        encoding = negotiate_encoding(request_headers.get('accept-encoding', ''))
+        if encoding is not None and str(full_path).endswith(PRECOMPRESSED_EXTENSIONS):
+            compressed_path = f"{full_path}{PRECOMPRESSED_SUFFIXES[encoding]}"
+            if os.path.exists(compressed_path):
+                served_path, served_stat = compressed_path, os.stat(compressed_path)
+                headers['Content-Encoding'] = encoding
+
+        response = FileResponse(
+            served_path,
+            status_code=status_code,
+            stat_result=served_stat,
+            method=scope['method'],
+            headers=headers,
+            # Guessed from the original name, not from the .br/.gz file actually served
+            media_type=mimetypes.guess_type(str(full_path))[0] or 'text/plain',
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _cache_control(self, full_path, scope: Scope) -> str:
+        version = parse_qs(scope.get('query_string', b'').decode()).get('v', [None])[0]
+        relative_path = os.path.relpath(full_path, self.directory)
+        if version and version == static_fingerprint(relative_path, str(self.directory)):
+            return IMMUTABLE_CACHE_CONTROL
+        return 'no-cache'
@@ -1,10 +1,42 @@
+import hashlib
+import os
+from functools import lru_cache
+
 from starlette.templating import Jinja2Templates
 
+from src.static_files import PRECOMPRESSED_SUFFIXES, STATIC_DIRECTORY, static_fingerprint
+
+TEMPLATES_DIRECTORY = 'src/templates'
+
 
 def get_jinja_templates():
     def my_url_for(src, path):
+        if src == 'static' and static_fingerprint(path):
+            return f"/{src}/{path}?v={static_fingerprint(path)}"
         return f"/{src}/{path}"
 
-    templates = Jinja2Templates(directory='src/templates')
+    templates = Jinja2Templates(directory=TEMPLATES_DIRECTORY)
     templates.env.globals['my_url_for'] = my_url_for
     return templates
+
+
+@lru_cache(maxsize=None)
+def templates_version(templates_directory: str = TEMPLATES_DIRECTORY, static_directory: str = STATIC_DIRECTORY) -> str:
+    """
+    Content hash of the templates and static files, part of the validators of rendered pages so that a
+    deploy changing the markup or the assets it links to is not answered with 304 Not Modified.
+    Contents rather than mtimes, so that every host of a deploy agrees on it.
+    """
+    digest = hashlib.sha256()
+    for directory in (templates_directory, static_directory):
+        for root, directories, file_names in os.walk(directory):
+            directories.sort()
+            for file_name in sorted(file_names):
+                # Precompressed siblings, and the temporary files they are written to, derive from the file next to them
+                if file_name.endswith((*PRECOMPRESSED_SUFFIXES.values(), '.tmp')):
+                    continue
+                path = os.path.join(root, file_name)
+                digest.update(os.path.relpath(path, directory).encode())
+                with open(path, 'rb') as file:
+                    digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()[:12]
@@ -0,0 +1,279 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Histogram
+
+from src.cache.tiered import TieredCache, redis_cache
+from src.config import WEATHER_CACHE_ALIAS_TTL, WEATHER_CACHE_CITY_TTL, WEATHER_CACHE_FORECAST_TTL, WEATHER_COORDS_BUCKETING, \
+    WEATHER_COORDS_PRECISION, WEATHER_CACHE_SOFT_TTL, WEATHER_CACHE_GRACE_TTL, WEATHER_CACHE_STALE_FETCH_TIMEOUT
+from src.database import RedisDB, redis_db
+from src.weather_service.geo import coordinates_bucket, haversine_km
+from src.weather_service.schemas import CityInDB
+from src.weather_service.singleflight import SingleFlight, weather_singleflight
+
+WEATHER_CACHE_REQUESTS = Counter('weather_cache_requests', 'Forecast cache lookups', ['path', 'bucket', 'result'])
+COORDINATES_RESOLUTION_DISTANCE = Histogram(
+    'weather_coordinates_resolution_distance_km',
+    'Distance between requested coordinates and the upstream location their bucket resolved to',
+    ['bucket'],
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100),
+)
+WEATHER_CACHE_FILL_SECONDS = Histogram(
+    'weather_cache_fill_seconds', 'Time spent fetching and processing a forecast before caching it', ['source']
+)
+WEATHER_CACHE_WARM_HITS = Counter('weather_cache_warm_hits', 'Request hits on forecasts filled by the cache warmer')
+WEATHER_CACHE_WARM_SAVED_SECONDS = Counter(
+    'weather_cache_warm_saved_seconds',
+    'Fill time of warmer-filled forecasts summed over their request hits (upper bound of request-path latency saved)'
+)
+WEATHER_CACHE_REFRESHES = Counter('weather_cache_background_refreshes', 'Background forecast refreshes', ['result'])
+
+
+class WeatherCache:
+    """
+    Forecast cache shared by the city and coordinates routes.
+
+    Forecasts are stored once per upstream location (the lat/lon weatherapi resolved the query to) and
+    every lookup key - a city id or a pair of coordinates - is an alias pointing to that location, so
+    a city page and a coordinates search that land on the same place reuse one entry. Coordinates are
+    quantized (geohash or fixed-degree grid) before aliasing, so nearby points share the alias too.
+
+    Entries are served fresh until soft_ttl, then served stale while one background refresh runs until
+    hard_ttl, after which they are refetched synchronously. If that refetch fails because weatherapi is
+    unavailable or slow, the expired entry is still served for up to grace_ttl.
+    """
+
+    def __init__(
+            self,
+            redis_db: RedisDB,
+            cache: TieredCache,
+            singleflight: SingleFlight,
+            soft_ttl: int,
+            hard_ttl: int,
+            grace_ttl: int,
+            stale_fetch_timeout: float,
+            alias_ttl: int,
+            city_ttl: int,
+            coordinates_bucketing: str,
+            coordinates_precision: float,
+    ):
+        self.redis_db = redis_db
+        self.cache = cache
+        self.singleflight = singleflight
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.grace_ttl = grace_ttl
+        self.stale_fetch_timeout = stale_fetch_timeout
+        self.alias_ttl = alias_ttl
+        self.city_ttl = city_ttl
+        self.coordinates_bucketing = coordinates_bucketing
+        self.coordinates_precision = coordinates_precision
+        self._refresh_tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def city_alias(city_id: int) -> str:
+        return f"city:{city_id}"
+
+    @staticmethod
+    def forecast_key(location_id: str) -> str:
+        # v2: forecast_data is stored in the columnar layout of src.weather_service.forecast
+        return f"weather:forecast:v2:{location_id}"
+
+    def coordinates_alias(self, latitude: float, longitude: float) -> str:
+        return f"coords:{coordinates_bucket(latitude, longitude, self.coordinates_bucketing, self.coordinates_precision)}"
+
+    @staticmethod
+    def location_id(result_data: dict) -> str:
+        location_data = result_data['location_data']
+        return f"{location_data['latitude']}:{location_data['longitude']}"
+
+    async def get_entry(self, alias: str) -> Optional[dict]:
+        location_id = await self.cache.get(f"weather:alias:{alias}")
+        if location_id is None:
+            return None
+        return await self.cache.get(self.forecast_key(location_id))
+
+    async def get_entries(self, aliases: List[str]) -> Dict[str, dict]:
+        """Batch get_entry for multi-location views: two round trips for any number of aliases."""
+        location_ids = await self.cache.get_many([f"weather:alias:{alias}" for alias in aliases])
+        entries = await self.cache.get_many([self.forecast_key(location_id) for location_id in set(location_ids.values())])
+        found = {}
+        for alias in aliases:
+            entry = entries.get(self.forecast_key(location_ids.get(f'weather:alias:{alias}')))
+            if entry is not None:
+                found[alias] = entry
+        return found
+
+    async def get_forecast(self, alias: str) -> Optional[dict]:
+        entry = await self.get_entry(alias)
+        return entry['data'] if entry else None
+
+    async def set_forecast(self, alias: str, result_data: dict, source: str = 'request', fill_seconds: float = 0.0) -> dict:
+        location_id = self.location_id(result_data)
+        entry = {'stored_at': time.time(), 'source': source, 'fill_seconds': fill_seconds, 'data': result_data}
+        await self.cache.set_many({
+            self.forecast_key(location_id): (entry, self.hard_ttl + self.grace_ttl),
+            f"weather:alias:{alias}": (location_id, self.alias_ttl),
+        })
+        return entry
+
+    async def get_or_fetch(self, alias: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        entry = await self.get_or_fetch_entry(alias, fetch)
+        return entry['data']
+
+    async def get_or_fetch_entry(self, alias: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        """Like get_or_fetch, but returns the whole entry: its stored_at identifies the version of the data."""
+        path, bucket = alias.split(':')[:2]
+        if path != 'coords':
+            bucket = ''
+
+        def count(result: str):
+            WEATHER_CACHE_REQUESTS.labels(path=path, bucket=bucket, result=result).inc()
+
+        entry = await self.get_entry(alias)
+        if entry is None:
+            count('miss')
+            return await self._fill(alias, fetch)
+
+        age = time.time() - entry['stored_at']
+        if age < self.hard_ttl and entry.get('source') == 'warmer':
+            WEATHER_CACHE_WARM_HITS.inc()
+            WEATHER_CACHE_WARM_SAVED_SECONDS.inc(entry['fill_seconds'])
+        if age < self.soft_ttl:
+            count('hit')
+            return entry
+        if age < self.hard_ttl:
+            count('stale')
+            await self._schedule_refresh(alias, fetch)
+            return entry
+
+        count('expired')
+        try:
+            return await asyncio.wait_for(self._fill(alias, fetch), timeout=self.stale_fetch_timeout)
+        except asyncio.TimeoutError:
+            count('stale_on_timeout')
+        except HTTPException as exc:
+            if exc.status_code < 500:
+                raise
+            count('stale_on_error')
+        return entry
+
+    async def get_or_fetch_entries(
+            self, fetches: Dict[str, Callable[[], Awaitable[dict]]], concurrency: int, timeout: float
+    ) -> Dict[str, dict]:
+        """
+        get_or_fetch_entry for many aliases with bounded latency. Fresh entries are read in one batch and
+        the others go through get_or_fetch_entry, at most concurrency at a time, for up to timeout seconds.
+        Aliases still missing by then or whose fetch failed are left out; fills already started complete
+        in the background and are cached.
+        """
+        entries = await self.get_entries(list(fetches))
+        now = time.time()
+        found = {alias: entry for alias, entry in entries.items() if now - entry['stored_at'] < self.soft_ttl}
+        for alias in found:
+            path, bucket = alias.split(':')[:2]
+            WEATHER_CACHE_REQUESTS.labels(path=path, bucket=bucket if path == 'coords' else '', result='hit').inc()
+        missing = [alias for alias in fetches if alias not in found]
+        if not missing:
+            return found
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get_or_fetch(alias: str) -> dict:
+            async with semaphore:
+                return await self.get_or_fetch_entry(alias, fetches[alias])
+
+        tasks = {asyncio.create_task(get_or_fetch(alias)): alias for alias in missing}
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is None:
+                found[tasks[task]] = task.result()
+        return found
+
+    async def _fill(self, alias: str, fetch: Callable[[], Awaitable[dict]], source: str = 'request') -> dict:
+        async def fetch_and_cache() -> dict:
+            start_time = time.perf_counter()
+            data = await fetch()
+            fill_seconds = time.perf_counter() - start_time
+            WEATHER_CACHE_FILL_SECONDS.labels(source=source).observe(fill_seconds)
+            return await self.set_forecast(alias, data, source=source, fill_seconds=fill_seconds)
+
+        return await self.singleflight.do(alias, fetch_and_cache)
+
+    async def warm(self, alias: str, fetch: Callable[[], Awaitable[dict]]) -> bool:
+        """Refills the entry unless it is still fresh. Returns whether upstream was called."""
+        entry = await self.get_entry(alias)
+        if entry is not None and time.time() - entry['stored_at'] < self.soft_ttl:
+            return False
+        await self._fill(alias, fetch, source='warmer')
+        return True
+
+    async def _schedule_refresh(self, alias: str, fetch: Callable[[], Awaitable[dict]]):
+        refresh_lock_ttl = int(self.singleflight.lock_ttl * 1000)
+        if not await self.redis_db.redis.set(f"weather:refresh:{alias}", 1, nx=True, px=refresh_lock_ttl):
+            return
+        task = asyncio.create_task(self._refresh(alias, fetch))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, alias: str, fetch: Callable[[], Awaitable[dict]]):
+        try:
+            await self._fill(alias, fetch)
+        except Exception:
+            WEATHER_CACHE_REFRESHES.labels(result='failed').inc()
+        else:
+            WEATHER_CACHE_REFRESHES.labels(result='ok').inc()
+        finally:
+            await self.redis_db.redis.delete(f"weather:refresh:{alias}")
+
+    async def get_or_fetch_by_coordinates(self, latitude: float, longitude: float, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        entry = await self.get_or_fetch_entry_by_coordinates(latitude, longitude, fetch)
+        return entry['data']
+
+    async def get_or_fetch_entry_by_coordinates(
+            self, latitude: float, longitude: float, fetch: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        alias = self.coordinates_alias(latitude, longitude)
+        entry = await self.get_or_fetch_entry(alias, fetch)
+        location_data = entry['data']['location_data']
+        distance = haversine_km(latitude, longitude, float(location_data['latitude']), float(location_data['longitude']))
+        COORDINATES_RESOLUTION_DISTANCE.labels(bucket=alias.split(':')[1]).observe(distance)
+        return entry
+
+    async def get_city_data(self, city_id: int) -> Optional[CityInDB]:
+        city_dict = await self.cache.get(f"city:{city_id}")
+        if city_dict is None:
+            return None
+        return CityInDB(**city_dict)
+
+    async def set_city_data(self, city_data: CityInDB):
+        await self.cache.set(f"city:{city_data.id}", city_data.dict(), ex=self.city_ttl)
+
+    async def get_query_form(self, city_id: int) -> Optional[str]:
+        """The weatherapi query form ("coordinates" or "name") that resolves to the city, if already known."""
+        return await self.redis_db.redis.hget("weather:query_form", str(city_id))
+
+    async def get_query_forms(self) -> Dict[str, str]:
+        return await self.redis_db.redis.hgetall("weather:query_form")
+
+    async def set_query_form(self, city_id: int, query_form: str):
+        await self.redis_db.redis.hset("weather:query_form", str(city_id), query_form)
+
+
+weather_cache = WeatherCache(
+    redis_db=redis_db,
+    cache=redis_cache,
+    singleflight=weather_singleflight,
+    soft_ttl=WEATHER_CACHE_SOFT_TTL,
+    hard_ttl=WEATHER_CACHE_FORECAST_TTL,
+    grace_ttl=WEATHER_CACHE_GRACE_TTL,
+    stale_fetch_timeout=WEATHER_CACHE_STALE_FETCH_TIMEOUT,
+    alias_ttl=WEATHER_CACHE_ALIAS_TTL,
+    city_ttl=WEATHER_CACHE_CITY_TTL,
+    coordinates_bucketing=WEATHER_COORDS_BUCKETING,
+    coordinates_precision=WEATHER_COORDS_PRECISION,
+)
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import select, text
+from sqlalchemy.orm import sessionmaker
+
+from src.config import CITY_INDEX_CHECK_INTERVAL, AUTOCOMPLETE_MAX_LIMIT, FUZZY_SEARCH_LIMIT, FUZZY_MAX_CANDIDATES, \
+    REVERSE_GEOCODE_MAX_KM, REVERSE_GEOCODE_MIN_POPULATION
+from src.database import async_session_maker
+from src.models import city
+from src.weather_service.prefix_index import PrefixIndex
+from src.weather_service.schemas import CityInDB
+from src.weather_service.spatial_index import SpatialIndex
+from src.weather_service.trigram_index import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+CITY_INDEX_CITIES = Gauge('city_index_cities', 'Cities in the in-process city index', multiprocess_mode='liveall')
+CITY_INDEX_BYTES = Gauge('city_index_bytes', 'Approximate memory held by the in-process city index', multiprocess_mode='liveall')
+CITY_INDEX_LOADS = Counter('city_index_loads', 'City index version checks by outcome', ['result'])
+CITY_INDEX_LOOKUPS = Counter('city_index_lookups', 'City index lookups', ['kind', 'result'])
+
+# Changes whenever rows are added or deleted; an index-only scan of the primary key, not a scan and
+# hash of every row. Rows updated in place are picked up by the next worker restart.
+VERSION_QUERY = text("SELECT count(*), coalesce(max(id), 0) FROM city")
+
+
+def normalize_name(name: str) -> str:
+    return ' '.join(name.casefold().split())
+
+
+def fuzzy_max_distance(name: str) -> int:
+    """Typos tolerated in a city name: none in very short names, where one edit makes another city."""
+    if len(name) < 4:
+        return 0
+    return 1 if len(name) <= 8 else 2
+
+
+class CityTable:
+    """
+    Immutable snapshot of the city table. Numeric columns are packed into arrays and the few distinct
+    regions, countries and timezones are interned; cities are addressed by their position.
+    """
+
+    def __init__(self, rows: Iterable[dict], version: str):
+        self.version = version
+        self.ids = array('q')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.populations = array('q')
+        self.names: List[str] = []
+        self.regions: List[str] = []
+        self.countries: List[str] = []
+        self.timezones: List[str] = []
+        self.alternatenames: List[Tuple[str, ...]] = []
+        for row in rows:
+            self.ids.append(row['id'])
+            self.latitudes.append(row['latitude'])
+            self.longitudes.append(row['longitude'])
+            self.populations.append(row['population'] or 0)
+            self.names.append(row['name'])
+            self.regions.append(sys.intern(row['region'] or ''))
+            self.countries.append(sys.intern(row['country']))
+            self.timezones.append(sys.intern(row['timezone'] or ''))
+            self.alternatenames.append(tuple(row['alternatenames'] or ()))
+
+        self.positions: Dict[int, int] = {city_id: position for position, city_id in enumerate(self.ids)}
+        by_name: Dict[str, List[int]] = {}
+        for position, name in enumerate(self.names):
+            for key in {normalize_name(name), *map(normalize_name, self.alternatenames[position])}:
+                by_name.setdefault(key, []).append(position)
+        # Most populated first, the order search results are shown in
+        self.by_name: Dict[str, Tuple[int, ...]] = {
+            key: tuple(sorted(positions, key=self.populations.__getitem__, reverse=True) if len(positions) > 1 else positions)
+            for key, positions in by_name.items()
+        }
+        self.prefixes = PrefixIndex(self.by_name, scores=self.populations, max_limit=AUTOCOMPLETE_MAX_LIMIT)
+        # Primary names only: alternate names are ten times as many and would make a fuzzy lookup ten times slower
+        self.fuzzy_names = TrigramIndex(sorted({normalize_name(name) for name in self.names}))
+        self.locations = SpatialIndex(self.latitudes, self.longitudes, self.populations)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def city(self, position: int) -> CityInDB:
+        # Values were validated when loaded, construct() skips validating them again on every lookup
+        return CityInDB.construct(
+            id=self.ids[position],
+            name=self.names[position],
+            region=self.regions[position],
+            country=self.countries[position],
+            latitude=self.latitudes[position],
+            longitude=self.longitudes[position],
+            population=self.populations[position],
+            timezone=self.timezones[position],
+            alternatenames=list(self.alternatenames[position]),
+        )
+
+    def summary(self, position: int) -> dict:
+        """The fields city search results show, see search_cities_data."""
+        return {
+            "name": self.names[position],
+            "country": self.countries[position],
+            "region": self.regions[position],
+            "latitude": self.latitudes[position],
+            "longitude": self.longitudes[position],
+            "population": self.populations[position],
+            "id": self.ids[position],
+        }
+
+    def fuzzy_search(self, name: str, limit: int) -> List[int]:
+        """Positions of the cities named within a few typos of name, closest names and most populated first."""
+        name = normalize_name(name)
+        max_distance = fuzzy_max_distance(name)
+        if max_distance == 0:
+            return []
+        ranked = sorted(
+            (distance, -self.populations[position], position)
+            for distance, key_index in self.fuzzy_names.search(name, max_distance, FUZZY_MAX_CANDIDATES)
+            for position in self.by_name[self.fuzzy_names.keys[key_index]]
+        )
+        positions = list(dict.fromkeys(position for _, _, position in ranked))
+        return positions[:limit]
+
+    def estimate_bytes(self) -> int:
+        """Containers plus every distinct string they reference, shared ones counted once."""
+        containers = [
+            self.ids, self.latitudes, self.longitudes, self.populations, self.names, self.regions, self.countries,
+            self.timezones, self.alternatenames, *self.alternatenames, self.positions, self.by_name, *self.by_name.values(),
+            self.fuzzy_names.keys,
+        ]
+        strings = {id(string): string for string in (*self.names, *self.regions, *self.countries, *self.timezones, *self.by_name, *self.fuzzy_names.keys)}
+        strings.update((id(string), string) for names in self.alternatenames for string in names)
+        return (
+            sum(map(sys.getsizeof, containers)) + sum(map(sys.getsizeof, strings.values()))
+            + self.prefixes.estimate_bytes() + self.fuzzy_names.estimate_bytes() + self.locations.estimate_bytes()
+        )
+
+
+class CityIndex:
+    """
+    In-process copy of the city table for name and id lookups without a database round trip.
+
+    The table is loaded at startup and its version is checked every check_interval seconds; the index
+    is rebuilt in a thread when it changed. Until the first load succeeds, and for cities added since
+    the last one, lookups miss and callers fall back to the database.
+    """
+
+    def __init__(self, session_maker: sessionmaker, check_interval: float):
+        self.session_maker = session_maker
+        self.check_interval = check_interval
+        self.table: Optional[CityTable] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        await self.refresh()
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def disconnect(self):
+        if self._watcher:
+            self._watcher.cancel()
+            self._watcher = None
+
+    async def refresh(self) -> bool:
+        """Reloads the index if the table changed since it was built. Returns whether it was reloaded."""
+        try:
+            async with self.session_maker() as session:
+                count, max_id = (await session.execute(VERSION_QUERY)).one()
+                version = f"{count}:{max_id}"
+                if self.table is not None and self.table.version == version:
+                    CITY_INDEX_LOADS.labels(result='unchanged').inc()
+                    return False
+                rows = (await session.execute(select(city))).mappings().all()
+            table = await asyncio.to_thread(CityTable, rows, version)
+        except Exception:
+            CITY_INDEX_LOADS.labels(result='error').inc()
+            logger.error("city_index_load_error", exc_info=True)
+            return False
+        self.table = table
+        CITY_INDEX_LOADS.labels(result='loaded').inc()
+        CITY_INDEX_CITIES.set(len(table))
+        CITY_INDEX_BYTES.set(await asyncio.to_thread(table.estimate_bytes))
+        logger.info("city_index_loaded", extra={'cities': len(table), 'version': version})
+        return True
+
+    def get(self, city_id: int) -> Optional[CityInDB]:
+        table = self.table
+        position = table.positions.get(city_id) if table is not None else None
+        CITY_INDEX_LOOKUPS.labels(kind='id', result='miss' if position is None else 'hit').inc()
+        return None if position is None else table.city(position)
+
+    def autocomplete(self, prefix: str, limit: int) -> List[dict]:
+        """
+        Summaries of the most populated cities with a name or alternate name starting with prefix.
+        Nothing is suggested until the index is loaded.
+        """
+        table = self.table
+        positions = table.prefixes.top(normalize_name(prefix), limit) if table is not None else []
+        CITY_INDEX_LOOKUPS.labels(kind='prefix', result='hit' if positions else 'miss').inc()
+        return [table.summary(position) for position in positions]
+
+    def search(self, name: str) -> List[CityInDB]:
+        """Cities named or alternately named name (case-insensitively), most populated first."""
+        table = self.table
+        positions = table.by_name.get(normalize_name(name), ()) if table is not None else ()
+        CITY_INDEX_LOOKUPS.labels(kind='name', result='hit' if positions else 'miss').inc()
+        return [table.city(position) for position in positions]
+
+    def fuzzy_search(self, name: str, limit: int = FUZZY_SEARCH_LIMIT) -> List[CityInDB]:
+        """
+        Cities named within a few typos of name, closest names first and then most populated first,
+        for names search doesn't find.
+        """
+        table = self.table
+        positions = table.fuzzy_search(name, limit) if table is not None else []
+        CITY_INDEX_LOOKUPS.labels(kind='fuzzy', result='hit' if positions else 'miss').inc()
+        return [table.city(position) for position in positions]
+
+    def reverse_geocode(
+            self,
+            latitude: float,
+            longitude: float,
+            max_km: float = REVERSE_GEOCODE_MAX_KM,
+            min_population: int = REVERSE_GEOCODE_MIN_POPULATION
+    ) -> Optional[CityInDB]:
+        """The nearest city within max_km with at least min_population, if any."""
+        table = self.table
+        nearest = table.locations.nearest(latitude, longitude, 1, max_km, min_population) if table is not None else []
+        CITY_INDEX_LOOKUPS.labels(kind='nearest', result='hit' if nearest else 'miss').inc()
+        return table.city(nearest[0][1]) if nearest else None
+
+    def nearby(self, latitude: float, longitude: float, limit: int, radius_km: float, min_population: int = 0) -> List[Tuple[float, CityInDB]]:
+        """(distance in km, city) of the limit nearest cities within radius_km, nearest first."""
+        table = self.table
+        nearest = table.locations.nearest(latitude, longitude, limit, radius_km, min_population) if table is not None else []
+        CITY_INDEX_LOOKUPS.labels(kind='nearby', result='hit' if nearest else 'miss').inc()
+        return [(distance, table.city(position)) for distance, position in nearest]
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.refresh()
+
+
+city_index = CityIndex(session_maker=async_session_maker, check_interval=CITY_INDEX_CHECK_INTERVAL)
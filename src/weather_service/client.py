@@ -0,0 +1,213 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+from prometheus_client import Counter, Gauge
+
+from src.config import WEATHER_API_KEY, WEATHER_API_URL, WEATHER_API_POOL_LIMIT, WEATHER_API_POOL_LIMIT_PER_HOST, \
+    WEATHER_API_KEEPALIVE_TIMEOUT, WEATHER_API_DNS_CACHE_TTL, WEATHER_API_CONNECT_TIMEOUT, WEATHER_API_READ_TIMEOUT, \
+    WEATHER_API_TOTAL_TIMEOUT, WEATHER_API_DEADLINE, WEATHER_API_RETRY_ATTEMPTS, WEATHER_API_RETRY_BASE_DELAY, \
+    WEATHER_API_RETRY_MAX_DELAY, WEATHER_API_BREAKER_THRESHOLD, WEATHER_API_BREAKER_RESET_TIMEOUT, WEATHER_API_HEDGE_QUANTILE, \
+    WEATHER_API_HEDGE_MIN_SAMPLES
+from src.weather_service.quota import INTERACTIVE, QuotaScheduler, weatherapi_quota
+from src.weather_service.resilience import CircuitBreaker, LatencyTracker, hedge, retry_with_jitter
+
+POOL_WAITS = Counter('weatherapi_pool_waits', 'Requests that had to wait for a free weatherapi connection')
+POOL_CONNECTIONS_CREATED = Counter('weatherapi_pool_connections_created', 'New TCP connections opened to weatherapi')
+POOL_CONNECTIONS_REUSED = Counter('weatherapi_pool_connections_reused', 'Requests served over a kept-alive connection')
+DEADLINES_EXCEEDED = Counter('weatherapi_deadlines_exceeded', 'weatherapi calls abandoned after the request deadline')
+# Kept up to date by the client rather than read from the connector on scrape, so that they add up over
+# the worker processes in prometheus multiprocess mode
+POOL_IN_FLIGHT = Gauge(
+    'weatherapi_pool_in_flight', 'Requests to weatherapi waiting for or holding a pooled connection', multiprocess_mode='livesum'
+)
+POOL_WAITING = Gauge('weatherapi_pool_waiting', 'Requests currently waiting for a free weatherapi connection', multiprocess_mode='livesum')
+
+
+class WeatherAPIClient:
+    """
+    App-lifetime HTTP client for weatherapi.com with a shared keep-alive connection pool.
+
+    Every call is bounded by a deadline and guarded by a circuit breaker. Within the deadline connection
+    errors, timeouts and 5xx responses are retried with jittered backoff, and when hedge_quantile is set a
+    second request is sent if the first is slower than that quantile of recent latencies.
+    Each request to upstream, retries and hedges included, spends a token from the shared quota.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            api_key: str,
+            limit: int,
+            limit_per_host: int,
+            keepalive_timeout: float,
+            dns_cache_ttl: int,
+            timeout: aiohttp.ClientTimeout,
+            deadline: float,
+            retry_attempts: int,
+            retry_base_delay: float,
+            retry_max_delay: float,
+            breaker: CircuitBreaker,
+            hedge_quantile: float,
+            hedge_min_samples: int,
+            quota: Optional[QuotaScheduler],
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry_attempts = retry_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker = breaker
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker(window=max(hedge_min_samples * 10, 100))
+        self.quota = quota
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def connect(self):
+        self.connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_queued_start.append(self._on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(self._on_connection_queued_end)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        self.session = aiohttp.ClientSession(
+            connector=self.connector,
+            timeout=self.timeout,
+            trace_configs=[trace_config],
+        )
+
+    async def disconnect(self):
+        if self.session:
+            await self.session.close()
+        self.session = None
+        self.connector = None
+
+    async def get(self, endpoint: str, params: dict, priority: str = INTERACTIVE) -> dict:
+        """
+        Performs GET request to weatherapi endpoint (e.g. "forecast.json") and returns decoded JSON body.
+        Raises aiohttp.ClientError or asyncio.TimeoutError when upstream can't be reached in time,
+        CircuitOpenError without calling upstream while the circuit is open
+        and QuotaExceededError when no quota is left for the priority.
+        """
+        prepaid = [True]
+
+        async def request():
+            # The first request uses the token acquired below, retries and hedges must not wait for one
+            if not prepaid and self.quota:
+                await self.quota.acquire(priority, wait=False)
+            prepaid.clear()
+            return await self._request(endpoint, params)
+
+        # Before taking a token: calls rejected by an open circuit must not spend the shared quota
+        self.breaker.before_call()
+        try:
+            if self.quota:
+                await self.quota.acquire(priority)
+            data = await asyncio.wait_for(
+                retry_with_jitter(
+                    'weatherapi',
+                    lambda: hedge('weatherapi', request, self._hedge_delay()),
+                    attempts=self.retry_attempts,
+                    base_delay=self.retry_base_delay,
+                    max_delay=self.retry_max_delay,
+                    retry_on=(aiohttp.ClientError, asyncio.TimeoutError),
+                ),
+                timeout=self.deadline,
+            )
+        except asyncio.TimeoutError:
+            DEADLINES_EXCEEDED.inc()
+            self.breaker.record_failure()
+            raise
+        except aiohttp.ClientError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_cancel()
+            raise
+        self.breaker.record_success()
+        return data
+
+    async def _request(self, endpoint: str, params: dict) -> dict:
+        start_time = time.perf_counter()
+        url = f"{self.base_url}/{endpoint}"
+        self.in_flight += 1
+        POOL_IN_FLIGHT.inc()
+        try:
+            async with self.session.get(url=url, params={'key': self.api_key, **params}) as response:
+                if response.status >= 500:
+                    response.raise_for_status()
+                data = await response.json(content_type=None)
+        finally:
+            self.in_flight -= 1
+            POOL_IN_FLIGHT.dec()
+        self.latency.observe(time.perf_counter() - start_time)
+        return data
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_quantile or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_quantile)
+
+    def pool_stats(self) -> dict:
+        """Requests waiting for or holding a connection, those of them waiting, and the pool limits."""
+        return {'in_flight': self.in_flight, 'waiting': self.waiting, 'limit': self.limit, 'limit_per_host': self.limit_per_host}
+
+    async def _on_connection_queued_start(self, session, context: SimpleNamespace, params):
+        self.waiting += 1
+        POOL_WAITING.inc()
+        POOL_WAITS.inc()
+
+    async def _on_connection_queued_end(self, session, context: SimpleNamespace, params):
+        self.waiting -= 1
+        POOL_WAITING.dec()
+
+    async def _on_connection_create_end(self, session, context: SimpleNamespace, params):
+        POOL_CONNECTIONS_CREATED.inc()
+
+    async def _on_connection_reuseconn(self, session, context: SimpleNamespace, params):
+        POOL_CONNECTIONS_REUSED.inc()
+
+
+weatherapi_client = WeatherAPIClient(
+    base_url=WEATHER_API_URL,
+    api_key=WEATHER_API_KEY,
+    limit=WEATHER_API_POOL_LIMIT,
+    limit_per_host=WEATHER_API_POOL_LIMIT_PER_HOST,
+    keepalive_timeout=WEATHER_API_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=WEATHER_API_DNS_CACHE_TTL,
+    timeout=aiohttp.ClientTimeout(
+        total=WEATHER_API_TOTAL_TIMEOUT,
+        connect=WEATHER_API_CONNECT_TIMEOUT,
+        sock_read=WEATHER_API_READ_TIMEOUT,
+    ),
+    deadline=WEATHER_API_DEADLINE,
+    retry_attempts=WEATHER_API_RETRY_ATTEMPTS,
+    retry_base_delay=WEATHER_API_RETRY_BASE_DELAY,
+    retry_max_delay=WEATHER_API_RETRY_MAX_DELAY,
+    breaker=CircuitBreaker(
+        name='weatherapi',
+        failure_threshold=WEATHER_API_BREAKER_THRESHOLD,
+        reset_timeout=WEATHER_API_BREAKER_RESET_TIMEOUT,
+    ),
+    hedge_quantile=WEATHER_API_HEDGE_QUANTILE,
+    hedge_min_samples=WEATHER_API_HEDGE_MIN_SAMPLES,
+    quota=weatherapi_quota,
+)
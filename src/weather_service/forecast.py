@@ -0,0 +1,128 @@
+import sys
+from array import array
+from typing import Iterable, List, Optional
+
+
+class HourlySeries:
+    """
+    The hours of a forecast day as parallel columns instead of one dict per hour. Temperatures are
+    packed into a float array; condition texts and icon URLs repeat across hours and locations, so
+    they are interned and shared by every cached forecast.
+    """
+
+    __slots__ = ('time', 'temp', 'condition', 'img_url')
+
+    def __init__(self, time: List[str], temp: Iterable[float], condition: Iterable[str], img_url: Iterable[str]):
+        self.time = time
+        self.temp = array('d', temp)
+        self.condition = [sys.intern(text) for text in condition]
+        self.img_url = [sys.intern(url) for url in img_url]
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @classmethod
+    def from_weatherapi(cls, hours: List[dict]) -> 'HourlySeries':
+        return cls(
+            [hour['time'] for hour in hours],
+            [hour['temp_c'] for hour in hours],
+            [hour['condition']['text'] for hour in hours],
+            [hour['condition']['icon'] for hour in hours],
+        )
+
+    @classmethod
+    def from_rows(cls, rows: List[dict]) -> 'HourlySeries':
+        return cls(
+            [row['time'] for row in rows],
+            [row['temp'] for row in rows],
+            [row['condition'] for row in rows],
+            [row['img_url'] for row in rows],
+        )
+
+    def to_rows(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """The hours as the template/JSON rows: {"time", "temp", "condition", "img_url"}."""
+        return [
+            {'time': time, 'temp': temp, 'condition': condition, 'img_url': img_url}
+            for time, temp, condition, img_url in zip(
+                self.time[start:stop], self.temp[start:stop], self.condition[start:stop], self.img_url[start:stop]
+            )
+        ]
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> 'HourlySeries':
+        return cls(columns['time'], columns['temp'], columns['condition'], columns['img_url'])
+
+    def to_columns(self) -> dict:
+        return {'time': self.time, 'temp': self.temp.tolist(), 'condition': self.condition, 'img_url': self.img_url}
+
+
+class ForecastDay:
+    __slots__ = ('date', 'max_temp', 'min_temp', 'condition', 'hours')
+
+    def __init__(self, date: str, max_temp: float, min_temp: float, condition: str, hours: HourlySeries):
+        self.date = date
+        self.max_temp = max_temp
+        self.min_temp = min_temp
+        self.condition = sys.intern(condition)
+        self.hours = hours
+
+    @classmethod
+    def from_weatherapi(cls, day: dict) -> 'ForecastDay':
+        return cls(
+            day['date'],
+            day['day']['maxtemp_c'],
+            day['day']['mintemp_c'],
+            day['day']['condition']['text'],
+            HourlySeries.from_weatherapi(day['hour']),
+        )
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'ForecastDay':
+        return cls(row['date'], row['max_temp'], row['min_temp'], row['condition'], HourlySeries.from_rows(row['hourly_forecast']))
+
+    def to_row(self) -> dict:
+        return {
+            'date': self.date,
+            'max_temp': self.max_temp,
+            'min_temp': self.min_temp,
+            'condition': self.condition,
+            'hourly_forecast': self.hours.to_rows(),
+        }
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> 'ForecastDay':
+        return cls(
+            columns['date'], columns['max_temp'], columns['min_temp'], columns['condition'],
+            HourlySeries.from_columns(columns['hourly'])
+        )
+
+    def to_columns(self) -> dict:
+        return {
+            'date': self.date,
+            'max_temp': self.max_temp,
+            'min_temp': self.min_temp,
+            'condition': self.condition,
+            'hourly': self.hours.to_columns(),
+        }
+
+
+def forecast_from_weatherapi(forecastday: List[dict]) -> List[ForecastDay]:
+    return [ForecastDay.from_weatherapi(day) for day in forecastday]
+
+
+def forecast_from_columns(forecast_data: List[dict]) -> List[ForecastDay]:
+    """Reads the columnar forecast_data weather results are cached with."""
+    return [ForecastDay.from_columns(day) for day in forecast_data]
+
+
+def forecast_to_columns(forecast: List[ForecastDay]) -> List[dict]:
+    return [day.to_columns() for day in forecast]
+
+
+def forecast_from_rows(forecast_data: List[dict]) -> List[ForecastDay]:
+    return [ForecastDay.from_row(day) for day in forecast_data]
+
+
+def forecast_to_rows(forecast: List[ForecastDay]) -> List[dict]:
+    """The forecast as the templates and the JSON API show it, with one dict per hour."""
+    return [day.to_row() for day in forecast]
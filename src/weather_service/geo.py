@@ -0,0 +1,53 @@
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        coord_range, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (coord_range[0] + coord_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            coord_range[0] = middle
+        else:
+            bits <<= 1
+            coord_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def grid_cell(latitude: float, longitude: float, step: float) -> str:
+    return f"{math.floor(latitude / step)}:{math.floor(longitude / step)}"
+
+
+def coordinates_bucket(latitude: float, longitude: float, bucketing: str, precision: float) -> str:
+    """
+    Quantizes coordinates so that nearby points share a cache key.
+    For "geohash" precision is the number of characters, for "grid" it's the cell size in degrees.
+    """
+    if bucketing == 'geohash':
+        return f"gh{int(precision)}:{geohash_encode(latitude, longitude, int(precision))}"
+    if bucketing == 'grid':
+        return f"grid{precision}:{grid_cell(latitude, longitude, precision)}"
+    raise ValueError(f"Unknown coordinates bucketing scheme: {bucketing}")
+
+
+def haversine_km(latitude_1: float, longitude_1: float, latitude_2: float, longitude_2: float) -> float:
+    phi_1, phi_2 = math.radians(latitude_1), math.radians(latitude_2)
+    d_phi = phi_2 - phi_1
+    d_lambda = math.radians(longitude_2 - longitude_1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi_1) * math.cos(phi_2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,63 @@
+import hashlib
+import time
+from typing import Callable
+
+from fastapi import Request, Response, status
+from prometheus_client import Counter
+
+from src.weather_service.cache import WeatherCache
+
+CONDITIONAL_REQUESTS = Counter(
+    'weather_conditional_requests', 'Weather responses by outcome of ETag validation', ['route', 'result']
+)
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored."""
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+def get_cache_control(cache: WeatherCache, entry: dict, private: bool) -> str:
+    """
+    Browsers and shared caches may keep a forecast while it is fresh in the weather cache and serve it
+    stale while revalidating until it expires. Authenticated responses record search history on every
+    view, so they are private and always revalidated.
+    """
+    if private:
+        return 'private, no-cache'
+    age = time.time() - entry['stored_at']
+    max_age = max(0, int(cache.soft_ttl - age))
+    stale_while_revalidate = max(0, int(cache.hard_ttl - max(age, cache.soft_ttl)))
+    return f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}, stale-if-error={cache.grace_ttl}"
+
+
+def conditional_response(
+        request: Request,
+        route: str,
+        etag: str,
+        cache_control: str,
+        make_response: Callable[[], Response],
+) -> Response:
+    """
+    Answers 304 without calling make_response when the client already has the representation.
+
+    The ETag is sent weak: CompressionMiddleware weakens it on compressed 200s, and a 304 must carry the
+    same validator as the response it revalidates. Matching is weak comparison anyway.
+    """
+    headers = {'ETag': f"W/{etag}", 'Cache-Control': cache_control, 'Vary': 'Cookie'}
+    if etag_matches(request, etag):
+        CONDITIONAL_REQUESTS.labels(route=route, result='not_modified').inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    CONDITIONAL_REQUESTS.labels(route=route, result='modified').inc()
+    response = make_response()
+    response.headers.update(headers)
+    return response
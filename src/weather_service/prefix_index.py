@@ -0,0 +1,67 @@
+import sys
+from bisect import bisect_left
+from heapq import nlargest
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Sorts after every character a key can continue a prefix with
+PREFIX_END = '\U0010ffff'
+
+
+class PrefixIndex:
+    """
+    Keys in a sorted array, each with its items (ints) best scored first. The keys starting with a
+    prefix form one range of the array, found by binary search, and the best items of the range are
+    merged from its keys. Short prefixes have huge ranges, so the best items of every prefix with more
+    than scan_limit keys are precomputed and no lookup merges more than scan_limit keys.
+    """
+
+    def __init__(self, items_by_key: Dict[str, Tuple[int, ...]], scores: Sequence[int], max_limit: int, scan_limit: int = 64):
+        self.keys = sorted(items_by_key)
+        self.max_limit = max_limit
+        self.scan_limit = scan_limit
+        self._items = [items_by_key[key] for key in self.keys]
+        self._scores = scores
+        self._top: Dict[str, Tuple[int, ...]] = {}
+        if len(self.keys) > scan_limit:
+            self._precompute('', 0, len(self.keys))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def top(self, prefix: str, limit: int) -> List[int]:
+        """The limit (at most max_limit) best scored items of the keys starting with prefix."""
+        limit = min(limit, self.max_limit)
+        top = self._top.get(prefix)
+        if top is not None:
+            return list(top[:limit])
+        low = bisect_left(self.keys, prefix)
+        high = bisect_left(self.keys, prefix + PREFIX_END, low)
+        return self._best(self._range_items(low, high, limit), limit)
+
+    def _best(self, items: Iterable[int], limit: int) -> List[int]:
+        return nlargest(limit, set(items), key=self._scores.__getitem__)
+
+    def _range_items(self, low: int, high: int, limit: int) -> Iterable[int]:
+        return (item for items in self._items[low:high] for item in items[:limit])
+
+    def _precompute(self, prefix: str, low: int, high: int):
+        """Best items of prefix, merged from the best items of each one character longer prefix."""
+        candidates = set()
+        position = low
+        while position < high:
+            if len(self.keys[position]) == len(prefix):
+                candidates.update(self._items[position][:self.max_limit])
+                position += 1
+                continue
+            extended = self.keys[position][:len(prefix) + 1]
+            extended_high = bisect_left(self.keys, extended + PREFIX_END, position, high)
+            if extended_high - position > self.scan_limit:
+                self._precompute(extended, position, extended_high)
+                candidates.update(self._top[extended])
+            else:
+                candidates.update(self._range_items(position, extended_high, self.max_limit))
+            position = extended_high
+        self._top[prefix] = tuple(self._best(candidates, self.max_limit))
+
+    def estimate_bytes(self) -> int:
+        return sum(map(sys.getsizeof, (self.keys, self._items, self._top, *self._top.values())))
@@ -0,0 +1,117 @@
+import asyncio
+import random
+import time
+from typing import Dict
+
+from prometheus_client import Counter, Gauge
+
+from src.config import WEATHER_API_QUOTA_RATE, WEATHER_API_QUOTA_BURST, WEATHER_API_QUOTA_WARMER_RESERVE, \
+    WEATHER_API_QUOTA_BULK_RESERVE, WEATHER_API_QUOTA_INTERACTIVE_MAX_WAIT, WEATHER_API_QUOTA_WARMER_MAX_WAIT, \
+    WEATHER_API_QUOTA_BULK_MAX_WAIT
+from src.database import RedisDB, redis_db
+
+INTERACTIVE, WARMER, BULK = 'interactive', 'warmer', 'bulk'
+
+QUOTA_REMAINING = Gauge(
+    'weatherapi_quota_remaining', 'Tokens left in the shared weatherapi bucket at the last acquire', multiprocess_mode='liveall'
+)
+QUOTA_QUEUE_DEPTH = Gauge(
+    'weatherapi_quota_queue_depth', 'Calls waiting for a weatherapi token', ['priority'], multiprocess_mode='livesum'
+)
+QUOTA_WAIT_SECONDS = Counter('weatherapi_quota_wait_seconds', 'Time spent waiting for weatherapi tokens', ['priority'])
+QUOTA_REJECTIONS = Counter('weatherapi_quota_rejections', 'Calls given up for lack of weatherapi tokens', ['priority'])
+
+# Refills the bucket by elapsed time and takes a token if more than `reserve` would remain.
+# Returns {taken, tokens left, seconds until a token above the reserve is available}
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local taken = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+    taken = 1
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(burst / rate) + 1)
+return {taken, tostring(tokens), tostring(math.max(0, reserve + 1 - tokens) / rate)}
+"""
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class QuotaScheduler:
+    """
+    Redis token bucket shared by every process calling weatherapi with the same key.
+
+    Priorities are served by reserves: a priority may only take a token while more than its reserve
+    would be left, so interactive calls can drain the bucket, warmers stop at WARMER_RESERVE of the
+    burst and bulk jobs at BULK_RESERVE. Callers without a token wait for the refill up to the
+    priority's max wait and then get QuotaExceededError.
+    """
+
+    def __init__(
+            self,
+            redis_db: RedisDB,
+            key: str,
+            rate: float,
+            burst: int,
+            reserves: Dict[str, float],
+            max_waits: Dict[str, float],
+    ):
+        self.redis_db = redis_db
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.reserves = reserves
+        self.max_waits = max_waits
+
+    async def acquire(self, priority: str, wait: bool = True):
+        taken, tokens, retry_after = await self._try_acquire(priority)
+        if taken:
+            return
+
+        deadline = time.monotonic() + (self.max_waits[priority] if wait else 0)
+        start_time = time.monotonic()
+        QUOTA_QUEUE_DEPTH.labels(priority=priority).inc()
+        try:
+            while not taken:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    QUOTA_REJECTIONS.labels(priority=priority).inc()
+                    raise QuotaExceededError(f"No weatherapi quota left for {priority} calls")
+                # Jitter spreads the retries of processes that were refused at the same moment
+                await asyncio.sleep(min(remaining, retry_after * random.uniform(1, 1.5)))
+                taken, tokens, retry_after = await self._try_acquire(priority)
+        finally:
+            QUOTA_QUEUE_DEPTH.labels(priority=priority).dec()
+            QUOTA_WAIT_SECONDS.labels(priority=priority).inc(time.monotonic() - start_time)
+
+    async def _try_acquire(self, priority: str):
+        taken, tokens, retry_after = await self.redis_db.redis.eval(
+            ACQUIRE_SCRIPT, 1, self.key, self.rate, self.burst, self.reserves[priority] * self.burst
+        )
+        QUOTA_REMAINING.set(float(tokens))
+        return bool(taken), float(tokens), float(retry_after)
+
+
+weatherapi_quota = QuotaScheduler(
+    redis_db=redis_db,
+    key='quota:weatherapi',
+    rate=WEATHER_API_QUOTA_RATE,
+    burst=WEATHER_API_QUOTA_BURST,
+    reserves={INTERACTIVE: 0, WARMER: WEATHER_API_QUOTA_WARMER_RESERVE, BULK: WEATHER_API_QUOTA_BULK_RESERVE},
+    max_waits={
+        INTERACTIVE: WEATHER_API_QUOTA_INTERACTIVE_MAX_WAIT,
+        WARMER: WEATHER_API_QUOTA_WARMER_MAX_WAIT,
+        BULK: WEATHER_API_QUOTA_BULK_MAX_WAIT,
+    },
+)
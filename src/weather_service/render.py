@@ -0,0 +1,55 @@
+from typing import Any, Dict
+
+from markupsafe import Markup
+from prometheus_client import Counter, Histogram
+from starlette.templating import Jinja2Templates
+
+from src.cache.local import LocalCache
+from src.config import FRAGMENT_CACHE_MAX_BYTES, FRAGMENT_CACHE_MAX_ENTRIES, WEATHER_CACHE_FORECAST_TTL, \
+    WEATHER_CACHE_GRACE_TTL
+from src.utils import get_jinja_templates
+
+TEMPLATE_RENDER_SECONDS = Histogram(
+    'template_render_seconds',
+    'Time spent rendering templates, whole pages and cacheable fragments',
+    ['template'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+FRAGMENT_CACHE_REQUESTS = Counter('fragment_cache_requests', 'Rendered fragment cache lookups', ['template', 'result'])
+
+
+class FragmentCache:
+    """
+    Rendered template fragments kept in process memory.
+
+    The key must change whenever the fragment's input does, e.g. contain the version of the cache entry
+    the context was built from, since entries are never invalidated, only evicted by size or age.
+    """
+
+    def __init__(self, templates: Jinja2Templates, local: LocalCache):
+        self.templates = templates
+        self.local = local
+
+    def render(self, template_name: str, key: str, context: Dict[str, Any]) -> Markup:
+        cache_key = f"{template_name}:{key}"
+        html = self.local.get(cache_key)
+        if html is not None:
+            FRAGMENT_CACHE_REQUESTS.labels(template=template_name, result='hit').inc()
+            return html
+        FRAGMENT_CACHE_REQUESTS.labels(template=template_name, result='miss').inc()
+
+        with TEMPLATE_RENDER_SECONDS.labels(template=template_name).time():
+            html = Markup(self.templates.get_template(template_name).render(context))
+        self.local.set(cache_key, html, size=len(html))
+        return html
+
+
+fragment_cache = FragmentCache(
+    templates=get_jinja_templates(),
+    local=LocalCache(
+        name='fragments',
+        max_entries=FRAGMENT_CACHE_MAX_ENTRIES,
+        max_bytes=FRAGMENT_CACHE_MAX_BYTES,
+        ttl=WEATHER_CACHE_FORECAST_TTL + WEATHER_CACHE_GRACE_TTL,
+    ),
+)
@@ -0,0 +1,138 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+T = TypeVar('T')
+
+# Per live worker: each worker has its own breaker
+CIRCUIT_STATE = Gauge(
+    'circuit_breaker_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open', ['name'], multiprocess_mode='liveall'
+)
+CIRCUIT_REJECTIONS = Counter('circuit_breaker_rejections', 'Calls rejected while the circuit was open', ['name'])
+RETRIES = Counter('upstream_retries', 'Retried upstream calls', ['name'])
+HEDGES = Counter('upstream_hedges', 'Hedged upstream calls', ['name', 'result'])
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for reset_timeout seconds.
+    Then lets a single probe through (half-open): success closes the circuit, failure opens it again.
+    """
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def before_call(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+                raise CircuitOpenError(f"Circuit {self.name} is open")
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+                raise CircuitOpenError(f"Circuit {self.name} is half-open, probe in flight")
+            self._probe_in_flight = True
+
+    def record_cancel(self):
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._probe_in_flight = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.labels(name=self.name).set((self.CLOSED, self.HALF_OPEN, self.OPEN).index(state))
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies."""
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+async def retry_with_jitter(
+        name: str,
+        fn: Callable[[], Awaitable[T]],
+        attempts: int,
+        base_delay: float,
+        max_delay: float,
+        retry_on: Tuple[Type[BaseException], ...],
+) -> T:
+    """Calls fn up to attempts times, sleeping a random "full jitter" backoff between failed attempts."""
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except retry_on:
+            if attempt == attempts - 1:
+                raise
+        RETRIES.labels(name=name).inc()
+        await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+async def hedge(name: str, fn: Callable[[], Awaitable[T]], delay: Optional[float]) -> T:
+    """
+    Starts fn and, if it hasn't finished after delay seconds, starts a second copy.
+    Returns the first successful result and cancels the other call.
+    """
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        if delay is None:
+            return await tasks[0]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            HEDGES.labels(name=name, result='sent').inc()
+            tasks.append(asyncio.ensure_future(fn()))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        HEDGES.labels(name=name, result='won').inc()
+                    return task.result()
+        return tasks[0].result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
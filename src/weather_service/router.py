@@ -1,23 +1,30 @@
-import json
-from typing import Callable, List, Optional
+import datetime
+from functools import partial
+from typing import Callable, List, Optional, Tuple
 
-import aiohttp
-
-from fastapi import APIRouter, Request, Depends, HTTPException, status
+from fastapi import APIRouter, Request, Depends, HTTPException, Query, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import HTMLResponse, Response, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.routing import APIRoute
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.jwt import is_authenticated
 from src.auth.schemas import UserInDB
-from src.config import WEATHER_API_KEY
-from src.database import get_async_session, redis_db
-from src.utils import get_jinja_templates
+from src.cache.tiered import redis_cache
+from src.config import AUTOCOMPLETE_MAX_LIMIT, CITY_INDEX_CHECK_INTERVAL, NEARBY_MAX_LIMIT, NEARBY_MAX_RADIUS_KM, \
+    NEARBY_FETCH_CONCURRENCY, NEARBY_FETCH_TIMEOUT
+from src.database import get_async_session
+from src.utils import get_jinja_templates, templates_version
+from src.weather_service.cache import weather_cache
+from src.weather_service.city_index import city_index
+from src.weather_service.forecast import forecast_from_columns, forecast_to_rows
+from src.weather_service.http_cache import conditional_response, get_cache_control, make_etag
+from src.weather_service.quota import WARMER
+from src.weather_service.render import TEMPLATE_RENDER_SECONDS, fragment_cache
 from src.weather_service.schemas import CityInDB, SearchHistoryCityName, SearchHistoryCoordinates
-from src.weather_service.utils import search_cities_db, get_city_data_by_id, process_data, \
-    get_data_from_clothing_document_by_precipitation, get_clothing_document, get_temperature_range, get_precipitation_type, \
-    insert_search_history_city_name, insert_search_history_coordinates
+from src.weather_service.utils import search_cities_db, get_city_data_by_id, insert_search_history_city_name, \
+    insert_search_history_coordinates, fetch_coordinates_weather, fetch_city_weather, parse_result_fields, \
+    project_result_data, paginate_hourly_forecast, HOURLY_FORECAST_MAX_LIMIT, RESULT_LAYOUT_ROWS, RESULT_LAYOUT_COLUMNS
 
 
 class ValidationErrorLoggingRoute(APIRoute):
@@ -52,20 +59,8 @@ async def get_page_weather_search(request: Request, user_data: Optional[UserInDB
     return templates.TemplateResponse('city_weather_search.html', context={"request": request, "is_auth": user_data})
 
 
-@router.get('/validate', response_class=JSONResponse)
-async def validate_city_input(
-        city_input: str,
-        session: AsyncSession = Depends(get_async_session)
-):
-    formatted_city_input = city_input.title().strip()
-
-    cached_data_json = await redis_db.redis.get(formatted_city_input)
-
-    if cached_data_json:
-        cached_data = json.loads(cached_data_json)
-        return JSONResponse(content=cached_data)
-
-    city_info: List[CityInDB] = await search_cities_db(formatted_city_input, session=session)
+async def search_cities_data(formatted_city_input: str, session: AsyncSession) -> dict:
+    city_info: List[CityInDB] = await search_cities_db(formatted_city_input, session=session, fuzzy=True)
     if not city_info:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid city!')
     data = {
@@ -82,10 +77,70 @@ async def validate_city_input(
             for x in range(len(city_info))
         ]
     }
-    await redis_db.redis.set(formatted_city_input, json.dumps(data))
-    await redis_db.redis.expire(formatted_city_input, 3600)
+    await redis_cache.set(f"city:search:{formatted_city_input}", data, ex=3600)
+    return data
+
+
+@router.get('/validate', response_class=ORJSONResponse)
+async def validate_city_input(
+        city_input: str,
+        session: AsyncSession = Depends(get_async_session)
+):
+    formatted_city_input = city_input.title().strip()
 
-    return JSONResponse(content=data)
+    # Sent as cached, without decoding and re-encoding it
+    cached_json = await redis_cache.get_json(f"city:search:{formatted_city_input}")
+
+    if cached_json:
+        return Response(content=cached_json, media_type='application/json')
+
+    return ORJSONResponse(content=await search_cities_data(formatted_city_input, session=session))
+
+
+@router.get('/autocomplete', response_class=ORJSONResponse)
+async def autocomplete_city_name(
+        q: str = Query(..., min_length=1, max_length=100),
+        limit: int = Query(10, ge=1, le=AUTOCOMPLETE_MAX_LIMIT),
+):
+    """City name suggestions for every keystroke, most populated first, answered from the in-process city index."""
+    return ORJSONResponse(
+        content={"cities": city_index.autocomplete(q, limit)},
+        headers={'Cache-Control': f"public, max-age={int(CITY_INDEX_CHECK_INTERVAL)}"},
+    )
+
+
+@router.get('/nearby', response_class=ORJSONResponse)
+async def get_nearby_cities_weather(
+        latitude: float = Query(..., ge=-90, le=90),
+        longitude: float = Query(..., ge=-180, le=180),
+        limit: int = Query(10, ge=1, le=NEARBY_MAX_LIMIT),
+        radius_km: float = Query(NEARBY_MAX_RADIUS_KM, gt=0, le=NEARBY_MAX_RADIUS_KM),
+        min_population: int = Query(0, ge=0),
+):
+    """
+    The limit nearest cities within radius_km with their current weather. Cached weather is read in one
+    batch and the rest is fetched concurrently for at most NEARBY_FETCH_TIMEOUT seconds; cities whose
+    weather isn't in by then are listed with "weather": null.
+    """
+    nearby = city_index.nearby(latitude, longitude, limit, radius_km, min_population)
+    # Fetched at the warmer's quota priority so a page of neighbours can't use up the quota of city searches
+    entries = await weather_cache.get_or_fetch_entries(
+        {
+            weather_cache.city_alias(city_data.id): partial(fetch_city_weather, city_data, priority=WARMER)
+            for _, city_data in nearby
+        },
+        concurrency=NEARBY_FETCH_CONCURRENCY,
+        timeout=NEARBY_FETCH_TIMEOUT,
+    )
+    cities = []
+    for distance, city_data in nearby:
+        entry = entries.get(weather_cache.city_alias(city_data.id))
+        cities.append({
+            **city_data.dict(exclude={'timezone', 'alternatenames'}),
+            "distance_km": round(distance, 1),
+            "weather": entry['data']['weather_data'] if entry else None,
+        })
+    return ORJSONResponse(content={"cities": cities})
 
 
 @router.get('/cities', response_class=HTMLResponse)
@@ -96,56 +151,99 @@ async def get_city_name_matches(
         user_data: Optional[UserInDB] = Depends(is_authenticated)
 ):
     formatted_city_input = city_input.title().strip()
-    data_json = await redis_db.redis.get(formatted_city_input)
+    data = await redis_cache.get(f"city:search:{formatted_city_input}")
 
-    if data_json is None:
-        data_json_response = await validate_city_input(formatted_city_input, session=session)
-        data_json = data_json_response.body.decode()
-
-    data = json.loads(data_json)
+    if data is None:
+        data = await search_cities_data(formatted_city_input, session=session)
 
     return templates.TemplateResponse(
         'city_names.html', context={"request": request, "data": data, "is_auth": user_data}
     )
 
 
-@router.get('/info/by_coordinates', response_class=JSONResponse)
+async def get_coordinates_result_entry(latitude: float, longitude: float) -> Tuple[Optional[CityInDB], dict]:
+    """The entry for the coordinates and the city they reverse geocode to, if any."""
+    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid coordinates!')
+    # Coordinates in a known city share the forecast cached for the city's page
+    city_data = city_index.reverse_geocode(latitude, longitude)
+    if city_data is not None:
+        entry = await weather_cache.get_or_fetch_entry(weather_cache.city_alias(city_data.id), lambda: fetch_city_weather(city_data))
+        return city_data, entry
+    entry = await weather_cache.get_or_fetch_entry_by_coordinates(
+        latitude, longitude, lambda: fetch_coordinates_weather(latitude, longitude)
+    )
+    return None, entry
+
+
+async def get_city_result_entry(city_id: int, session: AsyncSession) -> Tuple[CityInDB, dict]:
+    city_data = city_index.get(city_id) or await weather_cache.get_city_data(city_id)
+    if city_data is None:
+        city_data = await get_city_data_by_id(city_id, session=session)
+        await weather_cache.set_city_data(city_data)
+    entry = await weather_cache.get_or_fetch_entry(weather_cache.city_alias(city_id), lambda: fetch_city_weather(city_data))
+    return city_data, entry
+
+
+def render_weather_page(
+        request: Request,
+        route: str,
+        entry: dict,
+        variant: str,
+        location_data: dict,
+        user_data: Optional[UserInDB]
+) -> Response:
+    """
+    Renders the weather page around a body fragment cached per forecast entry version and variant,
+    so only the auth-dependent page frame is rendered on every request. Nothing is rendered when the
+    client revalidates a page it already has from the same templates and static files.
+    """
+    def make_response() -> HTMLResponse:
+        weather_body = fragment_cache.render(
+            'city_weather_present_body.html',
+            key=f"{variant}:{entry['stored_at']}",
+            context={
+                **entry['data'],
+                "forecast_data": forecast_to_rows(forecast_from_columns(entry['data']['forecast_data'])),
+                "location_data": location_data,
+            },
+        )
+        with TEMPLATE_RENDER_SECONDS.labels(template='city_weather_present.html').time():
+            return templates.TemplateResponse(
+                'city_weather_present.html', context={
+                    "request": request,
+                    "location_data": location_data,
+                    "weather_body": weather_body,
+                    "is_auth": user_data,
+                }
+            )
+
+    return conditional_response(
+        request,
+        route=route,
+        etag=make_etag('html', templates_version(), variant, entry['stored_at'], 'auth' if user_data else 'anon'),
+        cache_control=get_cache_control(weather_cache, entry, private=user_data is not None),
+        make_response=make_response,
+    )
+
+
+@router.get('/info/by_coordinates', response_class=ORJSONResponse)
 async def get_weather_data_by_coordinates(
+        request: Request,
         latitude: float,
         longitude: float,
+        fields: Optional[str] = None,
+        layout: str = Query(RESULT_LAYOUT_ROWS, regex=f"^({RESULT_LAYOUT_ROWS}|{RESULT_LAYOUT_COLUMNS})$"),
         session: AsyncSession = Depends(get_async_session),
         user_data: Optional[UserInDB] = Depends(is_authenticated)
 ):
-    key_name = f"{latitude}:{longitude}"
-    cached_data_json = await redis_db.redis.get(key_name)
-
-    if cached_data_json:
-        cached_data = json.loads(cached_data_json)
-        return JSONResponse(content=cached_data)
-
-    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid coordinates!')
-    url = 'http://api.weatherapi.com/v1/forecast.json'
-    params = {
-        'key': WEATHER_API_KEY,
-        'q': f"{latitude},{longitude}",
-    }
-    async with aiohttp.ClientSession() as weatherapi_session:
-        async with weatherapi_session.get(url=url, params=params) as response:
-            data = await response.json()
-            if 'error' in data:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=data['error']['message'])
-            if not(
-                    latitude - 1 < float(data['location']['lat']) < latitude + 1 and
-                    longitude - 1 < float(data['location']['lon']) < longitude + 1
-            ):
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='No information found for given coordinates')
-
-    temperature_range = get_temperature_range(int(data['current']['feelslike_c']))
-    precipitation = await get_precipitation_type(data['current']['condition']['code'])
-    document = await get_clothing_document(temperature_range)
-    db_clothing_data = get_data_from_clothing_document_by_precipitation(document, precipitation)
-    location_data, weather_data, clothing_data, forecast_data = await process_data(weatherapi_data=data, db_clothing_data=db_clothing_data)
+    result_fields = parse_result_fields(fields)
+    city_data, entry = await get_coordinates_result_entry(latitude, longitude)
+    result_data = entry['data']
+    if city_data is not None:
+        # Population is per city, the cached entry is shared by every alias of the upstream location
+        result_data = {**result_data, 'location_data': {**result_data['location_data'], 'population': city_data.population}}
+    location_data = result_data['location_data']
 
     if user_data is not None:
         search_history_coordinates = SearchHistoryCoordinates(
@@ -158,17 +256,16 @@ async def get_weather_data_by_coordinates(
         )
         await insert_search_history_coordinates(search_history_coordinates=search_history_coordinates, session=session)
 
-    result_data = {
-        "weather_data": weather_data,
-        "forecast_data": forecast_data,
-        "location_data": location_data,
-        "clothing_data": clothing_data,
-    }
-
-    await redis_db.redis.set(key_name, json.dumps(result_data))
-    await redis_db.redis.expire(key_name, 60)
-
-    return JSONResponse(content=result_data)
+    return conditional_response(
+        request,
+        route='by_coordinates',
+        etag=make_etag(
+            'json', weather_cache.location_id(result_data), city_data.id if city_data else '', entry['stored_at'], layout,
+            *sorted(result_fields)
+        ),
+        cache_control=get_cache_control(weather_cache, entry, private=user_data is not None),
+        make_response=lambda: ORJSONResponse(content=project_result_data(result_data, result_fields, layout)),
+    )
 
 
 @router.get('/info/by_coordinates/html', response_class=HTMLResponse)
@@ -178,18 +275,17 @@ async def get_weather_data_by_coordinates_html(
         longitude: float,
         user_data: Optional[UserInDB] = Depends(is_authenticated)
 ):
-    result_data_json = await redis_db.redis.get(f"{latitude}:{longitude}")
-
-    if result_data_json is None:
-        result_data_json_response = await get_weather_data_by_coordinates(latitude, longitude, user_data=user_data)
-        result_data_json = result_data_json_response.body.decode()
-
-    result_data = json.loads(result_data_json)
-
-    result_data.update({"request": request, "is_auth": user_data})
+    city_data, entry = await get_coordinates_result_entry(latitude, longitude)
+    if city_data is not None:
+        return render_weather_page(
+            request, 'by_coordinates_html', entry, variant=f"city:{city_data.id}",
+            location_data={**entry['data']['location_data'], 'population': city_data.population}, user_data=user_data
+        )
 
-    return templates.TemplateResponse(
-        'city_weather_present.html', context=result_data)
+    return render_weather_page(
+        request, 'by_coordinates_html', entry, variant=f"location:{weather_cache.location_id(entry['data'])}",
+        location_data=entry['data']['location_data'], user_data=user_data
+    )
 
 
 @router.get('/info', response_class=HTMLResponse)
@@ -199,43 +295,50 @@ async def get_city_weather(
         session: AsyncSession = Depends(get_async_session),
         user_data: Optional[UserInDB] = Depends(is_authenticated)
 ):
-    city_data = await get_city_data_by_id(city_id, session=session)
-
-    url = 'http://api.weatherapi.com/v1/forecast.json'
-    params = {
-        'key': WEATHER_API_KEY,
-        'q': f"{city_data.latitude},{city_data.longitude}",
-        'days': 3,
-    }
-    async with aiohttp.ClientSession() as weatherapi_session:
-        async with weatherapi_session.get(url=url, params=params) as response:
-            data = await response.json()
-            if 'error' in data:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=data['error']['message'])
-        if data['location']['name'].title() not in (city_data.name, *map(lambda name: name.title(), city_data.alternatenames)):
-            params.update(q=f"{city_data.name}, {city_data.region}, {city_data.country}")
-            async with weatherapi_session.get(url=url, params=params) as response:
-                data = await response.json()
-                if 'error' in data:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=data['error']['message'])
-
-    temperature_range = get_temperature_range(int(data['current']['feelslike_c']))
-    precipitation = await get_precipitation_type(data['current']['condition']['code'])
-    document = await get_clothing_document(temperature_range)
-    db_clothing_data = get_data_from_clothing_document_by_precipitation(document, precipitation)
-    location_data, weather_data, clothing_data, forecast_data = await process_data(data, city_data, db_clothing_data)
+    city_data, entry = await get_city_result_entry(city_id, session=session)
 
     if user_data is not None:
         search_history_city_name = SearchHistoryCityName(user_id=user_data.id, city_id=city_id)
         await insert_search_history_city_name(search_history_city_name=search_history_city_name, session=session)
 
-    return templates.TemplateResponse(
-        'city_weather_present.html', context={
-            "request": request,
-            "weather_data": weather_data,
-            "forecast_data": forecast_data,
-            "location_data": location_data,
-            "clothing_data": clothing_data,
-            "is_auth": user_data,
-        }
+    return render_weather_page(
+        request, 'info', entry, variant=f"city:{city_id}",
+        location_data={**entry['data']['location_data'], 'population': city_data.population}, user_data=user_data
+    )
+
+
+@router.get('/info/hourly', response_class=ORJSONResponse)
+async def get_hourly_forecast(
+        request: Request,
+        city_id: Optional[int] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        date: Optional[datetime.date] = None,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(24, ge=1, le=HOURLY_FORECAST_MAX_LIMIT),
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    A page of the hourly forecast of a city or coordinates, optionally of one day, cut from the same
+    cached forecast as the weather page. Doesn't record search history, so it is publicly cacheable.
+    """
+    if city_id is not None:
+        _, entry = await get_city_result_entry(city_id, session=session)
+        variant = f"city:{city_id}"
+    elif latitude is not None and longitude is not None:
+        _, entry = await get_coordinates_result_entry(latitude, longitude)
+        variant = f"location:{weather_cache.location_id(entry['data'])}"
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='City id or coordinates are required!')
+    result_data = entry['data']
+
+    return conditional_response(
+        request,
+        route='hourly',
+        etag=make_etag('hourly', variant, entry['stored_at'], date, offset, limit),
+        cache_control=get_cache_control(weather_cache, entry, private=False),
+        make_response=lambda: ORJSONResponse(content={
+            "location_data": result_data['location_data'],
+            **paginate_hourly_forecast(result_data['forecast_data'], date, offset, limit),
+        }),
     )
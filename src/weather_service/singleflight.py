@@ -0,0 +1,159 @@
+import asyncio
+import json
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge
+
+from src.config import SINGLEFLIGHT_LOCK_TTL, SINGLEFLIGHT_RESULT_TTL, SINGLEFLIGHT_WAIT_TIMEOUT
+from src.database import RedisDB, redis_db
+
+# Not labelled by key: a series per city and coordinates bucket would grow without bound, and in prometheus
+# multiprocess mode removed series stay in the worker's file. Per key counts are in SingleFlight.waiters()
+SINGLEFLIGHT_WAITERS = Gauge(
+    'weather_singleflight_waiters', 'Callers waiting on an in-flight upstream lookup', multiprocess_mode='livesum'
+)
+SINGLEFLIGHT_COALESCED = Counter(
+    'weather_singleflight_coalesced', 'Lookups served by a flight started elsewhere', ['scope']
+)
+SINGLEFLIGHT_FALLBACKS = Counter(
+    'weather_singleflight_fallbacks', 'Lookups executed without the fill lock after waiting timed out'
+)
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical lookups.
+
+    Inside a worker every caller of the same key awaits one shared task. Across workers the task that
+    wins a Redis fill lock runs the lookup, stores the result for a short time and notifies others over
+    pub/sub; the rest wait for that notification (polling the result key as a fallback) and run the
+    lookup themselves only if the lock holder disappears or the wait times out.
+    """
+
+    def __init__(self, redis_db: RedisDB, namespace: str, lock_ttl: float, result_ttl: float, wait_timeout: float):
+        self.redis_db = redis_db
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def waiters(self) -> Dict[str, int]:
+        """Callers of this worker waiting on each in-flight key."""
+        return dict(self._waiters)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[dict]]) -> dict:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, fn))
+            task.add_done_callback(lambda done_task: self._on_done(key, done_task))
+            self._calls[key] = task
+        else:
+            SINGLEFLIGHT_COALESCED.labels(scope='worker').inc()
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        SINGLEFLIGHT_WAITERS.inc()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            SINGLEFLIGHT_WAITERS.dec()
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[dict]]) -> dict:
+        redis = self.redis_db.redis
+        if redis is None:
+            return await fn()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while True:
+            token = uuid.uuid4().hex
+            if await redis.set(self._lock_key(key), token, nx=True, px=int(self.lock_ttl * 1000)):
+                return await self._lead(key, fn, token)
+
+            payload = await self._follow(key, deadline)
+            if payload is not None:
+                SINGLEFLIGHT_COALESCED.labels(scope='cluster').inc()
+                return self._unpack(payload)
+            if loop.time() >= deadline:
+                SINGLEFLIGHT_FALLBACKS.inc()
+                return await fn()
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[dict]], token: str) -> dict:
+        redis = self.redis_db.redis
+        outcome: Optional[dict] = None
+        try:
+            result = await fn()
+            outcome = {'result': result}
+            return result
+        except HTTPException as exc:
+            outcome = {'error': {'status_code': exc.status_code, 'detail': exc.detail}}
+            raise
+        finally:
+            if outcome is not None:
+                await redis.set(self._result_key(key), json.dumps(outcome), px=int(self.result_ttl * 1000))
+            await redis.eval(RELEASE_LOCK_SCRIPT, 1, self._lock_key(key), token)
+            await redis.publish(self._channel(key), 'done')
+
+    async def _follow(self, key: str, deadline: float) -> Optional[str]:
+        """Waits for the lock holder; returns stored outcome or None if the lock was released without one."""
+        redis = self.redis_db.redis
+        loop = asyncio.get_running_loop()
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(self._channel(key))
+        try:
+            while True:
+                payload = await redis.get(self._result_key(key))
+                if payload is not None:
+                    return payload
+                if not await redis.exists(self._lock_key(key)):
+                    return None
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 0.5))
+        finally:
+            await pubsub.reset()
+
+    @staticmethod
+    def _unpack(payload: str) -> dict:
+        outcome = json.loads(payload)
+        if 'error' in outcome:
+            raise HTTPException(**outcome['error'])
+        return outcome['result']
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.namespace}:lock:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"{self.namespace}:result:{key}"
+
+    def _channel(self, key: str) -> str:
+        return f"{self.namespace}:done:{key}"
+
+
+weather_singleflight = SingleFlight(
+    redis_db=redis_db,
+    namespace='singleflight:weather',
+    lock_ttl=SINGLEFLIGHT_LOCK_TTL,
+    result_ttl=SINGLEFLIGHT_RESULT_TTL,
+    wait_timeout=SINGLEFLIGHT_WAIT_TIMEOUT,
+)
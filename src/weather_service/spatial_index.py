@@ -0,0 +1,92 @@
+import math
+import sys
+from array import array
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from src.weather_service.geo import EARTH_RADIUS_KM
+
+
+class SpatialIndex:
+    """
+    Points bucketed into cells of a fixed-degree latitude/longitude grid. A radius query visits only the
+    cells of the radius' bounding box and computes the haversine distances of a cell's points in one
+    pass over its coordinate columns, comparing the haversine term against the radius' so that the
+    square root and arcsine are only taken for points within it.
+    """
+
+    def __init__(self, latitudes: Sequence[float], longitudes: Sequence[float], populations: Sequence[int], cell_degrees: float = 0.25):
+        self.cell_degrees = cell_degrees
+        self.columns = math.ceil(360 / cell_degrees)
+        self._populations = populations
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for position, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+            cells.setdefault(self._cell(latitude, longitude), []).append(position)
+        # Per cell: positions, latitudes and longitudes in radians, cosines of the latitudes
+        self._cells: Dict[Tuple[int, int], Tuple[array, array, array, array]] = {
+            cell: (
+                array('i', positions),
+                array('d', (math.radians(latitudes[position]) for position in positions)),
+                array('d', (math.radians(longitudes[position]) for position in positions)),
+                array('d', (math.cos(math.radians(latitudes[position])) for position in positions)),
+            )
+            for cell, positions in cells.items()
+        }
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees) % self.columns
+
+    def _bounding_cells(self, latitude: float, longitude: float, radius_km: float) -> Iterator[Tuple[int, int]]:
+        angle = radius_km / EARTH_RADIUS_KM
+        latitude_delta = math.degrees(angle)
+        first_row = math.floor(max(latitude - latitude_delta, -90) / self.cell_degrees)
+        last_row = math.floor(min(latitude + latitude_delta, 90) / self.cell_degrees)
+        # Widest longitude span of the circle; it covers every longitude when it reaches a pole
+        if abs(latitude) + latitude_delta >= 90 or math.sin(angle) >= math.cos(math.radians(latitude)):
+            columns = range(self.columns)
+        else:
+            longitude_delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+            first_column = math.floor((longitude - longitude_delta) / self.cell_degrees)
+            last_column = math.floor((longitude + longitude_delta) / self.cell_degrees)
+            columns = range(first_column, min(last_column, first_column + self.columns - 1) + 1)
+        for row in range(first_row, last_row + 1):
+            for column in columns:
+                yield row, column % self.columns
+
+    def within(self, latitude: float, longitude: float, radius_km: float, min_population: int = 0) -> List[Tuple[float, int]]:
+        """(distance in km, position) of the points within radius_km with at least min_population, nearest first."""
+        phi, lam, cos_phi = math.radians(latitude), math.radians(longitude), math.cos(math.radians(latitude))
+        threshold = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2) ** 2
+        sin, populations = math.sin, self._populations
+        found = []
+        for cell in self._bounding_cells(latitude, longitude, radius_km):
+            points = self._cells.get(cell)
+            if points is None:
+                continue
+            positions, phis, lambdas, cosines = points
+            terms = [
+                sin((point_phi - phi) / 2) ** 2 + cos_phi * point_cos * sin((point_lambda - lam) / 2) ** 2
+                for point_phi, point_lambda, point_cos in zip(phis, lambdas, cosines)
+            ]
+            found.extend(
+                (term, position) for term, position in zip(terms, positions)
+                if term <= threshold and populations[position] >= min_population
+            )
+        found.sort()
+        return [(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(term)), position) for term, position in found]
+
+    def nearest(self, latitude: float, longitude: float, k: int, max_km: float, min_population: int = 0) -> List[Tuple[float, int]]:
+        """
+        (distance in km, position) of the k nearest points within max_km with at least min_population.
+        The radius grows from one cell until it holds k points, so dense regions stay cheap.
+        """
+        radius_km = min(self.cell_degrees * math.pi / 180 * EARTH_RADIUS_KM, max_km)
+        while True:
+            found = self.within(latitude, longitude, radius_km, min_population)
+            if len(found) >= k or radius_km >= max_km:
+                return found[:k]
+            radius_km = min(radius_km * 2, max_km)
+
+    def estimate_bytes(self) -> int:
+        return sys.getsizeof(self._cells) + sum(
+            sys.getsizeof(cell) + sys.getsizeof(points) + sum(map(sys.getsizeof, points)) for cell, points in self._cells.items()
+        )
@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+from typing import List, Tuple
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import select, func, distinct
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import user
+from src.celery_app import celery
+from src.config import WEATHER_WARMER_INTERVAL, WEATHER_WARMER_TOP_POPULATED, WEATHER_WARMER_TOP_SEARCHED, \
+    WEATHER_WARMER_SEARCH_DAYS, WEATHER_WARMER_BATCH_SIZE, WEATHER_WARMER_MAX_CITIES
+from src.database import async_session_maker, engine, mongo_db, redis_db
+from src.models import city, search_history_city_name_db
+from src.weather_service.cache import weather_cache
+from src.weather_service.client import weatherapi_client
+from src.weather_service.quota import WARMER, QuotaExceededError
+from src.weather_service.resilience import CircuitOpenError
+from src.weather_service.utils import get_city_data_by_id, fetch_city_weather
+
+logger = get_task_logger(__name__)
+
+
+async def get_cities_to_warm() -> List[int]:
+    """Top populated cities, every user's home city and the most searched cities, most important first."""
+    search_since = datetime.datetime.utcnow() - datetime.timedelta(days=WEATHER_WARMER_SEARCH_DAYS)
+    async with async_session_maker() as session:
+        top_populated = await session.execute(
+            select(city.c.id).order_by(city.c.population.desc()).limit(WEATHER_WARMER_TOP_POPULATED)
+        )
+        home_cities = await session.execute(select(distinct(user.c.city_id)))
+        top_searched = await session.execute(
+            select(search_history_city_name_db.c.city_id)
+            .where(search_history_city_name_db.c.request_at >= search_since)
+            .group_by(search_history_city_name_db.c.city_id)
+            .order_by(func.count().desc())
+            .limit(WEATHER_WARMER_TOP_SEARCHED)
+        )
+        city_ids = [*top_searched.scalars(), *home_cities.scalars(), *top_populated.scalars()]
+    await engine.dispose()
+    return list(dict.fromkeys(city_id for city_id in city_ids if city_id is not None))[:WEATHER_WARMER_MAX_CITIES]
+
+
+def is_upstream_unavailable(exc: BaseException) -> bool:
+    """Whether exc, or the error it was raised from, means weatherapi takes no calls from the warmer for now."""
+    return isinstance(exc, (CircuitOpenError, QuotaExceededError)) or isinstance(exc.__cause__, (CircuitOpenError, QuotaExceededError))
+
+
+async def warm_city(city_id: int, session: AsyncSession) -> bool:
+    city_data = await weather_cache.get_city_data(city_id)
+    if city_data is None:
+        city_data = await get_city_data_by_id(city_id, session=session)
+        await weather_cache.set_city_data(city_data)
+    return await weather_cache.warm(weather_cache.city_alias(city_id), lambda: fetch_city_weather(city_data, priority=WARMER))
+
+
+async def warm_batch(city_ids: List[int], session: AsyncSession) -> Tuple[int, int, int]:
+    """
+    Warms the cities one by one; a city that fails is logged and the next one is warmed. Once the
+    circuit is open or the warmer's quota is spent, the rest of the batch is skipped: each call would
+    fail too, after waiting for quota. Returns the numbers of refreshed, failed and skipped cities.
+    """
+    refreshed_count, failed_count = 0, 0
+    for number, city_id in enumerate(city_ids):
+        try:
+            refreshed_count += await warm_city(city_id, session)
+        except Exception as exc:
+            if is_upstream_unavailable(exc):
+                skipped_count = len(city_ids) - number
+                logger.warning("Weatherapi unavailable while warming city %s, skipping %s cities: %r", city_id, skipped_count, exc.__cause__ or exc)
+                return refreshed_count, failed_count, skipped_count
+            failed_count += 1
+            logger.warning("Warming city %s failed", city_id, exc_info=True)
+    return refreshed_count, failed_count, 0
+
+
+async def warm_cities(city_ids: List[int]):
+    await redis_db.connect()
+    await mongo_db.connect()
+    await weatherapi_client.connect()
+    try:
+        async with async_session_maker() as session:
+            refreshed_count, failed_count, skipped_count = await warm_batch(city_ids, session)
+    finally:
+        await weatherapi_client.disconnect()
+        await mongo_db.disconnect()
+        await redis_db.disconnect()
+        await engine.dispose()
+    logger.info(
+        "Warmed %s cities: %s refreshed, %s already fresh, %s failed, %s skipped",
+        len(city_ids), refreshed_count, len(city_ids) - refreshed_count - failed_count - skipped_count, failed_count, skipped_count
+    )
+
+
+@celery.task
+def schedule_weather_cache_warmup():
+    """Splits the cities to warm into batches spread evenly over the warmer interval to pace weatherapi calls."""
+    city_ids = asyncio.run(get_cities_to_warm())
+    batches = [city_ids[i:i + WEATHER_WARMER_BATCH_SIZE] for i in range(0, len(city_ids), WEATHER_WARMER_BATCH_SIZE)]
+    for number, batch in enumerate(batches):
+        countdown = number * WEATHER_WARMER_INTERVAL / len(batches)
+        task_warm_cities.apply_async(args=[batch], countdown=countdown, expires=WEATHER_WARMER_INTERVAL)
+    logger.info("Scheduled warmup of %s cities in %s batches", len(city_ids), len(batches))
+
+
+@celery.task
+def task_warm_cities(city_ids: List[int]):
+    asyncio.run(warm_cities(city_ids))
@@ -0,0 +1,115 @@
+import heapq
+import sys
+from array import array
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Trigrams a single edit can remove from a string: 3 for a substitution or deletion, 4 for a transposition
+TRIGRAMS_PER_EDIT = 4
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of text padded like pg_trgm pads words, so its start weighs more than its middle."""
+    padded = f"  {text} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def pattern_masks(pattern: str) -> Dict[str, int]:
+    """Bit i of the mask of a character is set if pattern[i] is that character."""
+    masks: Dict[str, int] = {}
+    for index, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | 1 << index
+    return masks
+
+
+def bounded_edit_distance(masks: Dict[str, int], pattern_length: int, text: str, max_distance: int) -> Optional[int]:
+    """
+    Edit distance (insertions, deletions, substitutions and transpositions of adjacent characters)
+    between the pattern of masks and text, or None if it exceeds max_distance.
+
+    Bit-parallel: one column of the dynamic programming matrix is a few integer operations on
+    bit vectors of vertical deltas (Myers 1999, transpositions as in Hyyrö 2001), and the text is
+    abandoned as soon as the remaining characters can't bring the distance back under max_distance.
+    """
+    if pattern_length == 0:
+        return len(text) if len(text) <= max_distance else None
+    full = (1 << pattern_length) - 1
+    last = 1 << pattern_length - 1
+    positive, negative, diagonal, previous_mask = full, 0, 0, 0
+    distance = pattern_length
+    remaining = len(text)
+    for char in text:
+        mask = masks.get(char, 0)
+        transposed = ((~diagonal & mask) << 1) & previous_mask
+        diagonal = (((mask & positive) + positive) ^ positive) | mask | negative | transposed
+        horizontal_positive = negative | ~(diagonal | positive) & full
+        horizontal_negative = diagonal & positive
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        remaining -= 1
+        if distance - remaining > max_distance:
+            return None
+        horizontal_positive = (horizontal_positive << 1 | 1) & full
+        horizontal_negative = (horizontal_negative << 1) & full
+        positive = horizontal_negative | ~(diagonal | horizontal_positive) & full
+        negative = diagonal & horizontal_positive
+        previous_mask = mask
+    return distance if distance <= max_distance else None
+
+
+class TrigramIndex:
+    """
+    Posting lists from trigram to the keys containing it, for finding the keys within a few edits of
+    a misspelled query without comparing it to every key.
+
+    Only keys whose length is within max_distance of the query's and that share enough trigrams with
+    it are candidates: an edit removes at most TRIGRAMS_PER_EDIT of the query's trigrams. Posting lists
+    are split by key length so that the shared trigrams are only counted for keys of those lengths,
+    and at most max_candidates of the candidates, those sharing the most trigrams with the query, are
+    verified with a bounded edit distance. Short queries with two allowed edits need so few shared
+    trigrams that hundreds of keys qualify; the cap bounds the verification work, at the cost of
+    missing a match that shares fewer trigrams than max_candidates other keys.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = keys
+        postings: Dict[Tuple[int, str], List[int]] = {}
+        for key_index, key in enumerate(keys):
+            for trigram in trigrams(key):
+                postings.setdefault((len(key), sys.intern(trigram)), []).append(key_index)
+        self._postings: Dict[Tuple[int, str], array] = {
+            length_trigram: array('i', key_indexes) for length_trigram, key_indexes in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, query: str, max_distance: int, max_candidates: int) -> List[Tuple[int, int]]:
+        """(distance, key index) of the keys within max_distance edits of query, closest first."""
+        query_trigrams = trigrams(query)
+        required = len(query_trigrams) - TRIGRAMS_PER_EDIT * max_distance
+        lengths = range(max(len(query) - max_distance, 1), len(query) + max_distance + 1)
+        shared = Counter(chain.from_iterable(
+            self._postings.get((length, trigram), ()) for length in lengths for trigram in query_trigrams
+        ))
+        candidates = [(count, key_index) for key_index, count in shared.items() if count >= required]
+        if len(candidates) > max_candidates:
+            candidates = heapq.nlargest(max_candidates, candidates)
+        masks = pattern_masks(query)
+        matches = []
+        for _, key_index in candidates:
+            distance = bounded_edit_distance(masks, len(query), self.keys[key_index], max_distance)
+            if distance is not None:
+                matches.append((distance, key_index))
+        matches.sort()
+        return matches
+
+    def estimate_bytes(self) -> int:
+        trigram_strings = {trigram for _, trigram in self._postings}
+        return (
+            sys.getsizeof(self._postings) + sum(map(sys.getsizeof, trigram_strings))
+            + sum(sys.getsizeof(length_trigram) + sys.getsizeof(key_indexes) for length_trigram, key_indexes in self._postings.items())
+        )
@@ -1,31 +1,77 @@
+import asyncio
 import datetime
 from typing import List, Optional
 
+import aiohttp
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select, insert, and_, or_
+from prometheus_client import Counter
+from sqlalchemy import Select, Text, select, insert, and_, or_, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.config import MONGODB_COLLECTION_NAME
+from src.config import MONGODB_COLLECTION_NAME, WEATHER_API_COORDINATES_MAX_KM
 from src.models import city, search_history_city_name_db, search_history_coordinates_db
 from src.database import get_async_session, mongo_db
+from src.weather_service.cache import weather_cache
+from src.weather_service.city_index import city_index
+from src.weather_service.client import weatherapi_client
+from src.weather_service.forecast import forecast_from_columns, forecast_from_weatherapi, forecast_to_columns
+from src.weather_service.geo import haversine_km
+from src.weather_service.quota import INTERACTIVE, QuotaExceededError
+from src.weather_service.resilience import CircuitOpenError
 from src.weather_service.schemas import CityInDB, TemperatureRange, ClothesDataDocument, PrecipitationClothing, PrecipitationType, \
     SearchHistoryCityName, SearchHistoryCoordinates
 
+# API key, quota and internal errors, see https://www.weatherapi.com/docs/#intro-error-codes
+WEATHERAPI_UNAVAILABLE_ERROR_CODES = {1002, 2006, 2007, 2008, 2009, 9999}
+
+CITY_QUERY_FORM_COORDINATES, CITY_QUERY_FORM_NAME = 'coordinates', 'name'
+CITY_QUERY_FORM_LOOKUPS = Counter('weather_city_query_form_lookups', 'Memoized city query form lookups', ['result'])
+# Share of cities weatherapi doesn't resolve by coordinates: resolved{query_form="name"} / sum(resolved)
+CITY_QUERY_FORM_RESOLVED = Counter(
+    'weather_city_query_form_resolved', 'Cities whose weatherapi query form was resolved', ['query_form']
+)
+
+# fields= projection of weather results, see project_result_data
+RESULT_FIELD_KEYS = {'weather': 'weather_data', 'location': 'location_data', 'clothing': 'clothing_data'}
+RESULT_FIELDS = frozenset((*RESULT_FIELD_KEYS, 'daily', 'hourly'))
+RESULT_LAYOUT_ROWS, RESULT_LAYOUT_COLUMNS = 'rows', 'columns'
+HOURLY_FORECAST_MAX_LIMIT = 72
+
+
+def get_search_cities_query(city_name: str) -> Select:
+    """
+    Names and alternate names match case-insensitively, like in the city index. Written to use ix_city_name_lower
+    and ix_city_alternatenames_lower: `= ANY(alternatenames)` can't use an index.
+    """
+    lower_alternatenames = func.lower_array(city.c.alternatenames, type_=ARRAY(Text))
+    return (
+        select(city)
+        .where(or_(func.lower(city.c.name) == city_name.lower(), lower_alternatenames.contains([city_name.lower()])))
+        .order_by(city.c.population.desc())
+    )
+
 
 async def search_cities_db(
         city_name: str,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_session),
+        fuzzy: bool = False
 ) -> List[CityInDB]:
+    """
+    Cities named city_name; with fuzzy, cities named closest to it when none is named exactly that.
+    The database is asked before suggesting names close to city_name, so that a city added since the
+    city index was last loaded is found by its own name rather than answered with a near miss.
+    """
+    cities = city_index.search(city_name)
+    if cities:
+        return cities
     column_names = [column.name for column in city.columns]
-    select_query = (
-        select(city)
-        .where(or_(city.c.name == city_name, city.c.alternatenames.any(city_name)))
-        .order_by(city.c.population.desc())
-    )
-    result = await session.execute(select_query)
+    result = await session.execute(get_search_cities_query(city_name))
     cities_in_db = result.fetchall()
     cities_in_db_with_column_names = [{column_name: value for column_name, value in zip(column_names, row)} for row in cities_in_db]
     res = [CityInDB(**city_in_db) for city_in_db in cities_in_db_with_column_names]
+    if not res and fuzzy:
+        return city_index.fuzzy_search(city_name)
     return res
 
 
@@ -33,6 +79,9 @@ async def get_city_data_by_id(
         city_id: int,
         session: AsyncSession = Depends(get_async_session)
 ) -> CityInDB:
+    city_data = city_index.get(city_id)
+    if city_data is not None:
+        return city_data
     column_names = [column.name for column in city.columns]
     select_query = select(city).where(city.c.id == city_id)
     result = await session.execute(select_query)
@@ -41,6 +90,18 @@ async def get_city_data_by_id(
     return CityInDB(**city_dict)
 
 
+async def get_weatherapi_data(endpoint: str, params: dict, priority: str = INTERACTIVE) -> dict:
+    try:
+        data = await weatherapi_client.get(endpoint, params, priority=priority)
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError, QuotaExceededError) as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Weather service is temporarily unavailable') from exc
+    if 'error' in data:
+        if data['error'].get('code') in WEATHERAPI_UNAVAILABLE_ERROR_CODES:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Weather service is temporarily unavailable')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=data['error']['message'])
+    return data
+
+
 async def process_data(
         weatherapi_data: dict,
         db_city_data: CityInDB = None,
@@ -85,44 +146,119 @@ async def process_data(
         'img url': weatherapi_data['current']['condition']['icon']
     }
 
-    forecast_info = weatherapi_data['forecast']['forecastday']
-    formatted_forecast = []
-
-    for day in forecast_info:
-        date = day['date']
-        max_temp = day['day']['maxtemp_c']
-        min_temp = day['day']['mintemp_c']
-        condition = day['day']['condition']['text']
-
-        hourly_forecast = day['hour']
-        formatted_hourly_forecast = []
-
-        for hour in hourly_forecast:
-            time = hour['time']
-            temp = hour['temp_c']
-            condition = hour['condition']['text']
-            img_url = hour['condition']['icon']
-
-            formatted_hourly_forecast.append({
-                'time': time,
-                'temp': temp,
-                'condition': condition,
-                'img_url': img_url
-            })
-
-        formatted_forecast.append({
-            'date': date,
-            'max_temp': max_temp,
-            'min_temp': min_temp,
-            'condition': condition,
-            'hourly_forecast': formatted_hourly_forecast
-        })
+    # Cached in the columnar layout, see src.weather_service.forecast
+    formatted_forecast = forecast_to_columns(forecast_from_weatherapi(weatherapi_data['forecast']['forecastday']))
 
     if db_city_data:
         location_data.update(population=db_city_data.population)
     return location_data, weather_data, clothing_data, formatted_forecast
 
 
+async def fetch_coordinates_weather(latitude: float, longitude: float) -> dict:
+    data = await get_weatherapi_data('forecast.json', params={'q': f"{latitude},{longitude}", 'days': 3})
+    distance = haversine_km(latitude, longitude, float(data['location']['lat']), float(data['location']['lon']))
+    if distance > WEATHER_API_COORDINATES_MAX_KM:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='No information found for given coordinates')
+    return await get_weather_result_data(data)
+
+
+def get_city_query(city_data: CityInDB, query_form: str) -> str:
+    if query_form == CITY_QUERY_FORM_COORDINATES:
+        return f"{city_data.latitude},{city_data.longitude}"
+    return f"{city_data.name}, {city_data.region}, {city_data.country}"
+
+
+async def get_city_weatherapi_data(endpoint: str, city_data: CityInDB, params: dict, priority: str = INTERACTIVE) -> dict:
+    """
+    Queries weatherapi for the city. Coordinates are tried first and if weatherapi names the location
+    differently the city is queried by name; which form worked is remembered per city, so later calls
+    make exactly one upstream request.
+    """
+    query_form = await weather_cache.get_query_form(city_data.id)
+    if query_form is not None:
+        CITY_QUERY_FORM_LOOKUPS.labels(result='hit').inc()
+        return await get_weatherapi_data(endpoint, params={**params, 'q': get_city_query(city_data, query_form)}, priority=priority)
+    CITY_QUERY_FORM_LOOKUPS.labels(result='miss').inc()
+
+    query_form = CITY_QUERY_FORM_COORDINATES
+    data = await get_weatherapi_data(endpoint, params={**params, 'q': get_city_query(city_data, query_form)}, priority=priority)
+    if data['location']['name'].title() not in (city_data.name, *map(lambda name: name.title(), city_data.alternatenames)):
+        query_form = CITY_QUERY_FORM_NAME
+        data = await get_weatherapi_data(endpoint, params={**params, 'q': get_city_query(city_data, query_form)}, priority=priority)
+    await weather_cache.set_query_form(city_data.id, query_form)
+    CITY_QUERY_FORM_RESOLVED.labels(query_form=query_form).inc()
+    return data
+
+
+async def fetch_city_weather(city_data: CityInDB, priority: str = INTERACTIVE) -> dict:
+    data = await get_city_weatherapi_data('forecast.json', city_data, params={'days': 3}, priority=priority)
+    return await get_weather_result_data(data)
+
+
+async def get_weather_result_data(weatherapi_data: dict, db_city_data: CityInDB = None) -> dict:
+    temperature_range = get_temperature_range(int(weatherapi_data['current']['feelslike_c']))
+    precipitation = await get_precipitation_type(weatherapi_data['current']['condition']['code'])
+    document = await get_clothing_document(temperature_range)
+    db_clothing_data = get_data_from_clothing_document_by_precipitation(document, precipitation)
+    location_data, weather_data, clothing_data, forecast_data = await process_data(weatherapi_data, db_city_data, db_clothing_data)
+    return {
+        "weather_data": weather_data,
+        "forecast_data": forecast_data,
+        "location_data": location_data,
+        "clothing_data": clothing_data,
+    }
+
+
+def parse_result_fields(fields: Optional[str]) -> frozenset:
+    """Parses the comma-separated fields= projection; all fields when it isn't given."""
+    if fields is None:
+        return RESULT_FIELDS
+    parsed = frozenset(field.strip() for field in fields.split(',') if field.strip())
+    if not parsed or not parsed <= RESULT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid fields! Choose from: {', '.join(sorted(RESULT_FIELDS))}"
+        )
+    return parsed
+
+
+def project_result_data(result_data: dict, fields: frozenset, layout: str = RESULT_LAYOUT_ROWS) -> dict:
+    """
+    Keeps only the requested parts of a weather result. "daily" is the forecast without hours,
+    "hourly" is the hours of each forecast day, as one dict per hour or, in the columnar layout,
+    as one list per hourly value.
+    """
+    projected = {key: result_data[key] for field, key in RESULT_FIELD_KEYS.items() if field in fields}
+    if fields & {'daily', 'hourly'}:
+        day_keys = {'date'}
+        if 'daily' in fields:
+            day_keys.update(('max_temp', 'min_temp', 'condition'))
+        if 'hourly' in fields:
+            day_keys.update(('hourly_forecast', 'hourly'))
+        days = forecast_from_columns(result_data['forecast_data'])
+        projected['forecast_data'] = [
+            {key: value for key, value in (day.to_columns() if layout == RESULT_LAYOUT_COLUMNS else day.to_row()).items() if key in day_keys}
+            for day in days
+        ]
+    return projected
+
+
+def paginate_hourly_forecast(forecast_data: List[dict], date: Optional[datetime.date], offset: int, limit: int) -> dict:
+    days = [day for day in forecast_from_columns(forecast_data) if date is None or day.date == date.isoformat()]
+    if not days:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='No forecast found for given date')
+    hourly_forecast, skip = [], offset
+    for day in days:
+        hourly_forecast.extend(day.hours.to_rows(skip, skip + limit - len(hourly_forecast)))
+        skip = max(0, skip - len(day.hours))
+    return {
+        "hourly_forecast": hourly_forecast,
+        "total": sum(len(day.hours) for day in days),
+        "offset": offset,
+        "limit": limit,
+    }
+
+
 def get_temperature_range(temperature: int) -> TemperatureRange:
     if temperature >= 30:
         temperature_min = 25
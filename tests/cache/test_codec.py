@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from src.cache.codec import CacheCodec, FORMAT_JSON, FORMAT_MSGPACK, FORMAT_MSGPACK_ZSTD
+
+VALUE = {
+    "location_data": {"location": "Brussels", "latitude": 50.83, "longitude": 4.33},
+    "forecast_data": [
+        {"time": f"2023-06-10 {hour:02d}:00", "temp": 15.5, "img_url": "//cdn.weatherapi.com/weather/64x64/day/113.png"}
+        for hour in range(24)
+    ],
+    "clothing_data": None,
+}
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zstd"])
+def test_codec_round_trip(serializer, compression):
+    codec = CacheCodec(serializer=serializer, compression=compression, compression_min_bytes=256)
+
+    assert codec.decode(codec.encode(VALUE)) == VALUE
+    assert codec.decode(codec.encode("city:1")) == "city:1"
+
+
+def test_codec_compresses_only_large_payloads():
+    codec = CacheCodec(serializer="msgpack", compression="zstd", compression_min_bytes=256)
+
+    assert codec.encode({"a": 1})[0] == FORMAT_MSGPACK
+    payload = codec.encode(VALUE)
+    assert payload[0] == FORMAT_MSGPACK_ZSTD
+    assert len(payload) < len(json.dumps(VALUE)) / 3
+
+
+def test_codec_reads_payloads_of_other_formats():
+    msgpack_codec = CacheCodec(serializer="msgpack", compression="zstd", compression_min_bytes=256)
+    json_codec = CacheCodec(serializer="json", compression="none", compression_min_bytes=256)
+
+    assert json_codec.encode(VALUE)[0] == FORMAT_JSON
+    assert msgpack_codec.decode(json_codec.encode(VALUE)) == VALUE
+    assert json_codec.decode(msgpack_codec.encode(VALUE)) == VALUE
+    assert msgpack_codec.decode(json.dumps(VALUE).encode()) == VALUE
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zstd"])
+def test_codec_converts_payloads_to_json(serializer, compression):
+    codec = CacheCodec(serializer=serializer, compression=compression, compression_min_bytes=256)
+
+    assert json.loads(codec.to_json(codec.encode(VALUE))) == VALUE
+    assert codec.to_json(json.dumps(VALUE).encode()) == json.dumps(VALUE).encode()
+
+
+def test_codec_passes_json_payloads_through():
+    codec = CacheCodec(serializer="orjson", compression="none", compression_min_bytes=256)
+    payload = codec.encode(VALUE)
+
+    assert codec.to_json(payload) == payload[1:]
@@ -0,0 +1,135 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from src.cache.codec import cache_codec
+from src.cache.local import LocalCache
+from src.cache.tiered import TieredCache
+from src.database import redis_db
+
+
+def redis_round_trips(cache_name: str) -> float:
+    return sum(
+        REGISTRY.get_sample_value('cache_redis_command_seconds_count', {'cache': cache_name, 'command': command}) or 0
+        for command in ('get', 'mget', 'set', 'delete')
+    )
+
+
+def test_local_cache_evicts_least_recently_used_entries():
+    cache = LocalCache(name="test", max_entries=2, max_bytes=100, ttl=30)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, size=10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_local_cache_is_bounded_by_bytes():
+    cache = LocalCache(name="test", max_entries=10, max_bytes=25, ttl=30)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.set("c", 3, size=10)
+
+    assert len(cache) == 2
+    assert cache.bytes == 20
+    assert cache.get("a") is None
+
+    cache.set("too_big", 4, size=26)
+    assert cache.get("too_big") is None
+
+
+def test_local_cache_expires_entries():
+    cache = LocalCache(name="test", max_entries=10, max_bytes=100, ttl=0)
+    cache.set("a", 1, size=10)
+
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+
+
+def test_local_cache_gauges_follow_entries():
+    cache = LocalCache(name="test_gauges", max_entries=2, max_bytes=100, ttl=30)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=20)
+    cache.set("c", 3, size=30)
+
+    assert REGISTRY.get_sample_value('local_cache_entries', {'cache': 'test_gauges'}) == 2
+    assert REGISTRY.get_sample_value('local_cache_bytes', {'cache': 'test_gauges'}) == 50
+
+    cache.delete("b")
+
+    assert REGISTRY.get_sample_value('local_cache_bytes', {'cache': 'test_gauges'}) == 30
+
+    cache.clear()
+
+    assert REGISTRY.get_sample_value('local_cache_entries', {'cache': 'test_gauges'}) == 0
+
+
+async def test_tiered_cache_invalidates_other_workers():
+    workers = [
+        TieredCache(
+            name="test",
+            redis_db=redis_db,
+            local=LocalCache(name="test", max_entries=10, max_bytes=2 ** 20, ttl=30),
+            codec=cache_codec,
+        )
+        for _ in range(2)
+    ]
+    for worker in workers:
+        await worker.connect()
+    await asyncio.sleep(0.1)
+
+    await workers[0].set("test:tiered:key", {"value": 1}, ex=60)
+    assert await workers[1].get("test:tiered:key") == {"value": 1}
+    assert workers[1].local.get("test:tiered:key") == {"value": 1}
+
+    await workers[0].set("test:tiered:key", {"value": 2}, ex=60)
+    await asyncio.sleep(0.1)
+
+    assert workers[1].local.get("test:tiered:key") is None
+    assert await workers[1].get("test:tiered:key") == {"value": 2}
+
+    for worker in workers:
+        await worker.disconnect()
+
+
+async def test_tiered_cache_batches_redis_round_trips():
+    cache = TieredCache(
+        name="test_round_trips",
+        redis_db=redis_db,
+        local=LocalCache(name="test_round_trips", max_entries=10, max_bytes=2 ** 20, ttl=30),
+        codec=cache_codec,
+    )
+    round_trips = redis_round_trips(cache.name)
+
+    await cache.set_many({f"test:batch:{number}": ({"number": number}, 60) for number in range(3)})
+    assert redis_round_trips(cache.name) - round_trips == 1
+    assert 0 < await redis_db.redis.ttl("test:batch:0") <= 60
+
+    cache.local.clear()
+    values = await cache.get_many([f"test:batch:{number}" for number in range(4)])
+    assert values == {f"test:batch:{number}": {"number": number} for number in range(3)}
+    assert redis_round_trips(cache.name) - round_trips == 2
+
+    await cache.get_many([f"test:batch:{number}" for number in range(3)])
+    assert redis_round_trips(cache.name) - round_trips == 2
+
+
+async def test_tiered_cache_passes_json_through():
+    cache = TieredCache(
+        name="test_json",
+        redis_db=redis_db,
+        local=LocalCache(name="test_json", max_entries=10, max_bytes=2 ** 20, ttl=30),
+        codec=cache_codec,
+    )
+    await cache.set("test:json", {"cities": [{"name": "Brussels"}]}, ex=60)
+
+    assert await cache.get_json("test:json") == b'{"cities":[{"name":"Brussels"}]}'
+
+    cache.local.clear()
+    assert await cache.get_json("test:json") == b'{"cities":[{"name":"Brussels"}]}'
+    assert cache.local.get("test:json") is None
+    assert await cache.get_json("test:missing") is None
@@ -3,7 +3,7 @@ from typing import AsyncGenerator
 
 import pytest
 from httpx import AsyncClient
-from sqlalchemy import insert, select
+from sqlalchemy import delete, insert, select, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
@@ -13,6 +13,7 @@ from src.config import DB_USER_TEST, DB_PASS_TEST, DB_HOST_TEST, DB_PORT_TEST, D
 from src.database import metadata, get_async_session, DATABASE_URL
 from src.main import app, startup
 from src.models import city
+from src.weather_service.city_index import city_index
 
 DATABASE_URL_TEST = f"postgresql+asyncpg://{DB_USER_TEST}:{DB_PASS_TEST}@{DB_HOST_TEST}:{DB_PORT_TEST}/{DB_NAME_TEST}"
 
@@ -27,6 +28,7 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
 
 
 app.dependency_overrides[get_async_session] = override_get_async_session
+city_index.session_maker = async_session_maker
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -105,6 +107,27 @@ async def fill_city_table_with_real_data(city_data):
     yield city_rows
 
 
+LARGE_CITY_TABLE_FIRST_ID = 10_000_000
+
+
+@pytest.fixture(scope="module")
+async def large_city_table() -> AsyncGenerator[AsyncSession, None]:
+    """Adds 100k generated cities (City N, alternate names Alt N and Other N) and analyzes the table."""
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO city (id, name, region, country, latitude, longitude, population, timezone, alternatenames) "
+            "SELECT :first_id + n, 'City ' || n, '', 'Testland', 0, 0, n, 'UTC', ARRAY['Alt ' || n, 'Other ' || n] "
+            "FROM generate_series(1, 100000) AS n"
+        ), {"first_id": LARGE_CITY_TABLE_FIRST_ID})
+        await session.commit()
+        await session.execute(text("ANALYZE city"))
+
+        yield session
+
+        await session.execute(delete(city).where(city.c.id > LARGE_CITY_TABLE_FIRST_ID))
+        await session.commit()
+
+
 async def city_ids_to_test(num_ids: int):
     city_rows = await fill_city_table_with_real_data
     city_ids = [row.id for row in city_rows[:num_ids]]
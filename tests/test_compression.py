@@ -0,0 +1,86 @@
+import gzip
+
+import brotli
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.testclient import TestClient
+
+from src.compression import CompressionMiddleware, negotiate_encoding
+from src.static_files import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles, precompress_static_files, static_fingerprint
+
+LARGE_PAYLOAD = {"forecast": [{"hour": hour, "temperature": 21.5, "condition": "Sunny"} for hour in range(100)]}
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(LARGE_PAYLOAD, headers={"ETag": '"large"'})
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"ok": True})
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("a" * 5000, media_type="application/octet-stream")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500, content_types=["application/json"])
+    return app
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, *") == "gzip"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+
+
+def test_middleware_compresses_allowlisted_bodies_above_threshold():
+    client = TestClient(make_app())
+
+    response = client.get("/large", headers={"Accept-Encoding": "br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"large"'
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == LARGE_PAYLOAD
+
+    assert client.get("/large", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "br"}).headers
+    assert "content-encoding" not in client.get("/text", headers={"Accept-Encoding": "br"}).headers
+
+
+def test_static_files_are_served_precompressed_and_fingerprinted(tmp_path):
+    content = b"body { color: #333; }\n" * 100
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "styles.css").write_bytes(content)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" + b"\x00" * 1000)
+
+    assert precompress_static_files(str(tmp_path)) == 2
+    assert precompress_static_files(str(tmp_path)) == 0
+    assert brotli.decompress((tmp_path / "css" / "styles.css.br").read_bytes()) == content
+    assert gzip.decompress((tmp_path / "css" / "styles.css.gz").read_bytes()) == content
+    assert not (tmp_path / "logo.png.br").exists()
+
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(tmp_path)), name="static")
+    client = TestClient(app)
+    fingerprint = static_fingerprint("css/styles.css", str(tmp_path))
+
+    response = client.get(f"/static/css/styles.css?v={fingerprint}", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.content == content
+
+    response = client.get("/static/css/styles.css?v=outdated", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.content == content
@@ -0,0 +1,120 @@
+import pytest
+
+from src.weather_service.city_index import CityIndex, CityTable, city_index
+from src.weather_service.utils import search_cities_db
+
+ROWS = [
+    {"id": 1, "name": "Brussels", "region": "", "country": "Belgium", "latitude": 50.85045, "longitude": 4.34878,
+     "population": 1019022, "timezone": "Europe/Brussels", "alternatenames": ["Brussel", "Bruxelles"]},
+    {"id": 2, "name": "Springfield", "region": "IL", "country": "United States", "latitude": 39.80172, "longitude": -89.64371,
+     "population": 116565, "timezone": "America/Chicago", "alternatenames": []},
+    {"id": 3, "name": "Springfield", "region": "MA", "country": "United States", "latitude": 42.10148, "longitude": -72.58981,
+     "population": 153606, "timezone": "America/New_York", "alternatenames": ["Springfeld"]},
+]
+
+
+def make_index(rows=ROWS) -> CityIndex:
+    index = CityIndex(session_maker=city_index.session_maker, check_interval=60)
+    index.table = CityTable(rows, version="test")
+    return index
+
+
+def test_city_index_finds_cities_by_id():
+    index = make_index()
+
+    assert index.get(1).dict() == ROWS[0]
+    assert index.get(4) is None
+    assert CityIndex(session_maker=city_index.session_maker, check_interval=60).get(1) is None
+
+
+def test_city_index_searches_names_and_alternate_names_by_population():
+    index = make_index()
+
+    assert [city.id for city in index.search("Springfield")] == [3, 2]
+    assert [city.id for city in index.search("  springfield ")] == [3, 2]
+    assert [city.id for city in index.search("Bruxelles")] == [1]
+    assert index.search("Paris") == []
+
+
+def test_city_index_shares_repeated_strings():
+    table = make_index([{**ROWS[2], "country": "".join(["United ", "States"])}, *ROWS]).table
+
+    assert table.countries[0] is table.countries[2]
+    assert table.estimate_bytes() > 0
+
+
+async def test_city_index_reloads_when_table_changes(fill_city_table_with_custom_data):
+    index = CityIndex(session_maker=city_index.session_maker, check_interval=60)
+
+    assert await index.refresh()
+    assert index.get(1).name == "Brussels"
+    assert not await index.refresh()
+
+
+def test_city_index_autocompletes_most_populated_first():
+    index = make_index()
+
+    assert [city["id"] for city in index.autocomplete("spr", 10)] == [3, 2]
+    assert [city["id"] for city in index.autocomplete("Brux", 10)] == [1]
+    assert index.autocomplete("Springfield", 1) == [
+        {"name": "Springfield", "country": "United States", "region": "MA", "latitude": 42.10148,
+         "longitude": -72.58981, "population": 153606, "id": 3}
+    ]
+
+
+def test_city_index_fuzzy_search_tolerates_typos():
+    index = make_index()
+
+    assert [city.id for city in index.fuzzy_search("Brusels")] == [1]
+    assert [city.id for city in index.fuzzy_search("sprnigfield")] == [3, 2]
+    assert [city.id for city in index.fuzzy_search("Springfield", limit=1)] == [3]
+    assert index.fuzzy_search("Bru") == []
+    assert index.fuzzy_search("Paris") == []
+
+
+class FakeSession:
+    """Answers every query with rows, in the column order of the city table."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, query):
+        self.queries += 1
+        return self
+
+    def fetchall(self):
+        return [tuple(row.values()) for row in self.rows]
+
+
+async def test_search_cities_db_prefers_exact_database_matches_over_misspellings(monkeypatch):
+    monkeypatch.setattr(city_index, "table", make_index().table)
+    # Added since the index was loaded, one typo away from Springfield
+    sprinfield = {**ROWS[1], "id": 4, "name": "Sprinfield"}
+
+    assert [city.id for city in await search_cities_db("Sprinfield", session=FakeSession([sprinfield]), fuzzy=True)] == [4]
+
+    session = FakeSession([])
+
+    assert [city.id for city in await search_cities_db("Sprinfield", session=session, fuzzy=True)] == [3, 2]
+    assert await search_cities_db("Sprinfield", session=session) == []
+    assert session.queries == 2
+
+
+def test_city_index_reverse_geocodes_to_the_nearest_city():
+    index = make_index()
+
+    assert index.reverse_geocode(50.8466, 4.3528).id == 1
+    assert index.reverse_geocode(50.8466, 4.3528, min_population=2 * 10 ** 6) is None
+    assert index.reverse_geocode(42.1, -72.6).id == 3
+    assert index.reverse_geocode(0, 0) is None
+
+
+def test_city_index_lists_nearby_cities_nearest_first():
+    index = make_index()
+
+    nearby = index.nearby(42.1, -72.6, limit=5, radius_km=2000)
+    assert [city.id for _, city in nearby] == [3, 2]
+    assert nearby[0][0] < nearby[1][0]
+    assert [city.id for _, city in index.nearby(42.1, -72.6, limit=5, radius_km=2000, min_population=150000)] == [3]
+    assert index.nearby(42.1, -72.6, limit=5, radius_km=10) == [(pytest.approx(0.86, abs=0.01), index.get(3))]
@@ -0,0 +1,50 @@
+import pytest
+
+from src.database import redis_db
+from src.weather_service.cache import weather_cache
+from src.weather_service.client import weatherapi_client
+from src.weather_service.schemas import CityInDB
+from src.weather_service.utils import CITY_QUERY_FORM_COORDINATES, CITY_QUERY_FORM_NAME, get_city_weatherapi_data
+
+CITY = CityInDB(
+    id=9001, name='Kyiv', region='Kyiv City', country='Ukraine', latitude=50.45466, longitude=30.5238,
+    population=2797553, timezone='Europe/Kyiv', alternatenames=['Kiev', 'Kiew'],
+)
+
+
+@pytest.fixture
+async def upstream_queries(monkeypatch):
+    queries = []
+
+    async def get(endpoint: str, params: dict, priority: str) -> dict:
+        queries.append(params['q'])
+        name = 'Kyiv' if params['q'].startswith('Kyiv') else 'Troieshchyna'
+        return {'location': {'name': name}}
+
+    monkeypatch.setattr(weatherapi_client, 'get', get)
+    yield queries
+    await redis_db.redis.hdel('weather:query_form', str(CITY.id))
+
+
+async def test_query_form_is_resolved_once_per_city(upstream_queries):
+    data = await get_city_weatherapi_data('current.json', CITY, params={})
+
+    assert data == {'location': {'name': 'Kyiv'}}
+    assert upstream_queries == ['50.45466,30.5238', 'Kyiv, Kyiv City, Ukraine']
+    assert await weather_cache.get_query_form(CITY.id) == CITY_QUERY_FORM_NAME
+
+    upstream_queries.clear()
+    data = await get_city_weatherapi_data('current.json', CITY, params={})
+
+    assert data == {'location': {'name': 'Kyiv'}}
+    assert upstream_queries == ['Kyiv, Kyiv City, Ukraine']
+
+
+async def test_matching_coordinates_are_memoized(upstream_queries):
+    city = CITY.copy(update={'alternatenames': ['Troieshchyna']})
+
+    await get_city_weatherapi_data('current.json', city, params={})
+    await get_city_weatherapi_data('current.json', city, params={})
+
+    assert upstream_queries == ['50.45466,30.5238', '50.45466,30.5238']
+    assert await weather_cache.get_query_form(city.id) == CITY_QUERY_FORM_COORDINATES
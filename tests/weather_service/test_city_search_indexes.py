@@ -0,0 +1,38 @@
+import json
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.weather_service.utils import get_search_cities_query, search_cities_db
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain(session: AsyncSession, city_name: str) -> list:
+    query = get_search_cities_query(city_name).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {query}"))
+    explained = result.scalar()
+    if isinstance(explained, str):
+        explained = json.loads(explained)
+    return list(plan_nodes(explained[0]["Plan"]))
+
+
+async def test_city_search_uses_indexes(large_city_table: AsyncSession):
+    nodes = await explain(large_city_table, "City 4242")
+
+    assert "Seq Scan" not in {node["Node Type"] for node in nodes}
+    assert {node.get("Index Name") for node in nodes} >= {"ix_city_name_lower", "ix_city_alternatenames_lower"}
+
+
+async def test_city_search_matches_name_and_alternate_names(large_city_table: AsyncSession):
+    assert [city.name for city in await search_cities_db("City 4242", session=large_city_table)] == ["City 4242"]
+    assert [city.name for city in await search_cities_db("city 4242", session=large_city_table)] == ["City 4242"]
+    assert [city.name for city in await search_cities_db("Other 4242", session=large_city_table)] == ["City 4242"]
+    assert [city.name for city in await search_cities_db("OTHER 4242", session=large_city_table)] == ["City 4242"]
+    assert await search_cities_db("Alt 100001", session=large_city_table) == []
@@ -0,0 +1,70 @@
+import datetime
+import random
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from load_testing.fake_weatherapi import Cassette, FakeWeatherAPI, parse_latency
+from src.weather_service.utils import process_data
+
+NOW = datetime.datetime(2023, 6, 10, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+async def start_fake(**overrides) -> TestServer:
+    settings = dict(mode='generate', latency=parse_latency('fixed:0'), error_rate=0, quota_error_rate=0, hang_rate=0, seed=0, now=NOW)
+    settings.update(overrides)
+    server = TestServer(FakeWeatherAPI(**settings).make_app())
+    await server.start_server()
+    return server
+
+
+async def get_json(server: TestServer, endpoint: str, **params) -> tuple:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(str(server.make_url(f'/v1/{endpoint}')), params={'key': 'test', **params}) as response:
+            return response.status, await response.json()
+
+
+async def test_fake_forecast_is_deterministic_and_processable():
+    server = await start_fake()
+
+    status, data = await get_json(server, 'forecast.json', q='51.50853,-0.12574', days=3)
+    _, same_data = await get_json(server, 'forecast.json', q='51.50853,-0.12574', days=3)
+
+    assert status == 200
+    assert data == same_data
+    assert data['location']['name'] == 'London'
+    assert len(data['forecast']['forecastday']) == 3
+    location_data, weather_data, _, forecast = await process_data(data)
+    assert location_data['timezone'] == 'Europe/London'
+    assert len(forecast[0]['hourly']['time']) == 24
+    await server.close()
+
+
+async def test_fake_injects_errors():
+    server = await start_fake(error_rate=1)
+
+    status, data = await get_json(server, 'current.json', q='London')
+
+    assert status == 500
+    assert data['error']['code'] == 9999
+    await server.close()
+
+
+async def test_fake_replays_cassette(tmp_path):
+    cassette = Cassette(str(tmp_path / 'cassette.json'))
+    cassette.save('current.json', {'key': 'secret', 'q': 'Paris'}, 200, {'location': {'name': 'Paris'}})
+    server = await start_fake(mode='replay', cassette=Cassette(cassette.path))
+
+    assert await get_json(server, 'current.json', q='Paris') == (200, {'location': {'name': 'Paris'}})
+    status, data = await get_json(server, 'current.json', q='Berlin')
+    assert status == 400
+    await server.close()
+
+
+def test_lognormal_latency_matches_percentiles():
+    sample = parse_latency('lognormal:100,400')
+    rng = random.Random(0)
+    latencies = sorted(sample(rng) for _ in range(10000))
+
+    assert 0.09 < latencies[5000] < 0.11
+    assert 0.35 < latencies[9900] < 0.45
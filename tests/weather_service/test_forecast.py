@@ -0,0 +1,29 @@
+from src.weather_service.forecast import ForecastDay, forecast_from_columns, forecast_from_rows, forecast_from_weatherapi, \
+    forecast_to_columns, forecast_to_rows
+
+WEATHERAPI_DAY = {
+    "date": "2023-06-10",
+    "day": {"maxtemp_c": 24.3, "mintemp_c": 13.1, "condition": {"text": "Partly cloudy", "icon": "//cdn/116.png"}},
+    "hour": [
+        {"time": f"2023-06-10 {hour:02}:00", "temp_c": 13.1 + hour / 2, "condition": {"text": "Clear", "icon": "//cdn/113.png"}}
+        for hour in range(24)
+    ],
+}
+
+
+def test_forecast_round_trips_through_rows_and_columns():
+    forecast = forecast_from_weatherapi([WEATHERAPI_DAY])
+    rows = forecast_to_rows(forecast)
+
+    assert rows[0]["condition"] == "Partly cloudy"
+    assert rows[0]["hourly_forecast"][3] == {"time": "2023-06-10 03:00", "temp": 14.6, "condition": "Clear", "img_url": "//cdn/113.png"}
+    assert forecast_to_rows(forecast_from_rows(rows)) == rows
+    assert forecast_to_rows(forecast_from_columns(forecast_to_columns(forecast))) == rows
+
+
+def test_hourly_strings_are_interned():
+    copy = {**WEATHERAPI_DAY, "hour": [{**hour, "condition": {"text": "".join("Clear"), "icon": "//cdn/113.png"}} for hour in WEATHERAPI_DAY["hour"]]}
+    first, second = ForecastDay.from_weatherapi(WEATHERAPI_DAY), ForecastDay.from_weatherapi(copy)
+
+    assert first.hours.condition[0] is second.hours.condition[5]
+    assert first.hours.to_rows(22) == first.to_row()["hourly_forecast"][22:]
@@ -0,0 +1,29 @@
+import pytest
+
+from src.weather_service.geo import coordinates_bucket, geohash_encode, haversine_km
+
+
+def test_geohash_encode():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+@pytest.mark.parametrize(
+    "bucketing, precision",
+    [
+        ("geohash", 6),
+        ("grid", 0.01),
+    ]
+)
+def test_nearby_coordinates_share_bucket(bucketing, precision):
+    bucket = coordinates_bucket(50.85045, 4.34878, bucketing, precision)
+    assert coordinates_bucket(50.85051, 4.34889, bucketing, precision) == bucket
+    assert coordinates_bucket(48.85341, 2.3488, bucketing, precision) != bucket
+
+
+def test_unknown_bucketing():
+    with pytest.raises(ValueError):
+        coordinates_bucket(50.85045, 4.34878, "h3", 7)
+
+
+def test_haversine_km():
+    assert haversine_km(50.85045, 4.34878, 48.85341, 2.3488) == pytest.approx(264, abs=1)
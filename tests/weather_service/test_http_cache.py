@@ -0,0 +1,77 @@
+import time
+
+from fastapi import FastAPI, Request as FastAPIRequest
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from src.compression import CompressionMiddleware
+
+from src.weather_service.cache import weather_cache
+from src.weather_service.http_cache import conditional_response, etag_matches, get_cache_control, make_etag
+
+
+def make_request(if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/weather/info", "headers": headers, "query_string": b""})
+
+
+def test_etag_matches_if_none_match_list():
+    etag = make_etag("html", "city:1", 100.0, "anon")
+
+    assert etag_matches(make_request(etag), etag)
+    assert etag_matches(make_request(f'"other", W/{etag}'), etag)
+    assert etag_matches(make_request("*"), etag)
+    assert not etag_matches(make_request('"other"'), etag)
+    assert not etag_matches(make_request(), etag)
+    assert etag != make_etag("html", "city:1", 200.0, "anon")
+
+
+def test_cache_control_follows_weather_cache_ttls():
+    fresh_entry = {"stored_at": time.time() - 9.5}
+    stale_entry = {"stored_at": time.time() - weather_cache.soft_ttl - 10}
+
+    assert get_cache_control(weather_cache, fresh_entry, private=False) == (
+        f"public, max-age={weather_cache.soft_ttl - 10}, "
+        f"stale-while-revalidate={weather_cache.hard_ttl - weather_cache.soft_ttl}, stale-if-error={weather_cache.grace_ttl}"
+    )
+    assert get_cache_control(weather_cache, stale_entry, private=False).startswith("public, max-age=0,")
+    assert get_cache_control(weather_cache, fresh_entry, private=True) == "private, no-cache"
+
+
+def test_conditional_response_skips_rendering_for_matching_etag():
+    etag = make_etag("json", "50.85:4.35", 100.0)
+
+    def make_response():
+        raise AssertionError("must not render a representation the client already has")
+
+    response = conditional_response(make_request(etag), "test", etag, "private, no-cache", make_response)
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == f"W/{etag}"
+    assert response.headers["vary"] == "Cookie"
+
+    response = conditional_response(make_request(), "test", etag, "private, no-cache", lambda: JSONResponse({}))
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f"W/{etag}"
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_not_modified_carries_the_validator_of_the_compressed_response():
+    app = FastAPI()
+    etag = make_etag("json", "50.85:4.35", 100.0)
+
+    @app.get("/weather")
+    def weather(request: FastAPIRequest):
+        return conditional_response(request, "test", etag, "private, no-cache", lambda: JSONResponse({"hours": list(range(500))}))
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500, content_types=["application/json"])
+    client = TestClient(app)
+
+    response = client.get("/weather", headers={"Accept-Encoding": "br"})
+    not_modified = client.get("/weather", headers={"Accept-Encoding": "br", "If-None-Match": response.headers["etag"]})
+
+    assert response.headers["content-encoding"] == "br"
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == response.headers["etag"] == f"W/{etag}"
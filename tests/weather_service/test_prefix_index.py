@@ -0,0 +1,35 @@
+import random
+
+from src.weather_service.prefix_index import PrefixIndex
+
+
+def brute_force_top(items_by_key, scores, prefix, limit):
+    items = {item for key, key_items in items_by_key.items() if key.startswith(prefix) for item in key_items}
+    return sorted(items, key=lambda item: -scores[item])[:limit]
+
+
+def test_prefix_index_ranks_distinct_items_by_score():
+    scores = [100, 300, 200]
+    index = PrefixIndex({"springfield": (1, 0), "springfeld": (1,), "spring": (2,), "paris": (0,)}, scores, max_limit=10)
+
+    assert index.top("spring", 10) == [1, 2, 0]
+    assert index.top("springf", 1) == [1]
+    assert index.top("par", 10) == [0]
+    assert index.top("x", 10) == []
+
+
+def test_precomputed_prefixes_match_merging_every_key():
+    rng = random.Random(0)
+    scores = [rng.randrange(10 ** 6) for _ in range(2000)]
+    items_by_key = {}
+    for item in range(len(scores)):
+        for _ in range(rng.randrange(1, 4)):
+            key = "".join(rng.choice("abc ") for _ in range(rng.randrange(1, 8)))
+            items_by_key[key] = tuple(sorted({*items_by_key.get(key, ()), item}, key=lambda item: -scores[item]))
+    index = PrefixIndex(items_by_key, scores, max_limit=5, scan_limit=8)
+
+    assert index._top
+    for prefix in ("", "a", "ab", "abc", "b a", "cc", "ccc c"):
+        assert [scores[item] for item in index.top(prefix, 5)] == [
+            scores[item] for item in brute_force_top(items_by_key, scores, prefix, 5)
+        ]
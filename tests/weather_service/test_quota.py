@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from src.database import redis_db
+from src.weather_service.quota import BULK, INTERACTIVE, WARMER, QuotaExceededError, QuotaScheduler
+
+
+def make_quota(rate: float = 1, burst: int = 10, max_wait: float = 0) -> QuotaScheduler:
+    return QuotaScheduler(
+        redis_db,
+        key='test:quota',
+        rate=rate,
+        burst=burst,
+        reserves={INTERACTIVE: 0, WARMER: 0.2, BULK: 0.5},
+        max_waits={INTERACTIVE: max_wait, WARMER: max_wait, BULK: max_wait},
+    )
+
+
+@pytest.fixture(autouse=True)
+async def clean_quota():
+    await redis_db.redis.delete('test:quota')
+    yield
+    await redis_db.redis.delete('test:quota')
+
+
+async def test_lower_priorities_leave_reserve_for_interactive_calls():
+    quota = make_quota()
+
+    for _ in range(5):
+        await quota.acquire(BULK)
+    with pytest.raises(QuotaExceededError):
+        await quota.acquire(BULK)
+
+    for _ in range(3):
+        await quota.acquire(WARMER)
+    with pytest.raises(QuotaExceededError):
+        await quota.acquire(WARMER)
+
+    for _ in range(2):
+        await quota.acquire(INTERACTIVE)
+    with pytest.raises(QuotaExceededError):
+        await quota.acquire(INTERACTIVE)
+
+
+async def test_acquire_waits_for_refill():
+    quota = make_quota(rate=20, burst=2, max_wait=1)
+    await quota.acquire(INTERACTIVE)
+    await quota.acquire(INTERACTIVE)
+
+    started_at = asyncio.get_running_loop().time()
+    await quota.acquire(INTERACTIVE)
+
+    assert asyncio.get_running_loop().time() - started_at >= 0.03
+
+
+async def test_acquire_without_wait_fails_fast():
+    quota = make_quota(rate=0.1, burst=1, max_wait=10)
+    await quota.acquire(INTERACTIVE)
+
+    with pytest.raises(QuotaExceededError):
+        await asyncio.wait_for(quota.acquire(INTERACTIVE, wait=False), timeout=1)
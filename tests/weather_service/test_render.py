@@ -0,0 +1,70 @@
+from starlette.requests import Request
+
+from src.cache.local import LocalCache
+from src.utils import get_jinja_templates, templates_version
+from src.weather_service.render import FragmentCache, fragment_cache
+from src.weather_service.router import render_weather_page
+
+RESULT_DATA = {
+    "weather_data": {"temperature, °C": 21.0, "feels like, °C": 20.0, "img url": "//cdn.weatherapi.com/weather/64x64/day/113.png"},
+    "forecast_data": [],
+    "location_data": {"location": "Brussels", "country": "Belgium", "latitude": 50.85, "longitude": 4.35, "localtime": "2023-06-10 14:00"},
+    "clothing_data": None,
+}
+
+
+def make_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/weather/info", "headers": [], "query_string": b""})
+
+
+def test_fragment_is_rendered_once_per_key():
+    cache = FragmentCache(get_jinja_templates(), LocalCache(name="test_fragments", max_entries=10, max_bytes=2 ** 20, ttl=30))
+    render_count = 0
+    original_get_template = cache.templates.get_template
+
+    def get_template(name):
+        nonlocal render_count
+        render_count += 1
+        return original_get_template(name)
+
+    cache.templates.get_template = get_template
+
+    first = cache.render("city_weather_present_body.html", "city:1:100.0", RESULT_DATA)
+    second = cache.render("city_weather_present_body.html", "city:1:100.0", RESULT_DATA)
+    cache.render("city_weather_present_body.html", "city:1:200.0", RESULT_DATA)
+
+    assert first is second
+    assert "Clothing for Brussels, Belgium" in first
+    assert render_count == 2
+
+
+def test_weather_page_body_is_cached_by_entry_version():
+    entry = {"stored_at": 300.0, "data": RESULT_DATA}
+    fragment_cache.local.clear()
+
+    anonymous = render_weather_page(make_request(), "info", entry, "city:1", RESULT_DATA["location_data"], user_data=None)
+
+    assert "Weather for Brussels, Belgium" in anonymous.body.decode()
+    assert fragment_cache.local.get("city_weather_present_body.html:city:1:300.0") is not None
+
+
+def test_templates_version_changes_with_templates_and_static_files(tmp_path):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "static").mkdir()
+    (tmp_path / "templates" / "page.html").write_text("<p>{{ text }}</p>")
+    (tmp_path / "static" / "styles.css").write_text("p { color: red }")
+    directories = str(tmp_path / "templates"), str(tmp_path / "static")
+    version = templates_version.__wrapped__(*directories)
+
+    (tmp_path / "static" / "styles.css.br").write_bytes(b"compressed")
+
+    assert templates_version.__wrapped__(*directories) == version
+
+    (tmp_path / "static" / "styles.css").write_text("p { color: blue }")
+
+    assert templates_version.__wrapped__(*directories) != version
+    version = templates_version.__wrapped__(*directories)
+
+    (tmp_path / "templates" / "page.html").write_text("<p>{{ text }}!</p>")
+
+    assert templates_version.__wrapped__(*directories) != version
@@ -0,0 +1,161 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.database import redis_db
+from src.weather_service.client import WeatherAPIClient
+from src.weather_service.quota import BULK, INTERACTIVE, WARMER, QuotaScheduler
+from src.weather_service.resilience import CircuitBreaker, CircuitOpenError
+
+
+class FakeWeatherAPI:
+    """weatherapi stand-in that answers with the queued (delay, status) pairs, then with fast 200s."""
+
+    def __init__(self):
+        self.responses = []
+        self.calls = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        delay, status = self.responses.pop(0) if self.responses else (0, 200)
+        await asyncio.sleep(delay)
+        return web.json_response({"location": {"name": request.query['q']}, "call": self.calls}, status=status)
+
+
+@pytest.fixture
+async def fake_weatherapi():
+    upstream = FakeWeatherAPI()
+    app = web.Application()
+    app.router.add_get('/v1/current.json', upstream.handle)
+    server = TestServer(app)
+    await server.start_server()
+    upstream.url = str(server.make_url('/v1'))
+    yield upstream
+    await server.close()
+
+
+async def make_client(url: str, **overrides) -> WeatherAPIClient:
+    settings = dict(
+        base_url=url,
+        api_key='test',
+        limit=10,
+        limit_per_host=10,
+        keepalive_timeout=30,
+        dns_cache_ttl=300,
+        timeout=aiohttp.ClientTimeout(total=5),
+        deadline=2,
+        retry_attempts=3,
+        retry_base_delay=0.01,
+        retry_max_delay=0.05,
+        breaker=CircuitBreaker(name='test', failure_threshold=2, reset_timeout=0.2),
+        hedge_quantile=0,
+        hedge_min_samples=5,
+        quota=None,
+    )
+    settings.update(overrides)
+    client = WeatherAPIClient(**settings)
+    await client.connect()
+    return client
+
+
+async def test_client_retries_transient_errors(fake_weatherapi):
+    client = await make_client(fake_weatherapi.url)
+    fake_weatherapi.responses = [(0, 500), (0, 503)]
+
+    data = await client.get('current.json', {'q': 'London'})
+
+    assert data == {"location": {"name": "London"}, "call": 3}
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    await client.disconnect()
+
+
+async def test_client_enforces_deadline(fake_weatherapi):
+    client = await make_client(fake_weatherapi.url, deadline=0.2)
+    fake_weatherapi.responses = [(1, 200)] * 3
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get('current.json', {'q': 'London'})
+
+    assert fake_weatherapi.calls == 1
+    await client.disconnect()
+
+
+async def test_circuit_opens_and_recovers_after_probe(fake_weatherapi):
+    client = await make_client(fake_weatherapi.url, retry_attempts=1)
+    fake_weatherapi.responses = [(0, 500), (0, 500)]
+
+    for _ in range(2):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await client.get('current.json', {'q': 'London'})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await client.get('current.json', {'q': 'London'})
+    assert fake_weatherapi.calls == 2
+
+    await asyncio.sleep(0.2)
+    data = await client.get('current.json', {'q': 'London'})
+
+    assert data["call"] == 3
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    await client.disconnect()
+
+
+async def test_client_hedges_slow_requests(fake_weatherapi):
+    client = await make_client(fake_weatherapi.url, hedge_quantile=0.9, hedge_min_samples=5)
+    for _ in range(5):
+        await client.get('current.json', {'q': 'London'})
+    fake_weatherapi.responses = [(1, 200)]
+
+    data = await asyncio.wait_for(client.get('current.json', {'q': 'London'}), timeout=0.5)
+
+    assert data["call"] == 7
+    await client.disconnect()
+
+
+async def test_open_circuit_rejects_calls_without_spending_quota(fake_weatherapi):
+    await redis_db.redis.delete('test:quota:resilience')
+    quota = QuotaScheduler(
+        redis_db,
+        key='test:quota:resilience',
+        rate=0.001,
+        burst=3,
+        reserves={INTERACTIVE: 0, WARMER: 0, BULK: 0},
+        max_waits={INTERACTIVE: 0.2, WARMER: 0.2, BULK: 0.2},
+    )
+    client = await make_client(fake_weatherapi.url, retry_attempts=1, quota=quota, breaker=CircuitBreaker(
+        name='test', failure_threshold=1, reset_timeout=0.5
+    ))
+    fake_weatherapi.responses = [(0, 500)]
+    with pytest.raises(aiohttp.ClientResponseError):
+        await client.get('current.json', {'q': 'London'})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    for _ in range(4):
+        with pytest.raises(CircuitOpenError):
+            await client.get('current.json', {'q': 'London'})
+
+    await asyncio.sleep(0.5)
+    data = await client.get('current.json', {'q': 'London'})
+
+    assert data["call"] == 2
+    await client.disconnect()
+    await redis_db.redis.delete('test:quota:resilience')
+
+
+async def test_pool_stats_count_requests_in_flight_and_waiting(fake_weatherapi):
+    client = await make_client(fake_weatherapi.url, limit=1, limit_per_host=1)
+    fake_weatherapi.responses = [(0.2, 200), (0, 200)]
+
+    calls = [asyncio.create_task(client.get('current.json', {'q': city})) for city in ('London', 'Paris')]
+    await asyncio.sleep(0.1)
+
+    assert client.pool_stats() == {'in_flight': 2, 'waiting': 1, 'limit': 1, 'limit_per_host': 1}
+
+    await asyncio.gather(*calls)
+
+    assert client.pool_stats() == {'in_flight': 0, 'waiting': 0, 'limit': 1, 'limit_per_host': 1}
+    await client.disconnect()
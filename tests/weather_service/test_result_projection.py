@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from src.weather_service.forecast import forecast_from_rows, forecast_to_columns
+from src.weather_service.utils import RESULT_FIELDS, RESULT_LAYOUT_COLUMNS, paginate_hourly_forecast, parse_result_fields, \
+    project_result_data
+
+
+def make_day(date: str) -> dict:
+    return {
+        "date": date,
+        "max_temp": 25.0,
+        "min_temp": 15.0,
+        "condition": "Sunny",
+        "hourly_forecast": [
+            {"time": f"{date} {hour:02}:00", "temp": 20.0, "condition": "Sunny", "img_url": "//cdn/113.png"} for hour in range(24)
+        ],
+    }
+
+
+FORECAST_ROWS = [make_day("2023-06-10"), make_day("2023-06-11"), make_day("2023-06-12")]
+RESULT_DATA = {
+    "weather_data": {"temperature, °C": 21.0},
+    "forecast_data": forecast_to_columns(forecast_from_rows(FORECAST_ROWS)),
+    "location_data": {"location": "Brussels"},
+    "clothing_data": None,
+}
+
+
+def test_parse_result_fields():
+    assert parse_result_fields(None) == RESULT_FIELDS
+    assert parse_result_fields("weather, location") == {"weather", "location"}
+    for fields in ("", "weather,forecast"):
+        with pytest.raises(HTTPException) as exc_info:
+            parse_result_fields(fields)
+        assert exc_info.value.status_code == 400
+
+
+def test_project_result_data():
+    assert project_result_data(RESULT_DATA, RESULT_FIELDS) == {**RESULT_DATA, "forecast_data": FORECAST_ROWS}
+    assert project_result_data(RESULT_DATA, RESULT_FIELDS, RESULT_LAYOUT_COLUMNS) == RESULT_DATA
+    assert project_result_data(RESULT_DATA, frozenset({"weather", "clothing"})) == {
+        "weather_data": RESULT_DATA["weather_data"], "clothing_data": None
+    }
+
+    daily = project_result_data(RESULT_DATA, frozenset({"daily"}))["forecast_data"]
+    assert daily[0] == {"date": "2023-06-10", "max_temp": 25.0, "min_temp": 15.0, "condition": "Sunny"}
+
+    hourly = project_result_data(RESULT_DATA, frozenset({"hourly"}))["forecast_data"]
+    assert set(hourly[0]) == {"date", "hourly_forecast"}
+    assert len(hourly[0]["hourly_forecast"]) == 24
+
+    hourly = project_result_data(RESULT_DATA, frozenset({"hourly"}), RESULT_LAYOUT_COLUMNS)["forecast_data"]
+    assert hourly[0]["hourly"]["temp"] == [20.0] * 24
+
+
+def test_paginate_hourly_forecast():
+    page = paginate_hourly_forecast(RESULT_DATA["forecast_data"], None, offset=20, limit=6)
+
+    assert page["total"] == 72
+    assert [hour["time"] for hour in page["hourly_forecast"]] == [
+        "2023-06-10 20:00", "2023-06-10 21:00", "2023-06-10 22:00", "2023-06-10 23:00", "2023-06-11 00:00", "2023-06-11 01:00"
+    ]
+
+    page = paginate_hourly_forecast(RESULT_DATA["forecast_data"], datetime.date(2023, 6, 11), offset=20, limit=6)
+
+    assert page["total"] == 24
+    assert [hour["time"] for hour in page["hourly_forecast"]] == [f"2023-06-11 {hour}:00" for hour in range(20, 24)]
+
+    with pytest.raises(HTTPException):
+        paginate_hourly_forecast(RESULT_DATA["forecast_data"], datetime.date(2023, 6, 20), offset=0, limit=24)
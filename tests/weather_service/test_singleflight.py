@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+
+from src.database import RedisDB, redis_db
+from src.weather_service.singleflight import SingleFlight
+
+
+def make_singleflight(db: RedisDB, namespace: str = 'test:singleflight') -> SingleFlight:
+    return SingleFlight(db, namespace=namespace, lock_ttl=5, result_ttl=2, wait_timeout=5)
+
+
+async def test_singleflight_coalesces_calls_inside_worker():
+    singleflight = make_singleflight(RedisDB(redis_url=None))
+    calls = 0
+    release = asyncio.Event()
+
+    async def lookup():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"calls": calls}
+
+    waiting = REGISTRY.get_sample_value('weather_singleflight_waiters')
+    tasks = [asyncio.create_task(singleflight.do("city:1", lookup)) for _ in range(10)]
+    await asyncio.sleep(0)
+    assert singleflight.waiters() == {"city:1": 10}
+    assert REGISTRY.get_sample_value('weather_singleflight_waiters') == waiting + 10
+
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert all(result == {"calls": 1} for result in results)
+    assert singleflight.waiters() == {}
+    assert REGISTRY.get_sample_value('weather_singleflight_waiters') == waiting
+
+
+async def test_singleflight_propagates_errors_to_waiters():
+    singleflight = make_singleflight(RedisDB(redis_url=None))
+
+    async def lookup():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=400, detail="No matching location found.")
+
+    results = await asyncio.gather(*[singleflight.do("coords:0:0", lookup) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, HTTPException) and result.status_code == 400 for result in results)
+
+
+@pytest.mark.parametrize("error", [None, HTTPException(status_code=400, detail="No matching location found.")])
+async def test_singleflight_coalesces_calls_across_workers(error):
+    workers = [make_singleflight(redis_db, namespace=f"test:singleflight:{error is None}") for _ in range(3)]
+    calls = 0
+
+    async def lookup():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        if error:
+            raise error
+        return {"temp": 20}
+
+    results = await asyncio.gather(*[worker.do("city:2", lookup) for worker in workers], return_exceptions=True)
+
+    assert calls == 1
+    if error:
+        assert all(isinstance(result, HTTPException) and result.detail == error.detail for result in results)
+    else:
+        assert results == [{"temp": 20}] * 3
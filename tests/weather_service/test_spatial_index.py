@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from src.weather_service.geo import haversine_km
+from src.weather_service.spatial_index import SpatialIndex
+
+
+def brute_force_within(latitudes, longitudes, populations, latitude, longitude, radius_km, min_population):
+    distances = [
+        (haversine_km(latitude, longitude, point_latitude, point_longitude), position)
+        for position, (point_latitude, point_longitude) in enumerate(zip(latitudes, longitudes))
+        if populations[position] >= min_population
+    ]
+    return [position for distance, position in sorted(distances) if distance <= radius_km]
+
+
+def test_spatial_index_matches_brute_force():
+    rng = random.Random(0)
+    latitudes = [rng.uniform(-90, 90) for _ in range(3000)]
+    longitudes = [rng.uniform(-180, 180) for _ in range(3000)]
+    populations = [rng.randrange(10 ** 6) for _ in range(3000)]
+    index = SpatialIndex(latitudes, longitudes, populations, cell_degrees=1)
+
+    # Including circles around a pole and across the antimeridian
+    for latitude, longitude in [(50.85, 4.35), (89.9, 10), (-89.5, -170), (0, 179.9), (-16.5, -179.9), (60, -180)]:
+        for radius_km in (50, 500, 3000):
+            for min_population in (0, 500000):
+                expected = brute_force_within(latitudes, longitudes, populations, latitude, longitude, radius_km, min_population)
+                assert [position for _, position in index.within(latitude, longitude, radius_km, min_population)] == expected
+                assert [position for _, position in index.nearest(latitude, longitude, 3, radius_km, min_population)] == expected[:3]
+
+
+def test_spatial_index_returns_distances_in_km():
+    brussels, paris = (50.85045, 4.34878), (48.85341, 2.3488)
+    index = SpatialIndex(*zip(brussels, paris), populations=[1019022, 2138551])
+
+    assert index.nearest(*paris, k=2, max_km=1000) == [(0, 1), (pytest.approx(264, abs=1), 0)]
+    assert index.nearest(*paris, k=2, max_km=100) == [(0, 1)]
+    assert index.within(*paris, radius_km=1000, min_population=2 * 10 ** 6) == [(0, 1)]
@@ -0,0 +1,50 @@
+import asyncio
+
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from src.weather_service import tasks
+from src.weather_service.quota import QuotaExceededError
+from src.weather_service.resilience import CircuitOpenError
+
+
+def upstream_error(cause: Exception) -> HTTPException:
+    try:
+        try:
+            raise cause
+        except Exception as exc:
+            raise HTTPException(status_code=503, detail="Weather service is temporarily unavailable") from exc
+    except HTTPException as exc:
+        return exc
+
+
+async def test_warm_batch_logs_failed_cities_and_warms_the_next(monkeypatch):
+    errors = {2: upstream_error(asyncio.TimeoutError()), 3: ConnectionError("Redis is down"), 4: HTTPException(status_code=400)}
+    warmed = []
+
+    async def warm_city(city_id, session):
+        if city_id in errors:
+            raise errors[city_id]
+        warmed.append(city_id)
+        return city_id != 5
+
+    monkeypatch.setattr(tasks, "warm_city", warm_city)
+
+    assert await tasks.warm_batch([1, 2, 3, 4, 5], session=None) == (1, 3, 0)
+    assert warmed == [1, 5]
+
+
+async def test_warm_batch_skips_the_rest_once_upstream_is_unavailable(monkeypatch):
+    for error in (upstream_error(CircuitOpenError("open")), upstream_error(QuotaExceededError("spent")), CircuitOpenError("open")):
+        warmed = []
+
+        async def warm_city(city_id, session):
+            if city_id == 2:
+                raise error
+            warmed.append(city_id)
+            return True
+
+        monkeypatch.setattr(tasks, "warm_city", warm_city)
+
+        assert await tasks.warm_batch([1, 2, 3, 4], session=None) == (1, 0, 3)
+        assert warmed == [1]
@@ -0,0 +1,48 @@
+import random
+
+from src.weather_service.trigram_index import TrigramIndex, bounded_edit_distance, pattern_masks
+
+
+def edit_distance(first, second):
+    """Textbook dynamic programming, transpositions of adjacent characters included."""
+    rows = [[column for column in range(len(second) + 1)]]
+    for row in range(1, len(first) + 1):
+        rows.append([row] + [0] * len(second))
+        for column in range(1, len(second) + 1):
+            rows[row][column] = min(
+                rows[row - 1][column] + 1,
+                rows[row][column - 1] + 1,
+                rows[row - 1][column - 1] + (first[row - 1] != second[column - 1]),
+            )
+            if row > 1 and column > 1 and first[row - 1] == second[column - 2] and first[row - 2] == second[column - 1]:
+                rows[row][column] = min(rows[row][column], rows[row - 2][column - 2] + 1)
+    return rows[-1][-1]
+
+
+def test_bounded_edit_distance_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(2000):
+        first = "".join(rng.choice("abc") for _ in range(rng.randrange(1, 9)))
+        second = "".join(rng.choice("abc") for _ in range(rng.randrange(0, 9)))
+        distance = edit_distance(first, second)
+        for max_distance in range(4):
+            expected = distance if distance <= max_distance else None
+            assert bounded_edit_distance(pattern_masks(first), len(first), second, max_distance) == expected
+
+
+def test_trigram_index_finds_keys_within_max_distance():
+    index = TrigramIndex(["brussels", "brussel", "bruges", "paris"])
+
+    assert index.search("brusels", 1, 10) == [(1, 0)]
+    assert index.search("brusel", 2, 10) == [(1, 1), (2, 0), (2, 2)]
+    assert index.search("burssels", 1, 10) == [(1, 0)]
+    assert index.search("prais", 1, 10) == [(1, 3)]
+    assert index.search("london", 2, 10) == []
+
+
+def test_trigram_index_verifies_only_the_candidates_sharing_the_most_trigrams():
+    index = TrigramIndex(["brussels", "brussel", "bruges"])
+
+    assert index.search("brusel", 2, 3) == [(1, 1), (2, 0), (2, 2)]
+    assert index.search("brusel", 2, 1) == [(1, 1)]
+    assert index.search("brusel", 2, 2) == [(1, 1), (2, 0)]
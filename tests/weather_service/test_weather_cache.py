@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from src.cache.codec import cache_codec
+from src.cache.local import LocalCache
+from src.cache.tiered import TieredCache
+from src.database import redis_db
+from src.weather_service.cache import WeatherCache
+from src.weather_service.singleflight import SingleFlight
+
+
+def make_result_data(temperature: float, latitude: float = 50.83) -> dict:
+    return {
+        "weather_data": {"temperature, °C": temperature},
+        "forecast_data": [],
+        "location_data": {"location": "Brussels", "latitude": latitude, "longitude": 4.33},
+        "clothing_data": None,
+    }
+
+
+@pytest.fixture
+def weather_cache():
+    singleflight = SingleFlight(redis_db, namespace="test:singleflight:cache", lock_ttl=5, result_ttl=0.1, wait_timeout=5)
+    cache = TieredCache(
+        name="test",
+        redis_db=redis_db,
+        local=LocalCache(name="test", max_entries=100, max_bytes=2 ** 20, ttl=30),
+        codec=cache_codec,
+    )
+    return WeatherCache(
+        redis_db=redis_db,
+        cache=cache,
+        singleflight=singleflight,
+        soft_ttl=60,
+        hard_ttl=120,
+        grace_ttl=600,
+        stale_fetch_timeout=0.5,
+        alias_ttl=600,
+        city_ttl=600,
+        coordinates_bucketing="geohash",
+        coordinates_precision=6,
+    )
+
+
+async def store_aged_entry(weather_cache: WeatherCache, alias: str, result_data: dict, age: float):
+    await weather_cache.set_forecast(alias, result_data)
+    location_id = weather_cache.location_id(result_data)
+    entry = {"stored_at": time.time() - age, "data": result_data}
+    await weather_cache.cache.set(weather_cache.forecast_key(location_id), entry, ex=600)
+
+
+async def test_fresh_entry_is_served_without_fetch(weather_cache):
+    await store_aged_entry(weather_cache, "city:101", make_result_data(10), age=0)
+
+    async def fetch():
+        raise AssertionError("fresh entry must not be refetched")
+
+    assert await weather_cache.get_or_fetch("city:101", fetch) == make_result_data(10)
+
+
+async def test_stale_entry_is_served_and_refreshed_once(weather_cache):
+    await store_aged_entry(weather_cache, "city:102", make_result_data(10), age=90)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return make_result_data(20)
+
+    results = await asyncio.gather(*[weather_cache.get_or_fetch("city:102", fetch) for _ in range(5)])
+    assert results == [make_result_data(10)] * 5
+
+    await asyncio.gather(*weather_cache._refresh_tasks)
+    assert calls == 1
+    assert await weather_cache.get_forecast("city:102") == make_result_data(20)
+
+
+@pytest.mark.parametrize(
+    "error, stale_served",
+    [
+        (HTTPException(status_code=503, detail="Weather service is temporarily unavailable"), True),
+        (HTTPException(status_code=400, detail="No matching location found."), False),
+    ]
+)
+async def test_expired_entry_on_upstream_error(weather_cache, error, stale_served):
+    await store_aged_entry(weather_cache, "city:103", make_result_data(10), age=300)
+
+    async def fetch():
+        raise error
+
+    if stale_served:
+        assert await weather_cache.get_or_fetch("city:103", fetch) == make_result_data(10)
+    else:
+        with pytest.raises(HTTPException):
+            await weather_cache.get_or_fetch("city:103", fetch)
+
+
+async def test_expired_entry_on_slow_upstream(weather_cache):
+    await store_aged_entry(weather_cache, "city:104", make_result_data(10), age=300)
+
+    async def fetch():
+        await asyncio.sleep(1)
+        return make_result_data(20)
+
+    assert await weather_cache.get_or_fetch("city:104", fetch) == make_result_data(10)
+    await asyncio.gather(*weather_cache.singleflight._calls.values())
+    assert await weather_cache.get_forecast("city:104") == make_result_data(20)
+
+
+async def test_warm_refreshes_only_stale_entries(weather_cache):
+    await store_aged_entry(weather_cache, "city:105", make_result_data(10), age=0)
+    await store_aged_entry(weather_cache, "city:106", make_result_data(10, latitude=51.0), age=90)
+
+    async def fetch():
+        return make_result_data(20, latitude=51.0)
+
+    assert await weather_cache.warm("city:105", fetch) is False
+    assert await weather_cache.warm("city:106", fetch) is True
+
+    entry = await weather_cache.get_entry("city:106")
+    assert entry["source"] == "warmer"
+    assert entry["data"] == make_result_data(20, latitude=51.0)
+
+
+async def test_entries_are_read_in_batch(weather_cache):
+    await weather_cache.set_forecast("city:301", make_result_data(10, latitude=50.1))
+    await weather_cache.set_forecast("city:302", make_result_data(20, latitude=50.2))
+    await weather_cache.set_forecast("coords:gh6:u151", make_result_data(10, latitude=50.1))
+    weather_cache.cache.local.clear()
+
+    entries = await weather_cache.get_entries(["city:301", "city:302", "coords:gh6:u151", "city:303"])
+
+    assert {alias: entry["data"] for alias, entry in entries.items()} == {
+        "city:301": make_result_data(10, latitude=50.1),
+        "city:302": make_result_data(20, latitude=50.2),
+        "coords:gh6:u151": make_result_data(10, latitude=50.1),
+    }
+
+
+async def test_get_or_fetch_entries_batches_hits_and_bounds_fetches(weather_cache):
+    await weather_cache.set_forecast("city:401", make_result_data(10, latitude=50.4))
+    await store_aged_entry(weather_cache, "city:402", make_result_data(20, latitude=50.5), age=90)
+    running = 0
+    most_running = 0
+
+    def make_fetch(result_data: dict, delay: float):
+        async def fetch():
+            nonlocal running, most_running
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(delay)
+            running -= 1
+            return result_data
+        return fetch
+
+    async def fail():
+        raise HTTPException(status_code=502, detail="Weather service is unavailable")
+
+    entries = await weather_cache.get_or_fetch_entries(
+        {
+            "city:401": fail,
+            "city:402": fail,
+            "city:403": make_fetch(make_result_data(30, latitude=50.6), 0.01),
+            "city:404": make_fetch(make_result_data(40, latitude=50.7), 0.01),
+            "city:405": make_fetch(make_result_data(50, latitude=50.8), 0.4),
+            "city:406": fail,
+        },
+        concurrency=2,
+        timeout=0.3,
+    )
+
+    assert {alias: entry["data"]["weather_data"]["temperature, °C"] for alias, entry in entries.items()} == {
+        "city:401": 10, "city:402": 20, "city:403": 30, "city:404": 40,
+    }
+    assert most_running <= 2
+    # The fill that timed out still completes and is cached
+    await asyncio.sleep(0.2)
+    assert (await weather_cache.get_forecast("city:405"))["weather_data"]["temperature, °C"] == 50
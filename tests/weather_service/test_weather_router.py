@@ -1,6 +1,10 @@
 import pytest
 
 from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from src.cache.tiered import redis_cache
+from src.weather_service.cache import weather_cache
 
 
 async def test_get_page_weather_search(ac: AsyncClient):
@@ -84,3 +88,119 @@ async def test_get_city_weather(
     response = await ac.get(f"/weather/info", params={"city_id": 1})
 
     assert response.status_code == 200
+
+
+async def test_weatherapi_pool_metrics(ac: AsyncClient):
+    response = await ac.get("/metrics/")
+    assert response.status_code == 200
+    for metric in ("weatherapi_pool_in_flight", "weatherapi_pool_waiting", "weatherapi_pool_waits_total"):
+        assert metric in response.text
+
+
+async def test_get_city_weather_is_cached(
+        ac: AsyncClient,
+        city_data,
+        fill_city_table_with_custom_data
+):
+    response = await ac.get(f"/weather/info", params={"city_id": city_data["id"]})
+    assert response.status_code == 200
+
+    cached_forecast = await weather_cache.get_forecast(weather_cache.city_alias(city_data["id"]))
+    cached_city_data = await weather_cache.get_city_data(city_data["id"])
+
+    assert cached_forecast is not None
+    assert "population" not in cached_forecast["location_data"]
+    assert cached_city_data.name == city_data["name"]
+
+
+def redis_round_trips() -> float:
+    return sum(
+        REGISTRY.get_sample_value('cache_redis_command_seconds_count', {'cache': redis_cache.name, 'command': command}) or 0
+        for command in ('get', 'mget', 'set', 'delete')
+    )
+
+
+async def test_cached_city_weather_redis_round_trips(
+        ac: AsyncClient,
+        city_data,
+        fill_city_table_with_custom_data
+):
+    response = await ac.get(f"/weather/info", params={"city_id": city_data["id"]})
+    assert response.status_code == 200
+
+    redis_cache.local.clear()
+    round_trips = redis_round_trips()
+    response = await ac.get(f"/weather/info", params={"city_id": city_data["id"]})
+    assert response.status_code == 200
+    # City row, forecast alias and forecast entry
+    assert redis_round_trips() - round_trips == 3
+
+    round_trips = redis_round_trips()
+    response = await ac.get(f"/weather/info", params={"city_id": city_data["id"]})
+    assert response.status_code == 200
+    assert redis_round_trips() - round_trips == 0
+
+
+async def test_get_city_weather_revalidates_with_etag(
+        ac: AsyncClient,
+        city_data,
+        fill_city_table_with_custom_data
+):
+    response = await ac.get(f"/weather/info", params={"city_id": city_data["id"]})
+    assert response.status_code == 200
+    assert "Cookie" in response.headers["vary"]
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    response = await ac.get(
+        f"/weather/info", params={"city_id": city_data["id"]}, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+async def test_get_weather_data_by_coordinates_fields(ac: AsyncClient):
+    params = {"latitude": 50.85045, "longitude": 4.34878}
+
+    response = await ac.get("/weather/info/by_coordinates", params={**params, "fields": "weather,daily"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"weather_data", "forecast_data"}
+    assert "hourly_forecast" not in response.json()["forecast_data"][0]
+
+    response = await ac.get("/weather/info/by_coordinates", params={**params, "fields": "forecast"})
+    assert response.status_code == 400
+
+
+async def test_get_hourly_forecast(
+        ac: AsyncClient,
+        city_data,
+        fill_city_table_with_custom_data
+):
+    response = await ac.get("/weather/info/hourly", params={"city_id": city_data["id"], "offset": 6, "limit": 6})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["hourly_forecast"]) == 6
+    assert data["total"] == 72
+    assert data["location_data"]["location"]
+
+    response = await ac.get("/weather/info/hourly", params={"limit": 6})
+    assert response.status_code == 400
+
+
+async def test_autocomplete_city_name(ac: AsyncClient):
+    response = await ac.get("/weather/autocomplete", params={"q": "Bru", "limit": 5})
+    assert response.status_code == 200
+    assert len(response.json()["cities"]) <= 5
+
+    response = await ac.get("/weather/autocomplete", params={"q": ""})
+    assert response.status_code == 400
+
+
+async def test_get_nearby_cities_weather(ac: AsyncClient, fill_city_table_with_custom_data):
+    response = await ac.get("/weather/nearby", params={"latitude": 50.85, "longitude": 4.35, "limit": 5, "radius_km": 50})
+    assert response.status_code == 200
+    cities = response.json()["cities"]
+    assert len(cities) <= 5
+    assert [city["distance_km"] for city in cities] == sorted(city["distance_km"] for city in cities)
+
+    response = await ac.get("/weather/nearby", params={"latitude": 50.85, "longitude": 4.35, "limit": 1000})
+    assert response.status_code == 400